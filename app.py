@@ -1,9 +1,14 @@
 import streamlit as st
 from st_pages import Page, Section, show_pages, add_page_title
 
+from packages.ui import warm_bundle
+
 # Add page to our list of pages
 add_page_title()
 
+# Precomputed page defaults, rebuilt in a background process whenever the simulation code has changed
+warm_bundle()
+
 # Create sidebar with list of pages
 show_pages(
     [
@@ -13,9 +18,13 @@ show_pages(
         Page("pages/roulette/martingale.py", "Martingale System", "📖"),
         Page("pages/roulette/reverse_martingale.py", "Reverse Martingale System", "📖"),
         Page("pages/roulette/dalembert.py", "D'Alembert System", "📖"),
+        Page("pages/roulette/other_progressions.py", "Other Progressions", "📖"),
+        Page("pages/roulette/bet_layouts.py", "Bet Layouts", "🎯"),
+        Page("pages/roulette/sensitivity.py", "Sensitivity Heatmaps", "📊"),
         Section(name = "Blackjack Counting Strategies"),
         Page("pages/blackjack/blackjack_overview.py", "About", '❔'),
-        Page("pages/blackjack/strategy_explorer.py", "Strategy Explorer", ":flower_playing_cards:")
+        Page("pages/blackjack/strategy_explorer.py", "Strategy Explorer", ":flower_playing_cards:"),
+        Page("pages/blackjack/risk_of_ruin.py", "Risk of Ruin", ":chart_with_downwards_trend:")
     ]
 )
 
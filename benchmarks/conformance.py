@@ -0,0 +1,343 @@
+"""
+Checks that the fast simulation engines play the same game as the reference engines, and measures their speed.
+
+Every candidate engine is run side by side with its reference:
+
+* distributions: final balances are compared with a two sample Kolmogorov-Smirnov test and a chi-square test on
+  quantile bins, and outcome counts with a chi-square test. All p-values of one run share a Bonferroni corrected
+  significance level, so a conforming engine fails the whole run with probability at most --alpha.
+* infinite deck: infinite_deck_ev must match play_round dealt from an infinite shoe, in EV per hand (a z-test) and
+  in outcome counts, under the default rules and under every optional rule at once.
+* decisions: engines that can replay the reference's shuffles must agree with it exactly, round by round.
+* throughput: runs or hands per second of the reference and of the candidate, from the same runs.
+
+To check a new engine, add it to ROULETTE_ENGINES or BLACKJACK_ENGINES. Run from the repository root:
+
+    python benchmarks/conformance.py --alpha 0.001 --record benchmarks/conformance_history.jsonl
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+from scipy import stats
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from packages.blackjack_logic import (RANKS, Card, CardCounter, Player, TableRules, blackjack_checkpoints,  # noqa: E402
+                                      blackjack_simulator, compile_rules, play_round)
+from packages.infinite_deck import infinite_deck_ev  # noqa: E402
+from packages.progressions import PROGRESSIONS  # noqa: E402
+from packages.shoe_replay import ShoeRecord, ReplayDeck, Variant, replay  # noqa: E402
+
+ROULETTE_CHOICES = ['red', 'black', 'green']
+ROULETTE_WEIGHTS = [18/38, 18/38, 2/38]
+
+
+def reference_martingale(initial_balance, num_plays, initial_bet, preference, target_balance, floor_balance=0):
+    """The original spin by spin martingale."""
+    balance, bet = initial_balance, initial_bet
+    for _ in range(num_plays):
+        if bet > balance or balance <= floor_balance or (target_balance is not None and balance >= target_balance):
+            break
+        if random.choices(ROULETTE_CHOICES, ROULETTE_WEIGHTS)[0] == preference:
+            balance += bet
+            bet = initial_bet
+        else:
+            balance -= bet
+            bet *= 2
+    return balance
+
+
+def reference_reverse_martingale(initial_balance, num_plays, initial_bet, preference, target_balance, floor_balance=0):
+    """The original spin by spin reverse martingale."""
+    balance, bet = initial_balance, initial_bet
+    for _ in range(num_plays):
+        if bet > balance or balance <= floor_balance or (target_balance is not None and balance >= target_balance):
+            break
+        if random.choices(ROULETTE_CHOICES, ROULETTE_WEIGHTS)[0] == preference:
+            balance += bet
+            bet *= 2
+        else:
+            balance -= bet
+            bet = initial_bet
+    return balance
+
+
+def reference_dalembert(initial_balance, num_plays, base_bet, preference, target_balance, floor_balance=0):
+    """The original spin by spin D'Alembert."""
+    balance, bet = initial_balance, base_bet
+    for _ in range(num_plays):
+        if bet > balance or balance <= floor_balance or (target_balance is not None and balance >= target_balance):
+            break
+        if random.choices(ROULETTE_CHOICES, ROULETTE_WEIGHTS)[0] == preference:
+            balance += bet
+            bet -= base_bet
+            if bet <= 0:
+                bet = base_bet
+        else:
+            balance -= bet
+            bet += base_bet
+            if bet >= balance:
+                bet = balance
+    return balance
+
+
+def batched(progression):
+    """Returns a candidate playing every repetition of a compiled progression in one call."""
+    def candidate(repetitions, initial_balance, num_plays, initial_bet, preference, target_balance, seed):
+        return progression.simulate(repetitions, initial_balance, num_plays, initial_bet, preference, target_balance,
+                                    seed=seed).balances
+    return candidate
+
+
+# name -> (reference playing one repetition, candidate playing them all)
+ROULETTE_ENGINES = {
+    'martingale': (reference_martingale, batched(PROGRESSIONS['martingale'])),
+    'reverse_martingale': (reference_reverse_martingale, batched(PROGRESSIONS['reverse_martingale'])),
+    'dalembert': (reference_dalembert, batched(PROGRESSIONS['dalembert'])),
+}
+
+
+def reference_blackjack(num_plays, repetitions, counting_strategy, base_bet):
+    """Runs blackjack_simulator once per repetition and returns final balances and (win, loss, draw) counts."""
+    balances, outcomes = np.empty(repetitions), np.empty((repetitions, 3))
+    for repetition in range(repetitions):
+        df = blackjack_simulator(num_plays, 0, base_bet, counting_strategy)
+        balances[repetition] = df['Balance'].iloc[-1]
+        outcomes[repetition] = df[['Win', 'Loss', 'Draw']].sum().to_numpy()
+    return balances, outcomes
+
+
+def checkpoint_blackjack(num_plays, repetitions, counting_strategy, base_bet):
+    """The checkpoint engine, recording the bankroll at the final play only."""
+    results = blackjack_checkpoints(num_plays, 0, base_bet, repetitions, counting_strategy, checkpoints=[num_plays])
+    return results.final_balances(), results.outcomes
+
+
+# name -> candidate with the signature of reference_blackjack
+BLACKJACK_ENGINES = {
+    'checkpoints': checkpoint_blackjack,
+}
+
+
+# name -> rules infinite_deck_ev is checked under
+INFINITE_DECK_RULES = {
+    'default rules': TableRules(),
+    'every rule': TableRules(hit_soft_17=True, blackjack_payout=1.2, double_after_split=False, max_hands=4,
+                             resplit_aces=True, late_surrender=True, insurance=True, dealer_peek=True),
+}
+
+
+class InfiniteShoe:
+    """A shoe that never runs out, every card is drawn independently with the rank probabilities of a full deck."""
+
+    def __init__(self):
+        self.cards = []
+
+    def deal_card(self):
+        return Card(random.choice(RANKS))
+
+
+def reference_infinite_deck(num_rounds, rules):
+    """Plays num_rounds of play_round from an InfiniteShoe, returns the net result and hands of every round and the
+    (win, loss, draw) counts."""
+    shoe, counter, player, table = InfiniteShoe(), CardCounter(), Player(0), compile_rules(rules)
+    results, hands, outcomes = np.empty(num_rounds), np.empty(num_rounds), np.zeros(3)
+    for round_number in range(num_rounds):
+        before = player.get_bankroll()
+        rows = play_round(shoe, counter, lambda card: None, player, 1, rules=table)
+        results[round_number] = player.get_bankroll() - before
+        hands[round_number] = len(rows)
+        outcomes += np.array([row[:3] for row in rows]).sum(axis=0)
+    return results, hands, outcomes
+
+
+def timed(function, *args):
+    """Returns the result of function(*args) and the seconds it took."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def distribution_checks(name, reference, candidate):
+    """Returns a KS test and a chi-square test on quantile bins of the pooled samples."""
+    ks = stats.ks_2samp(reference, candidate)
+    checks = [{'engine': name, 'check': 'final balance KS', 'statistic': float(ks.statistic), 'p_value': float(ks.pvalue)}]
+
+    # Bins hold about a tenth of the pooled sample each, ties make some of them merge
+    edges = np.unique(np.quantile(np.concatenate([reference, candidate]), np.linspace(0, 1, 11)))
+    if len(edges) > 2:
+        bins = [np.histogram(sample, bins=edges)[0] for sample in (reference, candidate)]
+        checks.append(dict(contingency_check(np.array(bins)), engine=name, check='final balance chi-square'))
+    return checks
+
+
+def contingency_check(table):
+    """Returns the chi-square statistic and p-value of a 2 x k table of counts, ignoring empty columns."""
+    table = table[:, table.sum(axis=0) > 0]
+    if table.shape[1] < 2:
+        return {'statistic': 0.0, 'p_value': 1.0}
+    statistic, p_value, _, _ = stats.chi2_contingency(table)
+    return {'statistic': float(statistic), 'p_value': float(p_value)}
+
+
+def check_roulette(repetitions, num_plays, seed):
+    """Compares every roulette candidate with its reference, returns the checks and the throughput."""
+    checks, throughput = [], {}
+    settings = (200, num_plays, 10, 'red', 400)
+    for name, (reference, candidate) in ROULETTE_ENGINES.items():
+        random.seed(seed)
+        reference_balances, reference_seconds = timed(lambda: np.array([reference(*settings) for _ in range(repetitions)]))
+        candidate_balances, candidate_seconds = timed(candidate, repetitions, *settings, seed)
+        checks += distribution_checks(name, reference_balances, candidate_balances)
+        throughput[name] = {'reference': repetitions / reference_seconds, 'candidate': repetitions / candidate_seconds,
+                            'unit': 'runs/s'}
+    return checks, throughput
+
+
+def check_blackjack(repetitions, num_plays, seed):
+    """Compares every blackjack candidate with blackjack_simulator, returns the checks and the throughput."""
+    checks, throughput = [], {}
+    random.seed(seed)
+    (reference_balances, reference_outcomes), reference_seconds = timed(reference_blackjack, num_plays, repetitions,
+                                                                        'high_low', 1)
+    for name, candidate in BLACKJACK_ENGINES.items():
+        # A different seed, so the samples are independent and the tests mean something
+        random.seed(seed + 1)
+        (balances, outcomes), seconds = timed(candidate, num_plays, repetitions, 'high_low', 1)
+        checks += distribution_checks(name, reference_balances, balances)
+        table = np.array([reference_outcomes.sum(axis=0), outcomes.sum(axis=0)])
+        checks.append(dict(contingency_check(table), engine=name, check='win/loss/draw chi-square'))
+        throughput[name] = {'reference': repetitions * num_plays / reference_seconds,
+                            'candidate': repetitions * num_plays / seconds, 'unit': 'hands/s'}
+    return checks, throughput
+
+
+def check_infinite_deck(num_rounds, seed):
+    """Compares infinite_deck_ev with play_round from an infinite shoe, returns the checks and the throughput."""
+    checks, throughput = [], {}
+    for label, rules in INFINITE_DECK_RULES.items():
+        name = f'infinite_deck {label}'
+        random.seed(seed)
+        (results, hands, outcomes), reference_seconds = timed(reference_infinite_deck, num_rounds, rules)
+        candidate, seconds = timed(lambda: infinite_deck_ev(int(hands.sum()), seed=seed + 1, rules=rules))
+
+        # The reference EV per hand is a ratio of per round sums, its standard error is the ratio estimator's
+        ev = results.sum() / hands.sum()
+        standard_error = np.std(results - ev * hands) / np.sqrt(num_rounds) / hands.mean()
+        z = (candidate.ev - ev) / np.hypot(standard_error, candidate.standard_error)
+        checks.append({'engine': name, 'check': 'EV per hand z-test', 'statistic': float(z),
+                       'p_value': float(2 * stats.norm.sf(abs(z)))})
+
+        frequencies = candidate.frequencies
+        counted = np.array([frequencies['Win'], frequencies['Loss'], frequencies['Draw']]) * candidate.hands
+        checks.append(dict(contingency_check(np.array([outcomes, np.round(counted)])), engine=name,
+                           check='win/loss/draw chi-square'))
+        throughput[name] = {'reference': hands.sum() / reference_seconds, 'candidate': candidate.hands / seconds,
+                            'unit': 'hands/s'}
+    return checks, throughput
+
+
+def simulator_rounds(df):
+    """Returns the net result and the hands settled of every round of a blackjack_simulator DataFrame."""
+    results, hands, previous, row = [], [], 0.0, 0
+    while row < len(df):
+        settled = 2 if df['Splitted'].iloc[row] else 1
+        if row + settled > len(df):
+            break
+        balance = df['Balance'].iloc[row + settled - 1]
+        results.append(balance - previous)
+        hands.append(settled)
+        previous = balance
+        row += settled
+    return np.array(results), np.array(hands)
+
+
+def check_decisions(num_plays, seed):
+    """Replays the same shuffles through blackjack_simulator and the fast engines and counts disagreements."""
+    checks = []
+
+    # Shoe replay engine against the simulator dealing from the same recorded shoes
+    record = ShoeRecord(seed, num_plays // 5 + 2)
+    shoes = iter(range(record.num_shoes))
+    df = blackjack_simulator(num_plays, 0, 1, 'high_low', deck_factory=lambda: ReplayDeck(record.shoe(next(shoes))))
+    reference_results, reference_hands = simulator_rounds(df)
+    replayed = replay([Variant('High Low', 'high_low')], record, len(reference_results))
+    agree = (replayed.outcomes[:, 0] == reference_results) & (replayed.hands[:, 0] == reference_hands)
+    checks.append({'engine': 'shoe_replay', 'check': 'round by round agreement', 'agreement': float(agree.mean()),
+                   'rounds': int(len(agree))})
+
+    # Checkpoint engine against the simulator with the same shuffles
+    checkpoints = list(range(1, num_plays + 1))
+    random.seed(seed)
+    df = blackjack_simulator(num_plays, 0, 1, 'high_low')
+    random.seed(seed)
+    balances, _ = blackjack_simulator(num_plays, 0, 1, 'high_low', checkpoints=checkpoints)
+    agree = balances == df['Balance'].to_numpy()
+    checks.append({'engine': 'checkpoints', 'check': 'hand by hand agreement', 'agreement': float(agree.mean()),
+                   'rounds': int(len(agree))})
+    return checks
+
+
+def git_revision():
+    """Returns the current commit hash, or None outside of a git checkout."""
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--alpha', type=float, default=0.001, help='chance that a conforming run is reported as failing')
+    parser.add_argument('--roulette-repetitions', type=int, default=20000)
+    parser.add_argument('--blackjack-repetitions', type=int, default=300)
+    parser.add_argument('--num-plays', type=int, default=200, help='plays or spins per repetition')
+    parser.add_argument('--infinite-rounds', type=int, default=50000, help='rounds per infinite deck rule set')
+    parser.add_argument('--decision-plays', type=int, default=20000, help='hands replayed for the agreement checks')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--record', help='append the results as a JSON line to this file')
+    args = parser.parse_args()
+
+    roulette_checks, roulette_throughput = check_roulette(args.roulette_repetitions, args.num_plays, args.seed)
+    blackjack_checks, blackjack_throughput = check_blackjack(args.blackjack_repetitions, args.num_plays, args.seed)
+    infinite_checks, infinite_throughput = check_infinite_deck(args.infinite_rounds, args.seed)
+    statistical = roulette_checks + blackjack_checks + infinite_checks
+    decisions = check_decisions(args.decision_plays, args.seed)
+
+    # Bonferroni: every test of the run shares the false positive budget
+    threshold = args.alpha / len(statistical)
+    for check in statistical:
+        check['passed'] = check['p_value'] >= threshold
+    for check in decisions:
+        check['passed'] = check['agreement'] == 1.0
+
+    for check in statistical:
+        verdict = 'ok' if check['passed'] else 'FAIL'
+        print(f"{check['engine']:<28} {check['check']:<26} statistic {check['statistic']:10.4f}   "
+              f"p {check['p_value']:.4f}   {verdict}")
+    for check in decisions:
+        verdict = 'ok' if check['passed'] else 'FAIL'
+        print(f"{check['engine']:<28} {check['check']:<26} agreement {check['agreement'] * 100:8.3f}% "
+              f"of {check['rounds']}   {verdict}")
+    for name, result in {**roulette_throughput, **blackjack_throughput, **infinite_throughput}.items():
+        print(f"{name:<28} throughput {result['reference']:12.0f} -> {result['candidate']:12.0f} {result['unit']}"
+              f"   ({result['candidate'] / result['reference']:.1f}x)")
+
+    report = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': git_revision(), 'alpha': args.alpha,
+              'threshold': threshold, 'checks': statistical + decisions,
+              'throughput': {**roulette_throughput, **blackjack_throughput, **infinite_throughput}}
+    if args.record:
+        with open(args.record, 'a') as history:
+            history.write(json.dumps(report) + '\n')
+
+    return 0 if all(check['passed'] for check in statistical + decisions) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Measures the throughput and latency of the HTTP simulation API under concurrent load.
+
+Every client thread keeps one connection open and posts the same parameter set back to back. Unless --url is given,
+the server is started in this process on a free port, which shares the interpreter with the clients; point --url at
+a server started with `python -m packages.http_api` for numbers without that contention. Run from the repository
+root:
+
+    python benchmarks/load_test.py --clients 16 --requests 50 --endpoint /roulette/martingale --record benchmarks/load_history.jsonl
+"""
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from packages.http_api import start_server  # noqa: E402
+
+
+def client(host, port, path, body, requests, latencies, statuses, start):
+    """Posts the body requests times over one connection, recording every latency and status."""
+    connection = http.client.HTTPConnection(host, port, timeout=600)
+    start.wait()
+    for _ in range(requests):
+        begin = time.perf_counter()
+        try:
+            connection.request('POST', path, body, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=600)
+            status = 'error'
+        latencies.append(time.perf_counter() - begin)
+        statuses.append(status)
+    connection.close()
+
+
+def get_json(host, port, path):
+    """Returns the decoded JSON body of a GET request."""
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    connection.request('GET', path)
+    return json.loads(connection.getresponse().read())
+
+
+def run_load(host, port, path, body, clients, requests):
+    """
+    Runs the clients against a server
+    Args:
+        host (str): server host
+        port (int): server port
+        path (str): endpoint path, query string included
+        body (bytes): JSON request body
+        clients (int): concurrent client threads
+        requests (int): requests per client
+    Returns:
+        dict: requests per second, latency percentiles in milliseconds, status counts and batching counters
+    """
+    before = get_json(host, port, '/health')['batching']
+    latencies, statuses = [], []
+    start = threading.Event()
+    threads = [threading.Thread(target=client, args=(host, port, path, body, requests, latencies, statuses, start))
+               for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    began = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    after = get_json(host, port, '/health')['batching']
+
+    milliseconds = np.array(latencies) * 1000
+    counts = {str(status): statuses.count(status) for status in sorted(set(statuses), key=str)}
+    return {'requests': len(latencies), 'seconds': elapsed, 'requests_per_second': len(latencies) / elapsed,
+            'p50_ms': float(np.percentile(milliseconds, 50)), 'p99_ms': float(np.percentile(milliseconds, 99)),
+            'max_ms': float(milliseconds.max()), 'statuses': counts,
+            'batched_runs': after['runs'] - before['runs'],
+            'batched_parameter_sets': after['parameter_sets'] - before['parameter_sets']}
+
+
+def git_revision():
+    """Returns the current commit hash, or None outside of a git checkout."""
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='base URL of a running server, e.g. http://127.0.0.1:8000')
+    parser.add_argument('--endpoint', default='/roulette/martingale', help='path to post to')
+    parser.add_argument('--body', default='{"repeats": 1000, "num_plays": 100}', help='JSON parameter set(s)')
+    parser.add_argument('--format', choices=['json', 'npz'], default='json')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50, help='requests per client')
+    parser.add_argument('--record', help='append the results as a JSON line to this file')
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        server = start_server()
+        host, port = server.server_address[:2]
+
+    path = args.endpoint + ('?format=npz' if args.format == 'npz' else '')
+    body = json.dumps(json.loads(args.body)).encode()
+    report = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': git_revision(), 'endpoint': path,
+              'body': args.body, 'clients': args.clients,
+              **run_load(host, port, path, body, args.clients, args.requests)}
+    if server is not None:
+        server.shutdown()
+
+    print(f"{report['requests']} requests to {path} from {args.clients} clients in {report['seconds']:.2f} s")
+    print(f"throughput {report['requests_per_second']:8.1f} requests/s")
+    print(f"latency    p50 {report['p50_ms']:.1f} ms   p99 {report['p99_ms']:.1f} ms   max {report['max_ms']:.1f} ms")
+    print(f"statuses   {report['statuses']}")
+    print(f"batching   {report['batched_parameter_sets']} parameter sets in {report['batched_runs']} runs")
+
+    if args.record:
+        with open(args.record, 'a') as history:
+            history.write(json.dumps(report) + '\n')
+
+    return 0 if set(report['statuses']) == {'200'} else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Measures the import time of the simulation core and the cold start of each page.
+
+Every measurement runs in a fresh interpreter so nothing is served from an already warm sys.modules.
+Run from the repository root:
+
+    python benchmarks/startup.py --repeats 5 --record benchmarks/startup_history.jsonl
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must stay importable without the plotting or web stack
+CORE_MODULES = ['packages.blackjack_logic', 'packages.data_manipulation', 'packages.ev_model', 'packages.progressions',
+                'packages.roulette_engine', 'packages.infinite_deck',
+                'packages.shoe_replay', 'packages.risk_analytics', 'packages.count_index',
+                'packages.trajectories', 'packages.simulation_service', 'packages.chunked',
+                'packages.bootstrap', 'packages.parameter_grid', 'packages.strategy_generator',
+                'packages.rare_events', 'packages.stop_rules',
+                'packages.table_simulation', 'packages.memory_planner',
+                'packages.http_api', 'packages.warm_cache']
+HEAVY_MODULES = ['streamlit', 'matplotlib', 'sklearn', 'pandas']
+
+PAGES = [
+    'pages/roulette/roulette_overview.py',
+    'pages/roulette/martingale.py',
+    'pages/roulette/reverse_martingale.py',
+    'pages/roulette/dalembert.py',
+    'pages/roulette/other_progressions.py',
+    'pages/roulette/bet_layouts.py',
+    'pages/roulette/sensitivity.py',
+    'pages/blackjack/blackjack_overview.py',
+    'pages/blackjack/strategy_explorer.py',
+    'pages/blackjack/risk_of_ruin.py',
+]
+
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+PAGE_SNIPPET = """
+import json, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({page!r}, default_timeout=600).run()
+print(json.dumps({{'seconds': time.perf_counter() - start, 'error': bool(app.exception)}}))
+"""
+
+
+def run_snippet(code):
+    """Runs code in a fresh interpreter at the repository root and returns its last line of JSON output."""
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_imports(repeats):
+    """Returns the best import time of each core module and the heavy modules it pulled in."""
+    results = {}
+    for module in CORE_MODULES:
+        runs = [run_snippet(IMPORT_SNIPPET.format(module=module, heavy=HEAVY_MODULES)) for _ in range(repeats)]
+        results[module] = {'seconds': min(run['seconds'] for run in runs), 'heavy': runs[0]['heavy']}
+    return results
+
+
+def measure_pages(repeats):
+    """Returns the best cold start time of each page, including the Streamlit import."""
+    results = {}
+    for page in PAGES:
+        runs = [run_snippet(PAGE_SNIPPET.format(page=page)) for _ in range(repeats)]
+        results[page] = {'seconds': min(run['seconds'] for run in runs), 'error': runs[0]['error']}
+    return results
+
+
+def git_revision():
+    """Returns the current commit hash, or None outside of a git checkout."""
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeats', type=int, default=3, help='fresh interpreters per measurement, the best is kept')
+    parser.add_argument('--skip-pages', action='store_true', help='only measure the core imports')
+    parser.add_argument('--record', help='append the results as a JSON line to this file')
+    args = parser.parse_args()
+
+    report = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': git_revision(),
+              'imports': measure_imports(args.repeats)}
+    if not args.skip_pages:
+        report['pages'] = measure_pages(args.repeats)
+
+    for module, result in report['imports'].items():
+        heavy = ', '.join(result['heavy']) or 'none'
+        print(f"import {module:<30} {result['seconds'] * 1000:8.1f} ms   heavy modules: {heavy}")
+    for page, result in report.get('pages', {}).items():
+        status = 'error' if result['error'] else 'ok'
+        print(f"page   {page:<40} {result['seconds'] * 1000:8.1f} ms   {status}")
+
+    if args.record:
+        with open(args.record, 'a') as history:
+            history.write(json.dumps(report) + '\n')
+
+    # Fail when the core regresses into importing the web or plotting stack
+    return 1 if any(result['heavy'] for result in report['imports'].values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
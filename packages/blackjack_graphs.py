@@ -0,0 +1,159 @@
+import matplotlib.pyplot as plt
+import numpy as np
+
+from packages.graphs import styling_configurations
+from packages.ev_model import PlayCountStats, EVModel
+from packages.blackjack_logic import blackjack_checkpoints
+from packages.trajectories import summarize_trajectories
+from packages.bootstrap import mean_curve_replicates, percentile_interval, slope_interval
+
+
+"""
+Contains the plotting methods for Blackjack strategy experimentation
+"""
+
+def blackjack_trajectories(num_plays, starting_bankroll, base_bet, repetitions, strategy, checkpoints=None, bet_ramp=None,
+                           max_points=200, samples=5, run=None, rules=None):
+    """
+    Simulates the strategy and summarizes the bankroll paths for trajectory_chart
+    Args:
+        num_plays (int): number of plays per repetition
+        starting_bankroll (int or float): starting balance
+        base_bet (int or float): bet per round
+        repetitions (int): number of simulated paths
+        strategy (string): "high_low", "zen" or "halves"
+        checkpoints (list, optional): play counts at which the bankroll is recorded
+        bet_ramp (BetRamp, optional): sizes each round's bet from the count
+        max_points (int): points kept per charted series
+        samples (int): number of paths highlighted on top of the bands
+        run (BlackjackRun, optional): run with these settings to grow instead of simulating from scratch, it records
+            its own checkpoints
+        rules (TableRules, optional): table rules, the default rules if not given
+    Returns:
+        tuple: (TrajectorySummary with the fitted trend and the bootstrap band of the mean, CheckpointResults,
+            slope of the trend, EVModel, (lower, upper) bootstrap interval of the slope)
+    """
+    # Bankroll of every repetition at the checkpoint horizons, (repetitions x checkpoints)
+    if run is not None:
+        results = run.grow(repetitions, num_plays)
+    else:
+        results = blackjack_checkpoints(num_plays, starting_bankroll, base_bet, repetitions, strategy, checkpoints,
+                                        bet_ramp=bet_ramp, rules=rules)
+
+    # Per play count statistics for the EV model
+    stats = PlayCountStats(num_plays)
+    stats.add_paths(results.checkpoints, results.balances)
+
+    # Perform linear regression on the mean balance at each checkpoint
+    x = results.checkpoints.astype(float)
+    y = results.mean()
+    slope, intercept = np.polyfit(x, y, 1) if len(x) > 1 else (0.0, y[0])
+
+    # Bootstrap the mean curve by resampling whole repetitions, the slope interval comes from the same resamples
+    replicates = mean_curve_replicates(results.balances)
+    lower, upper = percentile_interval(replicates)
+    slope_ci = slope_interval(x, replicates) if len(x) > 1 else (0.0, 0.0)
+
+    summary = summarize_trajectories(results.checkpoints, results.balances, samples=samples, max_points=max_points)
+    summary.trend = (float(slope), float(intercept))
+    summary.mean_band = (np.interp(summary.x, x, lower), np.interp(summary.x, x, upper))
+
+    return summary, results, slope, EVModel.fit(stats), slope_ci
+
+
+def blackjack_barchart(results, num_plays, repetitions):
+    
+    wins_avg, losses_avg, draws_avg = results.outcomes.sum(axis=0) / repetitions
+
+    categories = ['Wins', 'Losses', 'Draws']
+    values = [wins_avg, losses_avg, draws_avg]
+
+    # Plotting configurations
+    fig, ax = plt.subplots()
+    styling_configurations(fig, ax)
+
+    # Setting size 
+    fig.set_size_inches(10,4)
+
+    # Setting general colors and title
+    ax.bar(categories, values, color='white', edgecolor='black')
+
+    bars = ax.bar(categories, values, color='white', edgecolor='black')
+
+    # Labels
+    ax.set_title(f"Average results with {num_plays} plays, n = {repetitions}", color = 'white')
+    ax.set_ylabel("Frequency", color = 'white')
+    for label in ax.get_xticklabels():
+        label.set_color('white')
+    for label in ax.get_yticklabels():
+        label.set_color(color = 'white')
+
+    for bar, value in zip(bars, values):
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width() / 2, height, round(value, 2), 
+                ha='center', va='bottom', color='red')
+
+    return fig
+
+
+def blackjack_distribution(results, num_plays, repeats):
+    # Every repetition records its bankroll exactly at the final checkpoint
+    ending_balances = results.final_balances()
+    
+    # Plotting configurations
+    fig, ax = plt.subplots()
+    styling_configurations(fig, ax)
+
+    # Setting size 
+    fig.set_size_inches(10,4)
+
+    # Setting general colors and title
+    ax.hist(ending_balances, bins=50, color='white', edgecolor='black')
+
+    # Labels
+    ax.set_title(f"Distribution of Ending Balances, n = {repeats}", color = 'white')
+    ax.set_xlabel("Ending Balance ($USD)", color = 'white')
+    ax.set_ylabel("Frequency", color = 'white')
+    for label in ax.get_xticklabels():
+        label.set_color('white')
+    for label in ax.get_yticklabels():
+        label.set_color(color = 'white')
+
+    average_balance = ending_balances.mean()
+
+    ax.axvline(x=average_balance, color='red', linestyle='--')
+
+    # Displaying the average balance on the top left
+    ax.text(0.05, 0.95, f'Average Balance: ${average_balance:.2f}', transform=ax.transAxes, 
+            color='red', verticalalignment='top')
+
+    return fig
+
+
+def blackjack_count_ev(index, base_bet, min_rounds=100):
+    # Buckets seen too rarely in the generating simulation carry no usable estimate
+    observed = index.rounds >= min_rounds
+    buckets = index.buckets[observed]
+    ev = index.ev[observed] * base_bet
+    error = 1.96 * index.standard_error()[observed] * base_bet
+
+    # Plotting configurations
+    fig, ax = plt.subplots()
+    styling_configurations(fig, ax)
+
+    # Setting size
+    fig.set_size_inches(10,4)
+
+    ax.errorbar(buckets, ev, yerr=error, color='white', ecolor='white', marker='o', capsize=3, alpha=0.8)
+    ax.axhline(y=0, color='red', linestyle='--')
+
+    # Labels
+    ax.set_title(f"True Count vs. EV per Round, {index.rounds.sum():,} rounds", color = 'white')
+    ax.set_xlabel("True Count", color = 'white')
+    ax.set_ylabel("EV per Round ($USD)", color = 'white')
+    for label in ax.get_xticklabels():
+        label.set_color('white')
+    for label in ax.get_yticklabels():
+        label.set_color(color = 'white')
+
+    return fig
@@ -1,16 +1,13 @@
 import random
-import matplotlib.pyplot as plt
-import pandas as pd
+import threading
 import numpy as np
 
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
-
-from packages.graphs import styling_configurations
+from packages.ev_model import PlayCountStats, EVModel
 
 
 """
-Contains all classes and methods for Blackjack strategy experimentation
+Contains all classes and methods for Blackjack strategy experimentation. Only depends on NumPy at import time,
+plotting lives in packages.blackjack_graphs
 """
 
 class Card:
@@ -52,10 +49,10 @@ class Deck:
         deal_card: Removes and returns a random card from the deck.
         show_deck: Returns a string representation of all the cards in the deck.
     """
-    def __init__(self):
-        """Initialize a Deck object with 52 shuffled cards."""
-        self.cards = [Card(val) for val in ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']] * 4
-        random.shuffle(self.cards)
+    def __init__(self, decks=1, rng=None):
+        """Initialize a Deck object with decks times 52 cards shuffled by rng, the random module if not given."""
+        self.cards = [Card(val) for val in ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']] * 4 * decks
+        (rng or random).shuffle(self.cards)
 
     def deal_card(self):
         """Removes and returns the top card from the deck."""
@@ -183,6 +180,9 @@ class Player:
         win: Adds the bet amount to the bankroll.
         lose: No action required as the bet has already been placed.
         draw: Returns the bet to the bankroll.
+        settle: Returns a multiple of the bet to the bankroll.
+        insure: Places an insurance side bet.
+        collect: Adds an amount to the bankroll.
         get_bankroll: Returns the current bankroll.
         set_bet_size: Sets the bet size for the next hand.
     """
@@ -217,6 +217,19 @@ class Player:
         """Returns the bet to the bankroll."""
         self.bankroll += self.bet_size
 
+    def settle(self, multiple):
+        """Returns multiple times the bet to the bankroll, e.g. 2 for a win or 0.5 for a surrender."""
+        self.bankroll += self.bet_size * multiple
+
+    def insure(self, amount):
+        """Places an insurance side bet, deducting it from the bankroll, and returns the stake."""
+        self.bankroll -= amount
+        return amount
+
+    def collect(self, amount):
+        """Adds an amount, such as a winning side bet, to the bankroll."""
+        self.bankroll += amount
+
     def get_bankroll(self):
         """Returns the current bankroll."""
         return self.bankroll
@@ -275,7 +288,7 @@ def should_split(player_hand, dealer_up_card, count):
     return False
 
 def should_insurance(count):
-    """Returns True or False on if one should surrender"""
+    """Returns True or False on if one should take insurance"""
     if count >= 3:
         return True
     return False
@@ -441,346 +454,687 @@ def double_down(player_hand, dealer_upcard, count):
     return False
 
 
-def blackjack_simulator(num_plays, starting_bankroll, base_bet, counting_strategy):
+class Strategy:
     """
-    Simulates a Blackjack game using the high low counting strategy. 
-    Args:
-        num_plays (int): number of plays for the simulation
-        starting_bankroll (float): starting amount of money for the player
-        base_bet (float): base bet size
-    Returns:
-        DataFrame: contains information with columns ['Win', 'Loss', 'Draw','Running Count', 'Play Count']
+    Bundles the playing decisions used by the simulator, so variants can be swapped in.
+
+    Attributes:
+        name (str): Display name of the strategy.
+        hit_or_stand (function): Returns True to hit, given (player_hand, dealer_upcard, count).
+        double_down (function): Returns True to double, given (player_hand, dealer_upcard, count).
+        should_split (function): Returns True to split, given (player_hand, dealer_upcard, count).
+        should_surrender (function): Returns True to surrender, given (player_hand, dealer_upcard, count).
+        should_insurance (function): Returns True to take insurance, given (count).
     """
 
-    deck = Deck()
-    counter = CardCounter()
-    player = Player(starting_bankroll)
-    
-    counting_method = getattr(counter, counting_strategy)
-    
-    df = pd.DataFrame(columns=['Win', 'Loss', 'Draw', 'Running Count', 'Play Count', 'Player Hand Value', 'Dealer Hand Value', 'Balance', 'Splitted', 'Doubled', 'First Card', 'Second Card', 'Dealer Upcard', 'Blackjack'])
+    def __init__(self, name="Basic Strategy + Illustrious 18", hit_or_stand=hit_or_stand, double_down=double_down,
+                 should_split=should_split, should_surrender=should_surrender, should_insurance=should_insurance):
+        """Initialize a Strategy, defaulting to the decision functions of this module."""
+        self.name = name
+        self.hit_or_stand = hit_or_stand
+        self.double_down = double_down
+        self.should_split = should_split
+        self.should_surrender = should_surrender
+        self.should_insurance = should_insurance
 
-    i = 0
-    while i < num_plays:
-        
-        # New hands each round
-        player_hand = Hand()
-        dealer_hand = Hand()
 
-        # Check for deck exhaustion 
-        if len(deck.cards) < 15: # Arbitrary threshold
-            deck = Deck() 
-            counter.reset_count()
+BASIC_STRATEGY = Strategy()
 
-        # Set bet size 
-        bet_size = base_bet 
-        player.place_bet(bet_size)
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+TEN_RANKS = ['10', 'J', 'Q', 'K']
 
-        # Initial Dealing, 2 cards each, assume only the dealer's first card is shown to the player
-        for j in range(2):
-            player_card = deck.deal_card()
-            dealer_card = deck.deal_card()
 
-            player_hand.add_card(player_card)
-            dealer_hand.add_card(dealer_card)
+class TableRules:
+    """
+    Declarative description of the table rules of a Blackjack game.
 
-            counting_method(player_card)
-            if j == 0:
-                counting_method(dealer_card)
-        
-        if should_split(player_hand, dealer_hand.cards[0], counter.get_running_count()) == True:
-            # Place second bet
-            player.place_bet(bet_size)
-            
-            hand1, hand2 = split_hands(player_hand)
-            # Play both hands separately, adjusting bets and counts for each
-            
-            # Play the dealer's hand 
-            while dealer_hand.get_value() < 17:
-                dealer_hand.add_card(deck.deal_card())
-            
-            for split_hand in [hand1, hand2]:
-                
-                # Initialize our row for the dataframe
-                row = [0] * 14
-                
-                # Double initializer
-                double_bool = False
-                
-                # Place the bet for the split hand
-                split_bet = bet_size
-                player.set_bet_size(split_bet)
+    The defaults are the rules blackjack_simulator has always played: a single deck replaced below 15 cards, the
+    dealer stands on all 17s without peeking, blackjack pays 3:2, one split with doubling after it, and no
+    surrender or insurance.
 
-                if double_down(split_hand, dealer_hand.cards[0], counter.get_running_count()) == True:
-                    player.place_bet(split_bet)
-                    player.set_bet_size(split_bet * 2)
-                    
-                    double_bool = True
-                    row[9] = 1
-           
-                # Hit or Stand for splitted hand
-                split_hand.add_card(deck.deal_card())
-                while split_hand.get_value() < 21:
-                    action = hit_or_stand(split_hand, dealer_hand.cards[0], counter.get_running_count())
-                    if action:
-                        new_card = deck.deal_card()
-                        split_hand.add_card(new_card)
-                        counting_method(new_card)
-                    else:
-                        break
-                
-                # Determine win/loss/draw
-                if split_hand.get_value() > 21:
-                    player.lose()
-                    row[1] += 1
-                elif ((split_hand.cards[0].value == "A") and (split_hand.cards[1].value in ['10','K','Q','J'])) or ((split_hand.cards[0].value in ['10','K','Q','J']) and (split_hand.cards[1].value == "A")):
-                    player.blackjack()
-                    row[0] += 1
-                    row[13] += 1
-                elif dealer_hand.get_value() > 21 or split_hand.get_value() > dealer_hand.get_value():
-                    player.win()
-                    row[0] += 1
-
-                elif split_hand.get_value() == dealer_hand.get_value():
-                    player.draw()
-                    row[2] += 1
-                else:
-                    player.lose()
-                    row[1] += 1
-                
-                # Player's Cards
-                row[10] = str(split_hand.cards[0])
-                row[11] = str(split_hand.cards[1])
-                
-                # Dealer's Upcard
-                row[12] = str(dealer_hand.cards[0])
-                
-                # Play Count
-                row[4] = i + 1
-                # Running Count
-                row[3] = counter.get_running_count()
-                # Player Hand
-                row[5] = split_hand.get_value()
-                # Dealer Hand
-                row[6] = dealer_hand.get_value()
-                # Balance
-                row[7] = player.get_bankroll()
-                # Splitted
-                row[8] = 1
-                # Append row to dataframe
-                df.loc[len(df)] = row
-                i += 1
-        
+    Attributes:
+        decks (int): Number of 52 card decks in the shoe.
+        hit_soft_17 (bool): The dealer hits soft 17 (H17) instead of standing on all 17s (S17).
+        blackjack_payout (float): Winnings of a blackjack per unit bet, 1.5 for 3:2 and 1.2 for 6:5.
+        double_after_split (bool): Split hands may double (DAS).
+        max_hands (int): Most hands a round can be split into, 2 allows no resplits.
+        resplit_aces (bool): Split aces may be split again.
+        late_surrender (bool): The first two cards may be surrendered for half the bet.
+        insurance (bool): Insurance is offered under an ace, paying 2:1.
+        dealer_peek (bool): With an ace or ten up the dealer checks for blackjack, ending the round before the
+            player acts.
+        reshuffle_at (int): Cards left below which the shoe is replaced.
+    """
+
+    def __init__(self, decks=1, hit_soft_17=False, blackjack_payout=1.5, double_after_split=True, max_hands=2,
+                 resplit_aces=False, late_surrender=False, insurance=False, dealer_peek=False, reshuffle_at=15):
+        """Initialize TableRules, defaulting to the rules of blackjack_simulator."""
+        if decks < 1:
+            raise ValueError("decks must be at least 1")
+        if max_hands < 2:
+            raise ValueError("max_hands must allow at least one split")
+        if blackjack_payout <= 0:
+            raise ValueError("blackjack_payout must be positive")
+        # Fewer cards than the single deck default could run out in the middle of a round
+        if not 15 <= reshuffle_at <= 52 * decks:
+            raise ValueError(f"reshuffle_at must be between 15 and the {52 * decks} cards of the shoe")
+        self.decks = decks
+        self.hit_soft_17 = hit_soft_17
+        self.blackjack_payout = blackjack_payout
+        self.double_after_split = double_after_split
+        self.max_hands = max_hands
+        self.resplit_aces = resplit_aces
+        self.late_surrender = late_surrender
+        self.insurance = insurance
+        self.dealer_peek = dealer_peek
+        self.reshuffle_at = reshuffle_at
+
+    def __repr__(self):
+        return (f"TableRules(decks={self.decks!r}, hit_soft_17={self.hit_soft_17!r}, "
+                f"blackjack_payout={self.blackjack_payout!r}, double_after_split={self.double_after_split!r}, "
+                f"max_hands={self.max_hands!r}, resplit_aces={self.resplit_aces!r}, "
+                f"late_surrender={self.late_surrender!r}, insurance={self.insurance!r}, "
+                f"dealer_peek={self.dealer_peek!r}, reshuffle_at={self.reshuffle_at!r})")
+
+
+class CompiledRules:
+    """
+    TableRules compiled into the lookup tables play_round reads.
+
+    Every optional rule becomes the set of dealer upcards (or split ranks) it applies to, empty when the rule is off,
+    the dealer's play becomes a draw table and the payouts a table of multiples of the bet. Any rule set is then
+    played by the same code path with the same per hand cost.
+
+    Attributes:
+        rules (TableRules): rules the tables were compiled from
+        dealer_draws (list): whether the dealer draws, indexed by [hard total][holds an ace]
+        returns (dict): multiple of the bet returned for a 'win', 'blackjack', 'push', 'surrender' and 'insurance'
+        peek_upcards (frozenset): upcards under which the dealer checks for blackjack
+        insurance_upcards (frozenset): upcards under which insurance is offered
+        surrender_upcards (frozenset): upcards under which the player may surrender
+        split_double_upcards (frozenset): upcards under which split hands may double
+        resplit_ranks (frozenset): ranks a split hand may be split again on
+        max_hands (int): most hands a round can be split into
+        reshuffle_at (int): cards left below which the shoe is replaced
+
+    Methods:
+        new_deck: Returns a freshly shuffled shoe.
+        play_dealer: Draws the dealer's cards.
+    """
+
+    def __init__(self, rules):
+        """Compile the tables of a TableRules."""
+        every, none = frozenset(RANKS), frozenset()
+        self.rules = rules
+        # Index 31 covers the largest hard total a drawing dealer can reach, 16 plus a ten
+        self.dealer_draws = []
+        for hard in range(32):
+            soft_total = hard + 10
+            self.dealer_draws.append([hard < 17,
+                                      soft_total < 17 or (soft_total == 17 and rules.hit_soft_17) if soft_total <= 21
+                                      else hard < 17])
+        self.returns = {'win': 2, 'blackjack': 2 + rules.blackjack_payout, 'push': 1, 'surrender': 0.5, 'insurance': 3}
+        self.peek_upcards = frozenset(TEN_RANKS + ['A']) if rules.dealer_peek else none
+        self.insurance_upcards = frozenset(['A']) if rules.insurance else none
+        self.surrender_upcards = every if rules.late_surrender else none
+        self.split_double_upcards = every if rules.double_after_split else none
+        self.resplit_ranks = every if rules.resplit_aces else every - {'A'}
+        self.max_hands = rules.max_hands
+        self.reshuffle_at = rules.reshuffle_at
+
+    def new_deck(self, rng=None):
+        """Returns a freshly shuffled shoe of the rules' number of decks, shuffled by rng if given."""
+        return Deck(self.rules.decks, rng)
+
+    def play_dealer(self, dealer_hand, deck):
+        """Draws the dealer's cards from the deck until the draw table says stand."""
+        first, second = dealer_hand.cards
+        hard = first.get_value() + second.get_value()
+        ace = first.value == 'A' or second.value == 'A'
+        while self.dealer_draws[hard][ace]:
+            card = deck.deal_card()
+            dealer_hand.add_card(card)
+            hard += card.get_value()
+            ace = ace or card.value == 'A'
+
+
+def compile_rules(rules):
+    """Compiles TableRules into the tables play_round reads, once per run, rules already compiled are returned as is."""
+    return rules if isinstance(rules, CompiledRules) else CompiledRules(rules)
+
+
+DEFAULT_RULES = TableRules()
+DEFAULT_TABLE = compile_rules(DEFAULT_RULES)
+
+
+def is_natural(hand):
+    """Returns whether the first two cards of a hand are an ace and a ten valued card."""
+    first, second = hand.cards[0].value, hand.cards[1].value
+    return (first == 'A' and second in TEN_RANKS) or (first in TEN_RANKS and second == 'A')
+
+
+def _settle(hand, dealer_value, row, player, rules):
+    """Pays out one finished hand against the dealer's final value and marks its outcome in the row."""
+    value = hand.get_value()
+    if value > 21:
+        player.lose()
+        row[1] = 1
+    elif is_natural(hand):
+        player.settle(rules.returns['blackjack'])
+        row[0] = 1
+        row[13] = 1
+    elif dealer_value > 21 or value > dealer_value:
+        player.settle(rules.returns['win'])
+        row[0] = 1
+    elif value == dealer_value:
+        player.settle(rules.returns['push'])
+        row[2] = 1
+    else:
+        player.lose()
+        row[1] = 1
+
+
+def _record(row, hand, dealer_hand, counter, player):
+    """Fills in the cards, values, count and bankroll columns of a settled hand's row."""
+    # Player's Cards
+    row[10] = str(hand.cards[0])
+    row[11] = str(hand.cards[1])
+    # Dealer's Upcard
+    row[12] = str(dealer_hand.cards[0])
+    # Running Count
+    row[3] = counter.get_running_count()
+    # Player Hand
+    row[5] = hand.get_value()
+    # Dealer Hand
+    row[6] = dealer_hand.get_value()
+    # Balance
+    row[7] = player.get_bankroll()
+
+
+def play_round(deck, counter, counting_method, player, base_bet, strategy=BASIC_STRATEGY, rules=DEFAULT_TABLE):
+    """
+    Plays one round of Blackjack, a split round settles one hand per split hand
+    Args:
+        deck (Deck): deck the cards are dealt from
+        counter (CardCounter): counter holding the running count
+        counting_method (function): bound counting method of the counter, e.g. counter.high_low
+        player (Player): player whose bankroll is settled
+        base_bet (float): bet size of the round
+        strategy (Strategy): playing decisions
+        rules (CompiledRules): compiled table rules, the default rules if not given
+    Returns:
+        list: one row per hand settled, in the column order of blackjack_simulator with 'Play Count' left at 0.
+            A surrendered hand counts as a loss
+    """
+    rows = []
+
+    # New hands each round
+    player_hand = Hand()
+    dealer_hand = Hand()
+
+    # Set bet size 
+    bet_size = base_bet 
+    player.place_bet(bet_size)
+
+    # Initial Dealing, 2 cards each, assume only the dealer's first card is shown to the player
+    for j in range(2):
+        player_card = deck.deal_card()
+        dealer_card = deck.deal_card()
+
+        player_hand.add_card(player_card)
+        dealer_hand.add_card(dealer_card)
+
+        counting_method(player_card)
+        if j == 0:
+            counting_method(dealer_card)
+
+    upcard = dealer_hand.cards[0]
+
+    # Insurance pays 2:1 on the dealer's blackjack, offered only under the upcards the rules allow
+    if upcard.value in rules.insurance_upcards and strategy.should_insurance(counter.get_running_count()):
+        insurance = player.insure(bet_size / 2)
+        if is_natural(dealer_hand):
+            player.collect(insurance * rules.returns['insurance'])
+
+    # A peeking dealer ends the round on a blackjack before the player acts, a player blackjack pushes
+    if upcard.value in rules.peek_upcards and is_natural(dealer_hand):
+        row = [0] * 14
+        if is_natural(player_hand):
+            player.settle(rules.returns['push'])
+            row[2] = 1
         else:
+            player.lose()
+            row[1] = 1
+        _record(row, player_hand, dealer_hand, counter, player)
+        rows.append(row)
+        return rows
+
+    if strategy.should_split(player_hand, upcard, counter.get_running_count()) == True:
+        # Place second bet
+        player.place_bet(bet_size)
+        
+        hands = list(split_hands(player_hand))
+        # Play every hand separately, adjusting bets and counts for each
+        
+        # Play the dealer's hand 
+        rules.play_dealer(dealer_hand, deck)
+
+        index = 0
+        while index < len(hands):
+            split_hand = hands[index]
+            
             # Initialize our row for the dataframe
             row = [0] * 14
+            
             # Double initializer
             double_bool = False
             
-            # Double bet if applicable
-            if double_down(player_hand, dealer_hand.cards[0], counter.get_running_count()) == True:
-                player.place_bet(bet_size)
-                player.set_bet_size(bet_size * 2)
-                row[9] = 1
+            # Place the bet for the split hand
+            split_bet = bet_size
+            player.set_bet_size(split_bet)
+
+            if (upcard.value in rules.split_double_upcards
+                    and strategy.double_down(split_hand, upcard, counter.get_running_count()) == True):
+                player.place_bet(split_bet)
+                player.set_bet_size(split_bet * 2)
+                
                 double_bool = True
-            
-            # Deal one more card if doubled down
-            if double_bool == True:
-                double_new_card = deck.deal_card()
-                player_hand.add_card(double_new_card)
-                counting_method(double_new_card)
-            
-            # Hit or Stand
-            while (player_hand.get_value() < 21) and (double_bool == False):
-                action = hit_or_stand(player_hand, dealer_hand.cards[0], counter.get_running_count())
+                row[9] = 1
+       
+            split_hand.add_card(deck.deal_card())
+
+            # Resplit a new pair into two hands in its place, each is then played from its first card
+            if (not double_bool and len(hands) < rules.max_hands and split_hand.cards[0].value in rules.resplit_ranks
+                    and strategy.should_split(split_hand, upcard, counter.get_running_count()) == True):
+                player.place_bet(split_bet)
+                hands[index:index + 1] = split_hands(split_hand)
+                continue
+
+            # Hit or Stand for splitted hand
+            while split_hand.get_value() < 21:
+                action = strategy.hit_or_stand(split_hand, upcard, counter.get_running_count())
                 if action:
                     new_card = deck.deal_card()
-                    player_hand.add_card(new_card)
+                    split_hand.add_card(new_card)
                     counting_method(new_card)
                 else:
                     break
             
-            # Dealer hits or stands
-            while dealer_hand.get_value() < 17:
-                dealer_hand.add_card(deck.deal_card())
-            
-            # Conditions
-            if player_hand.get_value() > 21:
-                player.lose()
-                row[1] = 1
-            elif (player_hand.get_value() == 21) and ((player_hand.cards[0].value == "A") and (player_hand.cards[1].value in ['10','K','Q','J'])) or ((player_hand.cards[0].value in ['10','K','Q','J']) and (player_hand.cards[1].value == "A")):
-                player.blackjack()
-                row[0] += 1
-                row[13] += 1
-            elif dealer_hand.get_value() > 21:
-                player.win()
-                row[0] = 1
-            elif player_hand.get_value() > dealer_hand.get_value():
-                player.win()
-                row[0] = 1
-            elif player_hand.get_value() == dealer_hand.get_value():
-                player.draw()
-                row[2] = 1
-            else:
-                player.lose()
-                row[1] = 1
-            
-            # Player's Cards
-            row[10] = str(player_hand.cards[0])
-            row[11] = str(player_hand.cards[1])
-            # Dealer's Upcard
-            row[12] = str(dealer_hand.cards[0])
-            
-            # Play Count
-            row[4] = i + 1
-            # Running Count
-            row[3] = counter.get_running_count()
-            # Player Hand
-            row[5] = player_hand.get_value()
-            # Dealer Hand
-            row[6] = dealer_hand.get_value()
-            # Balance
-            row[7] = player.get_bankroll()
-            
-            # Append row to dataframe
-            df.loc[len(df)] = row
-
-            i += 1
+            # Determine win/loss/draw
+            _settle(split_hand, dealer_hand.get_value(), row, player, rules)
+            _record(row, split_hand, dealer_hand, counter, player)
+            # Splitted
+            row[8] = 1
+            rows.append(row)
+            index += 1
+
+        return rows
+
+    # Initialize our row for the dataframe
+    row = [0] * 14
+
+    # Late surrender gives up half the bet on the first two cards, only under the upcards the rules allow
+    if upcard.value in rules.surrender_upcards and strategy.should_surrender(player_hand, upcard, counter.get_running_count()):
+        player.settle(rules.returns['surrender'])
+        row[1] = 1
+        _record(row, player_hand, dealer_hand, counter, player)
+        rows.append(row)
+        return rows
+
+    # Double initializer
+    double_bool = False
     
-    return df
-
-def blackjack_lineplot(num_plays, starting_bankroll, base_bet, repetitions, strategy):
+    # Double bet if applicable
+    if strategy.double_down(player_hand, upcard, counter.get_running_count()) == True:
+        player.place_bet(bet_size)
+        player.set_bet_size(bet_size * 2)
+        row[9] = 1
+        double_bool = True
     
-    # Plotting configurations
-    fig, ax = plt.subplots()
-    styling_configurations(fig, ax)
+    # Deal one more card if doubled down
+    if double_bool == True:
+        double_new_card = deck.deal_card()
+        player_hand.add_card(double_new_card)
+        counting_method(double_new_card)
+    
+    # Hit or Stand
+    while (player_hand.get_value() < 21) and (double_bool == False):
+        action = strategy.hit_or_stand(player_hand, upcard, counter.get_running_count())
+        if action:
+            new_card = deck.deal_card()
+            player_hand.add_card(new_card)
+            counting_method(new_card)
+        else:
+            break
+    
+    # Dealer hits or stands
+    rules.play_dealer(dealer_hand, deck)
+    
+    # Conditions
+    _settle(player_hand, dealer_hand.get_value(), row, player, rules)
+    _record(row, player_hand, dealer_hand, counter, player)
+    rows.append(row)
+
+    return rows
+
+
+def blackjack_simulator(num_plays, starting_bankroll, base_bet, counting_strategy, strategy=BASIC_STRATEGY, deck_factory=None,
+                        checkpoints=None, bet_ramp=None, rules=None):
+    """
+    Simulates a Blackjack game using the high low counting strategy. 
+    Args:
+        num_plays (int): number of plays for the simulation
+        starting_bankroll (float): starting amount of money for the player
+        base_bet (float): base bet size
+        counting_strategy (string): name of the CardCounter method, "high_low", "zen" or "halves"
+        strategy (Strategy): playing decisions, the module's basic strategy by default
+        deck_factory (function, optional): returns a fresh deck whenever the deck runs low, a shoe of the rules'
+            number of decks by default
+        checkpoints (list, optional): play counts at which to record the bankroll instead of keeping every hand
+        bet_ramp (BetRamp, optional): sizes each round's bet from the count, base_bet is bet flat otherwise
+        rules (TableRules, optional): table rules, compiled once at the start of the run, DEFAULT_RULES if not given
+    Returns:
+        DataFrame: contains information with columns ['Win', 'Loss', 'Draw','Running Count', 'Play Count']
+        or, when checkpoints are given,
+        tuple: (bankroll after each checkpoint's hand, [wins, losses, draws] over the first num_plays hands)
+    """
 
-    # Setting size 
-    fig.set_size_inches(10,4)
+    if checkpoints is not None:
+        run = SimulatorRun(starting_bankroll, base_bet, counting_strategy, strategy, deck_factory, bet_ramp, rules)
+        return run.play_to(num_plays, validate_checkpoints(checkpoints, num_plays))
 
-    # Labels
-    ax.set_title(f"Number of Plays vs. ΔBalance, n = {repetitions}", color = 'white')
-    ax.set_xlabel("Number of Plays", color = 'white')
-    ax.set_ylabel("ΔBalance ($USD)", color = 'white')
+    table = compile_rules(rules or DEFAULT_RULES)
+    deck_factory = deck_factory or table.new_deck
+    deck = deck_factory()
+    counter = CardCounter()
+    player = Player(starting_bankroll)
     
-    styling_configurations(fig, ax)
-    for label in ax.get_xticklabels():
-        label.set_color('white')
-    for label in ax.get_yticklabels():
-        label.set_color(color = 'white')
-
-    # Create a DataFrame to hold the balances across all repetitions
-    overall_df = pd.DataFrame(columns=['Play Count', 'Balance', 'Win', 'Loss', 'Draw'])
-
-    for _ in range(repetitions):
-        df = blackjack_simulator(num_plays, starting_bankroll, base_bet, strategy)
-        ax.plot(df['Play Count'], df['Balance'], alpha=0.5)
-        overall_df = pd.concat([overall_df, df[['Play Count', 'Balance', 'Win', 'Loss', 'Draw']]])
-
-    # Calculate the mean of the balances at each play count
-    mean_df = overall_df.groupby('Play Count', as_index=False).mean()
+    counting_method = getattr(counter, counting_strategy)
     
-    # Perform linear regression on the overall data
-    x = mean_df['Play Count'].astype(float)
-    y = mean_df['Balance'].astype(float)
-    slope, intercept = np.polyfit(x, y, 1)
+    rows = []
 
-    # Create x values for the line
-    x_values = np.linspace(min(x), max(x), num_plays)
+    i = 0
+    while i < num_plays:
 
-    # Compute corresponding y values
-    y_values = slope * x_values + intercept
+        # Check for deck exhaustion 
+        if len(deck.cards) < table.reshuffle_at:
+            deck = deck_factory() 
+            counter.reset_count()
 
-    # Plot the regression line
-    ax.plot(x_values, y_values, color='white', linestyle='--')
+        # Size the bet from the count before the cards are dealt
+        bet_size = base_bet
+        if bet_ramp is not None:
+            bet_size = bet_ramp.bet(counter.get_running_count(), len(deck.cards), player.get_bankroll())
 
-    return fig, overall_df, slope
+        for row in play_round(deck, counter, counting_method, player, bet_size, strategy, table):
+            i += 1
+            # Play Count
+            row[4] = i
+            rows.append(row)
 
+    import pandas as pd
 
-def blackjack_barchart(df, num_plays, repetitions):
-    
-    wins_avg = df['Win'].sum() / repetitions
-    losses_avg = df['Loss'].sum() / repetitions
-    draws_avg = df['Draw'].sum() / repetitions
+    return pd.DataFrame(rows, columns=['Win', 'Loss', 'Draw', 'Running Count', 'Play Count', 'Player Hand Value', 'Dealer Hand Value', 'Balance', 'Splitted', 'Doubled', 'First Card', 'Second Card', 'Dealer Upcard', 'Blackjack'])
 
-    categories = ['Wins', 'Losses', 'Draws']
-    values = [wins_avg, losses_avg, draws_avg]
 
-    # Plotting configurations
-    fig, ax = plt.subplots()
-    styling_configurations(fig, ax)
+class SimulatorRun:
+    """
+    One simulator run that can be played on after it stops.
 
-    # Setting size 
-    fig.set_size_inches(10,4)
+    The shoe, the running count, the bankroll and any hand a final split dealt past the horizon are kept between
+    calls, so playing to a later horizon continues the same shoe exactly as one longer run would.
 
-    # Setting general colors and title
-    ax.bar(categories, values, color='white', edgecolor='black')
+    Attributes:
+        deck (Deck): shoe the next round is dealt from
+        counter (CardCounter): counter holding the running count
+        player (Player): player holding the bankroll
+        play_count (int): hands dealt so far, including any past the horizon
+        horizon (int): hands the run has been played to
 
-    bars = ax.bar(categories, values, color='white', edgecolor='black')
+    Methods:
+        play_to: Plays on up to a number of hands and records the bankroll at checkpoints.
+    """
 
-    # Labels
-    ax.set_title(f"Average results with {num_plays} plays, n = {repetitions}", color = 'white')
-    ax.set_ylabel("Frequency", color = 'white')
-    for label in ax.get_xticklabels():
-        label.set_color('white')
-    for label in ax.get_yticklabels():
-        label.set_color(color = 'white')
+    def __init__(self, starting_bankroll, base_bet, counting_strategy, strategy=BASIC_STRATEGY, deck_factory=None,
+                 bet_ramp=None, rules=None):
+        """Initialize a SimulatorRun with a fresh shoe, the arguments are those of blackjack_simulator."""
+        self._rules = compile_rules(rules or DEFAULT_RULES)
+        deck_factory = deck_factory or self._rules.new_deck
+        self.deck = deck_factory()
+        self.counter = CardCounter()
+        self.player = Player(starting_bankroll)
+        self.play_count = 0
+        self.horizon = 0
+        self._counting_method = getattr(self.counter, counting_strategy)
+        self._base_bet = base_bet
+        self._strategy = strategy
+        self._deck_factory = deck_factory
+        self._bet_ramp = bet_ramp
+        # (play count, [win, loss, draw], bankroll) of hands settled past the horizon
+        self._pending = []
+
+    def play_to(self, num_plays, checkpoints):
+        """
+        Plays the run on from its current horizon up to num_plays hands
+        Args:
+            num_plays (int): new horizon, at least the current one
+            checkpoints (np.array): sorted play counts after the current horizon and up to num_plays to record
+        Returns:
+            tuple: (bankroll after each checkpoint's hand, [wins, losses, draws] over the hands up to the new horizon
+                that were not counted before)
+        """
+        balances = np.empty(len(checkpoints))
+        outcomes = np.zeros(3)
+        next_checkpoint = 0
+
+        def settle(play_count, outcome, bankroll):
+            nonlocal next_checkpoint
+            # A split settles two hands, each is its own play so every horizon is hit exactly
+            if play_count > num_plays:
+                self._pending.append((play_count, outcome, bankroll))
+                return
+            outcomes[:] += outcome
+            while next_checkpoint < len(checkpoints) and checkpoints[next_checkpoint] == play_count:
+                balances[next_checkpoint] = bankroll
+                next_checkpoint += 1
+
+        pending, self._pending = self._pending, []
+        for hand in pending:
+            settle(*hand)
+
+        while self.play_count < num_plays:
+
+            # Check for deck exhaustion
+            if len(self.deck.cards) < self._rules.reshuffle_at:
+                self.deck = self._deck_factory()
+                self.counter.reset_count()
+
+            # Size the bet from the count before the cards are dealt
+            bet_size = self._base_bet
+            if self._bet_ramp is not None:
+                bet_size = self._bet_ramp.bet(self.counter.get_running_count(), len(self.deck.cards),
+                                              self.player.get_bankroll())
+
+            for row in play_round(self.deck, self.counter, self._counting_method, self.player, bet_size, self._strategy,
+                                  self._rules):
+                self.play_count += 1
+                settle(self.play_count, row[0:3], row[7])
+
+        self.horizon = num_plays
+        return balances, outcomes
+
+
+def default_checkpoints(num_plays, every=None):
+    """
+    Returns the play counts recorded by default: every few plays plus the final one
+    Args:
+        num_plays (int): number of plays for the simulation
+        every (int, optional): spacing of the checkpoints, by default about 50 checkpoints in total
+    Returns:
+        list: increasing play counts ending at num_plays
+    """
+    every = every or max(1, num_plays // 50)
+    return list(range(every, num_plays, every)) + [num_plays]
 
-    for bar, value in zip(bars, values):
-        height = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width() / 2, height, round(value, 2), 
-                ha='center', va='bottom', color='red')
 
-    return fig
+def validate_checkpoints(checkpoints, num_plays):
+    """Returns the checkpoints as a sorted array of unique play counts between 1 and num_plays."""
+    checkpoints = np.unique(np.asarray(checkpoints, dtype=np.int64))
+    if len(checkpoints) == 0 or checkpoints[0] < 1 or checkpoints[-1] > num_plays:
+        raise ValueError(f"Checkpoints must be play counts between 1 and {num_plays}")
+    return checkpoints
 
 
-def blackjack_distribution(df, num_plays, repeats):
-    data = df[df.get('Play Count') == num_plays]
-    
-    # Plotting configurations
-    fig, ax = plt.subplots()
-    styling_configurations(fig, ax)
+class CheckpointResults:
+    """
+    Bankrolls of many simulation runs recorded at fixed checkpoint horizons.
 
-    # Setting size 
-    fig.set_size_inches(10,4)
+    Attributes:
+        checkpoints (np.array): play counts that were recorded
+        balances (np.array): bankroll after each checkpoint, shape (repetitions, checkpoints)
+        outcomes (np.array): wins, losses and draws of each run, shape (repetitions, 3)
 
-    # Setting general colors and title
-    ax.hist(data['Balance'], bins=50, color='white', edgecolor='black')
+    Methods:
+        final_balances: Returns the ending bankroll of every run.
+        mean: Returns the mean bankroll at every checkpoint.
+    """
 
-    # Labels
-    ax.set_title(f"Distribution of Ending Balances, n = {repeats}", color = 'white')
-    ax.set_xlabel("Ending Balance ($USD)", color = 'white')
-    ax.set_ylabel("Frequency", color = 'white')
-    for label in ax.get_xticklabels():
-        label.set_color('white')
-    for label in ax.get_yticklabels():
-        label.set_color(color = 'white')
+    def __init__(self, checkpoints, balances, outcomes):
+        """Initialize CheckpointResults."""
+        self.checkpoints = checkpoints
+        self.balances = balances
+        self.outcomes = outcomes
 
-    average_balance = data.get('Balance').mean()
+    def final_balances(self):
+        """Returns the ending bankroll of every run."""
+        return self.balances[:, -1]
 
-    ax.axvline(x=average_balance, color='red', linestyle='--')
+    def mean(self):
+        """Returns the mean bankroll at every checkpoint."""
+        return self.balances.mean(axis=0)
 
-    # Displaying the average balance on the top left
-    ax.text(0.05, 0.95, f'Average Balance: ${average_balance:.2f}', transform=ax.transAxes, 
-            color='red', verticalalignment='top')
 
-    return fig
+def blackjack_checkpoints(num_plays, starting_bankroll, base_bet, repetitions, counting_strategy, checkpoints=None,
+                          strategy=BASIC_STRATEGY, bet_ramp=None, rules=None, deck_factory=None):
+    """
+    Runs the simulator many times, recording only the bankroll at each checkpoint
+    Args:
+        num_plays (int): number of plays for each simulation
+        starting_bankroll (float): starting amount of money for the player
+        base_bet (float): base bet size
+        repetitions (int): number of simulations
+        counting_strategy (string): name of the CardCounter method
+        checkpoints (list, optional): play counts to record, default_checkpoints(num_plays) if not given
+        strategy (Strategy): playing decisions
+        bet_ramp (BetRamp, optional): sizes each round's bet from the count
+        rules (TableRules, optional): table rules, DEFAULT_RULES if not given
+        deck_factory (function, optional): returns a fresh shoe whenever one runs low, as for blackjack_simulator
+    Returns:
+        CheckpointResults: (repetitions x checkpoints) bankrolls and per run outcome counts
+    """
+    checkpoints = validate_checkpoints(default_checkpoints(num_plays) if checkpoints is None else checkpoints, num_plays)
+    # Compiled once for every repetition
+    table = compile_rules(rules or DEFAULT_RULES)
+    balances = np.empty((repetitions, len(checkpoints)))
+    outcomes = np.empty((repetitions, 3))
+    for repetition in range(repetitions):
+        balances[repetition], outcomes[repetition] = blackjack_simulator(num_plays, starting_bankroll, base_bet,
+                                                                         counting_strategy, strategy, deck_factory,
+                                                                         checkpoints=checkpoints, bet_ramp=bet_ramp,
+                                                                         rules=table)
+    return CheckpointResults(checkpoints, balances, outcomes)
+
+
+class BlackjackRun:
+    """
+    Many simulator runs recorded at checkpoints that can be grown instead of recomputed.
 
+    Raising the number of plays continues every run from the hand it stopped at and records the new default
+    checkpoints past the old horizon, adding repetitions only plays the new runs. The global random module keeps
+    shuffling the shoes, as in blackjack_checkpoints, so a grown run matches a fresh one in distribution.
 
-def regressor(df):
-    
-    X = df[['Play Count']].values
-    y = df['Balance']
+    Attributes:
+        num_plays (int): plays every repetition has been played up to
+        checkpoints (np.array): play counts recorded so far
+        balances (np.array): bankroll after each checkpoint, shape (repetitions, checkpoints)
+        outcomes (np.array): wins, losses and draws of each run, shape (repetitions, 3)
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Assign weights as inverse of variance
-    weights = 1 / (y_train.var())
+    Methods:
+        extend: Plays every repetition on up to a larger number of plays.
+        add_repetitions: Plays further repetitions up to the current number of plays.
+        grow: Extends and adds repetitions as needed, then returns the results.
+        results: Returns the CheckpointResults of the run.
+    """
 
-    model = LinearRegression() 
-    model.fit(X_train, y_train, sample_weight=weights)
+    def __init__(self, starting_bankroll, base_bet, counting_strategy, strategy=BASIC_STRATEGY, bet_ramp=None, rules=None):
+        """Initialize an empty BlackjackRun, the arguments are those of blackjack_checkpoints."""
+        self.num_plays = 0
+        self.checkpoints = np.empty(0, dtype=np.int64)
+        self.balances = np.empty((0, 0))
+        self.outcomes = np.empty((0, 3))
+        self._arguments = (starting_bankroll, base_bet, counting_strategy, strategy, None, bet_ramp,
+                           compile_rules(rules or DEFAULT_RULES))
+        self._runs = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        # Settings and size only, two runs with the same repr give results from the same distribution
+        starting_bankroll, base_bet, counting_strategy, strategy, _, bet_ramp, table = self._arguments
+        return (f"BlackjackRun({starting_bankroll!r}, {base_bet!r}, {counting_strategy!r}, strategy={strategy.name!r}, "
+                f"bet_ramp={bet_ramp!r}, rules={table.rules!r}, num_plays={self.num_plays!r}, "
+                f"repetitions={len(self._runs)!r})")
+
+    def extend(self, num_plays, checkpoints=None):
+        """Plays every repetition on up to num_plays, recording the checkpoints past the current horizon."""
+        with self._lock:
+            if num_plays < self.num_plays:
+                raise ValueError(f"The run has already been played to {self.num_plays} plays")
+            checkpoints = validate_checkpoints(default_checkpoints(num_plays) if checkpoints is None else checkpoints,
+                                               num_plays)
+            added = np.union1d(checkpoints[checkpoints > self.num_plays], [num_plays]) if num_plays > self.num_plays \
+                else np.empty(0, dtype=np.int64)
+            balances = np.empty((len(self._runs), len(added)))
+            for repetition, run in enumerate(self._runs):
+                balances[repetition], outcomes = run.play_to(num_plays, added)
+                self.outcomes[repetition] += outcomes
+            self.checkpoints = np.concatenate([self.checkpoints, added]).astype(np.int64)
+            self.balances = np.hstack([self.balances, balances])
+            self.num_plays = num_plays
+        return self
+
+    def add_repetitions(self, repetitions):
+        """Plays repetitions further runs up to the current number of plays."""
+        with self._lock:
+            balances = np.empty((repetitions, len(self.checkpoints)))
+            outcomes = np.empty((repetitions, 3))
+            for repetition in range(repetitions):
+                run = SimulatorRun(*self._arguments)
+                balances[repetition], outcomes[repetition] = run.play_to(self.num_plays, self.checkpoints)
+                self._runs.append(run)
+            self.balances = np.vstack([self.balances, balances])
+            self.outcomes = np.vstack([self.outcomes, outcomes])
+        return self
+
+    def grow(self, repetitions, num_plays):
+        """Grows the run to at least repetitions runs of num_plays plays and returns the first repetitions of them."""
+        if num_plays != self.num_plays:
+            self.extend(num_plays)
+        if repetitions > len(self._runs):
+            self.add_repetitions(repetitions - len(self._runs))
+        return self.results(repetitions)
+
+    def results(self, repetitions=None):
+        """Returns the CheckpointResults of the first repetitions runs, every run by default."""
+        with self._lock:
+            return CheckpointResults(self.checkpoints, self.balances[:repetitions], self.outcomes[:repetitions])
 
-    # Predict each x value
-    y_pred = model.predict(X_test)
 
-    return model
\ No newline at end of file
+def regressor(df):
+    """
+    Fits the weighted least squares EV model on a simulation dataframe
+    Args:
+        df (DataFrame): contains the columns 'Play Count' and 'Balance'
+    Returns:
+        EVModel: model whose predict method returns the expected balance at a play count
+    """
+    return EVModel.fit(PlayCountStats.from_dataframe(df))
@@ -0,0 +1,110 @@
+import numpy as np
+
+"""
+Contains the vectorized bootstrap behind the confidence intervals of the reported statistics.
+
+Resample index matrices are drawn in one shot and the statistics are computed along the resample axis, in blocks of
+resamples sized so that no block holds more than max_bytes. Means of many columns, such as the per play count mean
+curve, are bootstrapped with multinomial resample weights and a single matrix product instead.
+"""
+
+# Largest resample block held in memory at once
+MAX_BYTES = 64 * 2 ** 20
+
+
+def _blocks(resamples, bytes_per_resample, max_bytes):
+    """Yields the sizes of resample blocks that each fit within max_bytes."""
+    size = max(1, int(max_bytes // max(bytes_per_resample, 1)))
+    for start in range(0, resamples, size):
+        yield min(size, resamples - start)
+
+
+def percentile_interval(replicates, level=0.95):
+    """Returns the (lower, upper) percentile interval of bootstrap replicates along the first axis."""
+    tail = (1 - level) / 2 * 100
+    lower, upper = np.percentile(replicates, [tail, 100 - tail], axis=0)
+    return lower, upper
+
+
+def bootstrap(samples, statistic, resamples=1000, level=0.95, seed=None, max_bytes=MAX_BYTES):
+    """
+    Bootstraps one statistic of a sample
+    Args:
+        samples (np.array): observed values
+        statistic (function): called as statistic(resampled, axis=1) on a (resamples x n) block, returns one value per row
+        resamples (int): number of bootstrap resamples
+        level (float): confidence level of the interval
+        seed (int, optional): seed for the resample indices
+        max_bytes (int): memory cap of one block of resampled values
+    Returns:
+        tuple: (lower, upper) bounds of the percentile interval
+    """
+    samples = np.asarray(samples, dtype=float)
+    rng = np.random.default_rng(seed)
+    replicates = np.concatenate([statistic(samples[rng.integers(0, len(samples), size=(block, len(samples)))], axis=1)
+                                 for block in _blocks(resamples, 16 * len(samples), max_bytes)])
+    return percentile_interval(replicates, level)
+
+
+def mode(values, axis=1):
+    """Returns the smallest most frequent value of every row of a 2D array, as pandas' mode().iloc[0]."""
+    distinct, codes = np.unique(values, return_inverse=True)
+    codes = codes.reshape(values.shape)
+    if axis == 0:
+        codes = codes.T
+    rows = codes.shape[0]
+    # One bincount over row offset codes counts every row at once
+    counts = np.bincount((codes + np.arange(rows)[:, None] * len(distinct)).ravel(), minlength=rows * len(distinct))
+    return distinct[counts.reshape(rows, len(distinct)).argmax(axis=1)]
+
+
+def share_at_least(threshold):
+    """Returns a statistic giving the percentage of every row at or above threshold."""
+    def statistic(values, axis=1):
+        return (values >= threshold).mean(axis=axis) * 100
+    return statistic
+
+
+def share_below(threshold):
+    """Returns a statistic giving the percentage of every row below threshold."""
+    def statistic(values, axis=1):
+        return (values < threshold).mean(axis=axis) * 100
+    return statistic
+
+
+def sample_std(values, axis=1):
+    """Sample standard deviation along an axis, as pandas' std()."""
+    return np.std(values, axis=axis, ddof=1)
+
+
+def mean_curve_replicates(paths, resamples=1000, seed=None, max_bytes=MAX_BYTES):
+    """
+    Bootstraps the mean curve of many paths by resampling whole paths
+    Args:
+        paths (np.array): one path per row, e.g. the balances at every checkpoint, shape (repetitions, points)
+        resamples (int): number of bootstrap resamples
+        seed (int, optional): seed for the resample weights
+        max_bytes (int): memory cap of one block of resample weights
+    Returns:
+        np.array: mean curve of every resample, shape (resamples, points)
+    """
+    paths = np.asarray(paths, dtype=float)
+    repetitions = len(paths)
+    rng = np.random.default_rng(seed)
+    # Drawing n paths with replacement is a multinomial count per path, the resampled mean is then a product
+    return np.concatenate([rng.multinomial(repetitions, np.full(repetitions, 1 / repetitions), size=block) @ paths / repetitions
+                           for block in _blocks(resamples, 8 * (repetitions + paths.shape[1]), max_bytes)])
+
+
+def mean_curve_band(paths, resamples=1000, level=0.95, seed=None, max_bytes=MAX_BYTES):
+    """Returns the (lower, upper) bootstrap band of the mean curve of many paths, one bound per point."""
+    return percentile_interval(mean_curve_replicates(paths, resamples, seed, max_bytes), level)
+
+
+def slope_interval(x, replicates, level=0.95):
+    """Returns the (lower, upper) bootstrap interval of the least squares slope of bootstrapped curves over x."""
+    x = np.asarray(x, dtype=float)
+    centered = x - x.mean()
+    # Least squares slope of every replicate curve at once
+    slopes = (replicates - replicates.mean(axis=1, keepdims=True)) @ centered / (centered @ centered)
+    return percentile_interval(slopes, level)
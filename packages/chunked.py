@@ -0,0 +1,256 @@
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from packages.ev_model import PlayCountStats
+from packages.blackjack_logic import BASIC_STRATEGY, DEFAULT_RULES, blackjack_checkpoints, compile_rules
+
+"""
+Contains the chunked execution layer for very large repetition counts.
+
+Repetitions are simulated in fixed size chunks of paths small enough for their working set to stay in cache, the
+chunks run on a thread pool (the batched kernels spend their time in NumPy, which releases the GIL), and each chunk is
+reduced into a streaming summary as soon as it finishes. Only a few chunks are ever in flight, so peak memory depends
+on the chunk size and the number of workers but not on the number of repetitions.
+"""
+
+# Working set a chunk should fit in, about the size of a per core L2 cache
+CACHE_BYTES = 1 << 20
+
+# Bytes a batched progression needs per path: its state arrays plus the temporaries of one spin
+PROGRESSION_BYTES_PER_PATH = 256
+
+# Distinct values a StreamingSummary keeps exactly, past this it rounds them onto a grid that coarsens as needed
+MAX_DISTINCT = 4096
+
+
+def chunk_size(bytes_per_path, cache_bytes=CACHE_BYTES, minimum=256):
+    """Returns the number of paths per chunk that keeps a chunk's working set within cache_bytes."""
+    return max(minimum, int(cache_bytes // bytes_per_path))
+
+
+class StreamingSummary:
+    """
+    Mergeable summary of a stream of values in bounded memory.
+
+    The count, mean, variance, minimum and maximum are exact. The distribution is kept as distinct values and their
+    counts, which is exact for the whole dollar balances of flat or progression betting. Values that do not fall on a
+    small lattice, such as Kelly sized bankrolls, would make it grow with every repetition, so past MAX_DISTINCT values
+    they are rounded to multiples of a power of two resolution, doubled until they fit. The quantiles, mode and shares
+    are then within that resolution.
+
+    Attributes:
+        count (int): number of values seen
+        minimum (float): smallest value seen
+        maximum (float): largest value seen
+        values (np.array): distinct values seen, sorted, rounded to resolution
+        counts (np.array): number of times each distinct value was seen
+        resolution (float): spacing the values are rounded to, 0 while they are exact
+
+    Methods:
+        add: Records an array of values.
+        merge: Adds another summary into this one.
+        mean: Returns the mean of the values.
+        variance: Returns the sample variance of the values.
+        std: Returns the sample standard deviation of the values.
+        quantile: Returns a quantile of the values.
+        mode: Returns the most frequent value.
+        share_at_least: Returns the share of values greater than or equal to a threshold.
+    """
+
+    def __init__(self):
+        """Initialize an empty summary."""
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.values = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.resolution = 0.0
+
+    def add(self, values):
+        """Records an array of values."""
+        values = np.asarray(values, dtype=float).ravel()
+        if not len(values):
+            return self
+        other = StreamingSummary()
+        other.count = len(values)
+        other._mean = float(values.mean())
+        other._m2 = float(((values - other._mean) ** 2).sum())
+        other.minimum, other.maximum = float(values.min()), float(values.max())
+        other.values, other.counts = np.unique(values, return_counts=True)
+        return self.merge(other)
+
+    def merge(self, other):
+        """Adds another summary into this one, combining the moments with Chan's parallel update."""
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other._mean - self._mean
+        self._mean += delta * other.count / count
+        self._m2 += other._m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+        self.resolution = max(self.resolution, other.resolution)
+        self._tally(np.concatenate([self.values, other.values]), np.concatenate([self.counts, other.counts]))
+        while len(self.values) > MAX_DISTINCT:
+            # Powers of two nest, values already on a finer grid land on the same points of the coarser one
+            span = (self.values[-1] - self.values[0]) / MAX_DISTINCT
+            self.resolution = max(2 * self.resolution, 2.0 ** np.ceil(np.log2(span)))
+            self._tally(self.values, self.counts)
+        return self
+
+    def _tally(self, values, counts):
+        """Sets the distinct values and counts from values and their counts, rounding the values to the resolution."""
+        if self.resolution:
+            values = np.round(values / self.resolution) * self.resolution
+        self.values, index = np.unique(values, return_inverse=True)
+        self.counts = np.bincount(index.ravel(), weights=counts, minlength=len(self.values)).astype(np.int64)
+
+    def mean(self):
+        """Returns the mean of the values."""
+        return self._mean
+
+    def variance(self):
+        """Returns the sample variance of the values."""
+        return self._m2 / (self.count - 1) if self.count > 1 else float('nan')
+
+    def std(self):
+        """Returns the sample standard deviation of the values."""
+        return float(np.sqrt(self.variance()))
+
+    def quantile(self, q):
+        """Returns the q quantile of the values, interpolated between neighbours as np.quantile does."""
+        cumulative = np.cumsum(self.counts)
+        position = q * (self.count - 1)
+        lower = self.values[np.searchsorted(cumulative, np.floor(position), side='right')]
+        upper = self.values[np.searchsorted(cumulative, np.ceil(position), side='right')]
+        # Rounded values may fall just outside the values seen
+        return float(np.clip(lower + (upper - lower) * (position - np.floor(position)), self.minimum, self.maximum))
+
+    def mode(self):
+        """Returns the most frequent value, the smallest one on ties."""
+        return float(self.values[np.argmax(self.counts)])
+
+    def share_at_least(self, threshold):
+        """Returns the share of values greater than or equal to threshold."""
+        return float(self.counts[self.values >= threshold].sum() / self.count) if self.count else float('nan')
+
+
+def run_chunked(job, repetitions, chunk, reduce, workers=None, seed=None):
+    """
+    Runs a job over repetitions in chunks on a thread pool and reduces every chunk as it finishes
+    Args:
+        job (function): called as job(paths, seed_sequence) and returns the result of that many paths
+        repetitions (int): total number of paths
+        chunk (int): paths per chunk
+        reduce (function): called with each chunk's result, in completion order, on the calling thread
+        workers (int, optional): threads in the pool, one per CPU by default
+        seed (int, optional): seed the per chunk seed sequences are spawned from
+    Returns:
+        None
+    """
+    workers = workers or os.cpu_count() or 1
+    sizes = [min(chunk, repetitions - start) for start in range(0, repetitions, chunk)]
+    # Chunk i always gets the same stream whatever thread runs it
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    # At most two chunks per worker are in flight, which bounds the memory held by finished but unreduced results
+    with ThreadPoolExecutor(workers) as pool:
+        pending = set()
+        for size, child in zip(sizes, seeds):
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    reduce(future.result())
+            pending.add(pool.submit(job, size, child))
+        for future in pending:
+            reduce(future.result())
+
+
+def progression_summary(progression, repeats, initial_balance, num_plays, initial_bet, preference, target_balance=None,
+                        floor_balance=0, seed=None, chunk=None, workers=None, wheel='american'):
+    """
+    Plays a compiled progression for any number of repetitions in cache sized chunks
+    Args:
+        progression (CompiledProgression): batched progression kernel
+        repeats (int): number of independent repetitions
+        initial_balance (int or float): starting amount
+        num_plays (int): maximum number of spins per repetition
+        initial_bet (int or float): base bet the progression builds on
+        preference (string): colour bet on, "red", "black" or "green"
+        target_balance (int or float, optional): stop once the balance reaches or exceeds this value
+        floor_balance (int or float): stop once the balance falls to or below this value
+        seed (int, optional): seed for the random generators
+        chunk (int, optional): repetitions per chunk, sized for the cache by default
+        workers (int, optional): threads in the pool
+        wheel (string): "american" or "european"
+    Returns:
+        tuple: (StreamingSummary of the ending balances, StreamingSummary of the spins played, stop reason counts)
+    """
+    chunk = chunk or chunk_size(PROGRESSION_BYTES_PER_PATH)
+    balances, plays = StreamingSummary(), StreamingSummary()
+    stop_reasons = np.zeros(4, dtype=np.int64)
+
+    def job(paths, seed_sequence):
+        result = progression.simulate(paths, initial_balance, num_plays, initial_bet, preference, target_balance,
+                                      floor_balance, seed=seed_sequence, wheel=wheel)
+        return result.balances, result.plays, np.bincount(result.stop_reasons, minlength=len(stop_reasons))
+
+    def reduce(result):
+        balances.add(result[0])
+        plays.add(result[1])
+        stop_reasons[:] += result[2]
+
+    run_chunked(job, repeats, chunk, reduce, workers, seed)
+    return balances, plays, stop_reasons
+
+
+def blackjack_summary(num_plays, starting_bankroll, base_bet, repetitions, counting_strategy, checkpoints=None,
+                      strategy=BASIC_STRATEGY, chunk=64, workers=1, bet_ramp=None, rules=None, seed=None):
+    """
+    Runs blackjack_checkpoints for any number of repetitions in chunks, streaming the checkpoint balances into
+    per play count statistics
+    Args:
+        num_plays (int): number of plays for each simulation
+        starting_bankroll (float): starting amount of money for the player
+        base_bet (float): base bet size
+        repetitions (int): number of simulations
+        counting_strategy (string): name of the CardCounter method
+        checkpoints (list, optional): play counts to record
+        strategy (Strategy): playing decisions
+        chunk (int): repetitions per chunk
+        workers (int): threads in the pool, the simulator is pure Python so more threads only overlap the reductions
+        bet_ramp (BetRamp, optional): sizes each round's bet from the count
+        rules (TableRules, optional): table rules, DEFAULT_RULES if not given
+        seed (int, optional): seed of the chunks' shoes, drawn from the random module if not given so that
+            random.seed reproduces a run as it does for blackjack_checkpoints
+    Returns:
+        tuple: (PlayCountStats of the balance at every checkpoint, StreamingSummary of the final balances,
+            total (win, loss, draw) counts)
+    """
+    stats = PlayCountStats(num_plays)
+    final = StreamingSummary()
+    outcomes = np.zeros(3)
+    # Compiled once for every chunk
+    table = compile_rules(rules or DEFAULT_RULES)
+
+    def job(paths, seed_sequence):
+        # Every chunk shuffles its shoes with its own generator, the shared random module would make the shoes depend
+        # on how the threads interleave
+        rng = random.Random(int(seed_sequence.generate_state(1, np.uint64)[0]))
+        return blackjack_checkpoints(num_plays, starting_bankroll, base_bet, paths, counting_strategy, checkpoints,
+                                     strategy, bet_ramp, table, lambda: table.new_deck(rng))
+
+    def reduce(results):
+        stats.add_paths(results.checkpoints, results.balances)
+        final.add(results.final_balances())
+        outcomes[:] += results.outcomes.sum(axis=0)
+
+    run_chunked(job, repetitions, chunk, reduce, workers, random.getrandbits(64) if seed is None else seed)
+    return stats, final, outcomes
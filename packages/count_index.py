@@ -0,0 +1,279 @@
+import hashlib
+import os
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from packages.blackjack_logic import Deck, CardCounter, Player, BASIC_STRATEGY, DEFAULT_RULES, TableRules, compile_rules, \
+    play_round
+
+"""
+Contains the precomputed true count EV index.
+
+The index holds the EV and variance of a round for every true count bucket, per counting system and rule set. It is
+generated once by a large simulation, stored on disk and read back with O(1) lookups, for example by a BetRamp
+deciding the bet of each round inside blackjack_simulator. The index of the default rules ships with the app, those
+of other rule sets are simulated on first use and cached on disk.
+
+Regenerate the stored index with:
+
+    python -m packages.count_index --rounds 500000 --processes 4
+
+or add the index of another rule set to it with e.g. --rules '{"decks": 6, "hit_soft_17": true}'.
+"""
+
+COUNTING_SYSTEMS = ('high_low', 'zen', 'halves')
+
+# Buckets are whole true counts, everything beyond the edges is pooled into the outermost bucket
+MIN_TRUE_COUNT = -10
+MAX_TRUE_COUNT = 10
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'count_index.npz')
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'count_index_cache')
+
+# Rounds simulated for the index of a rule set that is not stored, on first use
+ON_DEMAND_ROUNDS = 100000
+
+
+def rules_name(rules=None):
+    """Returns the name an index of a rule set is stored under, 'default' for the default rules."""
+    if rules is None or repr(rules) == repr(DEFAULT_RULES):
+        return 'default'
+    return hashlib.sha1(repr(rules).encode()).hexdigest()[:12]
+
+
+def true_count(running_count, cards_left):
+    """Returns the running count divided by the decks left in the shoe."""
+    return running_count / max(cards_left / 52, 0.25)
+
+
+def count_bucket(value):
+    """Returns the bucket index of a true count."""
+    return int(min(max(np.floor(value), MIN_TRUE_COUNT), MAX_TRUE_COUNT)) - MIN_TRUE_COUNT
+
+
+class CountIndex:
+    """
+    EV and variance of a round per true count bucket.
+
+    Attributes:
+        counting_system (str): CardCounter method the counts were kept with.
+        rules (str): name of the rule set the index was generated for.
+        buckets (np.array): true count of each bucket, from MIN_TRUE_COUNT to MAX_TRUE_COUNT.
+        rounds (np.array): rounds observed in each bucket.
+        ev (np.array): mean net result of a round per bucket, in units of the bet.
+        variance (np.array): variance of the net result of a round per bucket.
+
+    Methods:
+        lookup: Returns the (ev, variance) of the bucket of a true count.
+        standard_error: Returns the Monte Carlo standard error of the ev of every bucket.
+    """
+
+    def __init__(self, counting_system, rules, rounds, total, total_sq):
+        """Initialize the index from per bucket round counts, sums and sums of squares."""
+        self.counting_system = counting_system
+        self.rules = rules
+        self.buckets = np.arange(MIN_TRUE_COUNT, MAX_TRUE_COUNT + 1)
+        self.rounds = np.asarray(rounds, dtype=np.int64)
+        self.total = np.asarray(total, dtype=float)
+        self.total_sq = np.asarray(total_sq, dtype=float)
+        observed = np.maximum(self.rounds, 1)
+        self.ev = self.total / observed
+        self.variance = np.maximum(self.total_sq / observed - self.ev ** 2, 0)
+
+    def lookup(self, value):
+        """Returns the (ev, variance) of the bucket of a true count."""
+        bucket = count_bucket(value)
+        return self.ev[bucket], self.variance[bucket]
+
+    def standard_error(self):
+        """Returns the Monte Carlo standard error of the ev of every bucket."""
+        return np.sqrt(self.variance / np.maximum(self.rounds, 1))
+
+
+def _simulate_buckets(counting_system, num_rounds, seed, strategy=BASIC_STRATEGY, rules=None):
+    """Plays num_rounds flat bet rounds under the rules and returns per bucket round counts, sums and sums of squares."""
+    random.seed(seed)
+    size = MAX_TRUE_COUNT - MIN_TRUE_COUNT + 1
+    rounds, total, total_sq = np.zeros(size, dtype=np.int64), np.zeros(size), np.zeros(size)
+    table = compile_rules(rules or DEFAULT_RULES)
+    deck = Deck(table.rules.decks)
+    counter = CardCounter()
+    counting_method = getattr(counter, counting_system)
+    player = Player(0)
+    for _ in range(num_rounds):
+        # Same reshuffle rule as blackjack_simulator
+        if len(deck.cards) < table.reshuffle_at:
+            deck = Deck(table.rules.decks)
+            counter.reset_count()
+        bucket = count_bucket(true_count(counter.get_running_count(), len(deck.cards)))
+        before = player.get_bankroll()
+        play_round(deck, counter, counting_method, player, 1, strategy, table)
+        result = player.get_bankroll() - before
+        rounds[bucket] += 1
+        total[bucket] += result
+        total_sq[bucket] += result * result
+    return rounds, total, total_sq
+
+
+def generate_index(counting_system, num_rounds, rules=None, processes=1, seed=0):
+    """
+    Builds the index of one counting system with a large simulation
+    Args:
+        counting_system (string): "high_low", "zen" or "halves"
+        num_rounds (int): rounds to simulate in total
+        rules (TableRules, optional): table rules the rounds are played under, the default rules if not given
+        processes (int): worker processes, each simulates an equal share of the rounds
+        seed (int): base seed, every worker gets its own
+    Returns:
+        CountIndex: per bucket EV and variance
+    """
+    shares = [num_rounds // processes + (worker < num_rounds % processes) for worker in range(processes)]
+    seeds = [f"{seed}-{counting_system}-{worker}" for worker in range(processes)]
+    if processes == 1:
+        parts = [_simulate_buckets(counting_system, shares[0], seeds[0], rules=rules)]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            parts = list(pool.map(_simulate_buckets, [counting_system] * processes, shares, seeds,
+                                  [BASIC_STRATEGY] * processes, [rules] * processes))
+    rounds, total, total_sq = (np.sum(values, axis=0) for values in zip(*parts))
+    return CountIndex(counting_system, rules_name(rules), rounds, total, total_sq)
+
+
+def save_indexes(indexes, path=DEFAULT_PATH):
+    """Stores several indexes in one .npz file keyed by rule set and counting system."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrays = {}
+    for index in indexes:
+        key = f"{index.rules}/{index.counting_system}"
+        arrays[f"{key}/rounds"] = index.rounds
+        arrays[f"{key}/total"] = index.total
+        arrays[f"{key}/total_sq"] = index.total_sq
+    np.savez_compressed(path, **arrays)
+
+
+def load_indexes(path=DEFAULT_PATH):
+    """Returns a dict of CountIndex objects keyed by (rules, counting_system) read from an .npz file."""
+    indexes = {}
+    with np.load(path) as data:
+        keys = {name.rsplit('/', 1)[0] for name in data.files}
+        for key in keys:
+            rules, counting_system = key.split('/')
+            indexes[(rules, counting_system)] = CountIndex(counting_system, rules, data[f"{key}/rounds"],
+                                                           data[f"{key}/total"], data[f"{key}/total_sq"])
+    return indexes
+
+
+def load_index(counting_system, rules='default', path=DEFAULT_PATH):
+    """Returns the stored CountIndex of one counting system and rule set."""
+    return load_indexes(path)[(rules, counting_system)]
+
+
+def rules_index(counting_system, rules=None, rounds=ON_DEMAND_ROUNDS, processes=1, path=DEFAULT_PATH,
+                cache_dir=CACHE_DIR):
+    """
+    Returns the CountIndex of a counting system under a rule set, simulating and caching it on disk if not stored
+    Args:
+        counting_system (string): "high_low", "zen" or "halves"
+        rules (TableRules, optional): table rules, the default rules if not given
+        rounds (int): rounds simulated on a miss
+        processes (int): worker processes used on a miss
+        path (string): stored indexes, read first
+        cache_dir (string): directory of the indexes simulated on first use
+    Returns:
+        CountIndex: per bucket EV and variance under the rules
+    """
+    name = rules_name(rules)
+    stored = load_indexes(path) if os.path.exists(path) else {}
+    if (name, counting_system) in stored:
+        return stored[(name, counting_system)]
+    cached = os.path.join(cache_dir, f"{name}-{counting_system}-{rounds}.npz")
+    if os.path.exists(cached):
+        return load_index(counting_system, name, cached)
+    index = generate_index(counting_system, rounds, rules, processes)
+    save_indexes([index], cached)
+    return index
+
+
+class BetRamp:
+    """
+    Decides the bet of a round from the true count with an O(1) index lookup.
+
+    Attributes:
+        index (CountIndex): EV and variance per true count bucket
+        base_bet (float): smallest bet, played whenever the count gives no edge
+        mode (str): 'kelly' to bet kelly_fraction of the Kelly bet, 'spread' to bet a multiple of base_bet per count
+        spread (dict): for 'spread', minimum true count mapped to the multiple of base_bet bet from there on
+        max_units (float): largest bet as a multiple of base_bet
+        kelly_fraction (float): share of the full Kelly bet, e.g. 0.5 for half Kelly
+
+    Methods:
+        bet: Returns the bet for the running count, the cards left in the shoe and the current bankroll.
+    """
+
+    def __init__(self, index, base_bet, mode='spread', spread=None, max_units=8, kelly_fraction=0.5):
+        """Initialize a BetRamp, compiling a spread into a per bucket table."""
+        if mode not in ('kelly', 'spread'):
+            raise ValueError("mode must be 'kelly' or 'spread'")
+        self.index = index
+        self.base_bet = base_bet
+        self.mode = mode
+        self.max_units = max_units
+        self.kelly_fraction = kelly_fraction
+        self.spread = spread or {1: 2, 2: 4, 3: 6, 4: 8}
+
+        # Bet multiple of every bucket, so a spread decision is a single lookup
+        self.units = np.ones(len(index.buckets))
+        for threshold, units in sorted(self.spread.items()):
+            self.units[index.buckets >= threshold] = units
+        self.units = np.clip(self.units, 1, max_units)
+
+        # Kelly fraction of the bankroll to bet per bucket, ev / variance where the edge is positive
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = np.where((index.ev > 0) & (index.variance > 0), index.ev / index.variance, 0)
+        self.kelly = kelly_fraction * growth
+
+    def __repr__(self):
+        return (f"BetRamp({self.index.rules}/{self.index.counting_system}, {self.base_bet!r}, mode={self.mode!r}, "
+                f"spread={self.spread!r}, max_units={self.max_units!r}, kelly_fraction={self.kelly_fraction!r})")
+
+    def bet(self, running_count, cards_left, bankroll):
+        """Returns the bet for the running count, the cards left in the shoe and the current bankroll."""
+        bucket = count_bucket(true_count(running_count, cards_left))
+        if self.mode == 'spread':
+            return self.base_bet * self.units[bucket]
+        return float(np.clip(bankroll * self.kelly[bucket], self.base_bet, self.base_bet * self.max_units))
+
+    def bets(self, running_counts, cards_left, bankrolls):
+        """Returns the bet of every element of the running count, cards left and bankroll arrays, as bet does."""
+        true_counts = np.asarray(running_counts) / np.maximum(np.asarray(cards_left) / 52, 0.25)
+        buckets = np.clip(np.floor(true_counts), MIN_TRUE_COUNT, MAX_TRUE_COUNT).astype(np.int64) - MIN_TRUE_COUNT
+        if self.mode == 'spread':
+            return self.base_bet * self.units[buckets]
+        return np.clip(np.asarray(bankrolls) * self.kelly[buckets], self.base_bet, self.base_bet * self.max_units)
+
+
+def main():
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Regenerates the stored true count EV index")
+    parser.add_argument('--rounds', type=int, default=200000, help='rounds simulated per counting system')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--rules', default='{}', help='JSON object of TableRules arguments, the default rules if empty')
+    parser.add_argument('--path', default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    rules = TableRules(**json.loads(args.rules))
+    indexes = [generate_index(system, args.rounds, rules, args.processes) for system in COUNTING_SYSTEMS]
+    # The indexes of the other rule sets in the file are kept
+    stored = load_indexes(args.path) if os.path.exists(args.path) else {}
+    stored.update({(index.rules, index.counting_system): index for index in indexes})
+    save_indexes(stored.values(), args.path)
+    for index in indexes:
+        print(f"{index.counting_system}: {index.rounds.sum()} rounds, EV by true count "
+              + ' '.join(f"{count:+d}:{ev:+.3f}" for count, ev, rounds in zip(index.buckets, index.ev, index.rounds) if rounds))
+
+
+if __name__ == '__main__':
+    main()
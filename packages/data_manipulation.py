@@ -1,5 +1,4 @@
 import numpy as np
-import pandas as pd
 
 """
 Contains methods for data manipulation
@@ -18,6 +17,10 @@ def sample(strategy, repeats, initial_balance, num_plays, initial_bet, preferenc
     Returns: 
         array: aggregation of our simulations
     """
+    # Compiled progressions play every repetition in one batched call
+    if hasattr(strategy, 'simulate'):
+        return strategy.simulate(repeats, initial_balance, num_plays, initial_bet, preference, target_balance, floor_balance).balances
+
     arr = np.array([])
     for _ in range(repeats):
         arr = np.append(arr, strategy(initial_balance, num_plays, initial_bet, preference, target_balance, floor_balance))
@@ -31,4 +34,6 @@ def dataframe_conversion(samples):
     Returns: 
         pd.DataFrame: dataframe with our samples as a column
     """
+    import pandas as pd
+
     return pd.DataFrame(samples, columns=['Balance'])
\ No newline at end of file
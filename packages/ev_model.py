@@ -0,0 +1,210 @@
+import numpy as np
+from statistics import NormalDist
+
+"""
+Contains the expected value (EV) model fitted on aggregated play count statistics
+"""
+
+class PlayCountStats:
+    """
+    Accumulates per play count statistics of the balance across simulation repetitions.
+
+    Attributes:
+        count (np.array): number of observations recorded at each play count
+        total (np.array): sum of balances recorded at each play count
+        total_sq (np.array): sum of squared balances recorded at each play count
+        path_counts (np.array): play counts shared by every path recorded with add_paths, None otherwise
+        paths (int): number of paths recorded with add_paths
+        path_cross (np.array): sum of the outer products of those paths, for the covariance of the mean curve
+
+    Methods:
+        add: Records the balances of one simulation run.
+        add_paths: Records many runs observed at the same play counts, keeping their cross products.
+        merge: Adds the statistics of another accumulator into this one.
+        play_counts: Returns the play counts with at least one observation.
+        mean: Returns the mean balance at each observed play count.
+        variance: Returns the sample variance of the balance at each observed play count.
+        path_covariance: Returns the covariance of the recorded paths across their play counts.
+    """
+
+    def __init__(self, num_plays):
+        """Initialize empty accumulators, leaving room for a split hand past num_plays."""
+        size = num_plays + 2
+        self.count = np.zeros(size, dtype=np.int64)
+        self.total = np.zeros(size)
+        self.total_sq = np.zeros(size)
+        self.path_counts = None
+        self.paths = 0
+        self.path_cross = None
+
+    def add(self, play_counts, balances):
+        """Records the balances of one simulation run."""
+        play_counts = np.asarray(play_counts, dtype=np.int64)
+        balances = np.asarray(balances, dtype=float)
+        np.add.at(self.count, play_counts, 1)
+        np.add.at(self.total, play_counts, balances)
+        np.add.at(self.total_sq, play_counts, balances ** 2)
+        # Observations outside of whole paths break the path covariance
+        self.path_counts, self.paths, self.path_cross = None, 0, None
+
+    def add_paths(self, play_counts, balances):
+        """
+        Records many runs observed at the same play counts
+        Args:
+            play_counts (np.array): increasing play counts shared by every run
+            balances (np.array): balance of every run at those play counts, shape (runs, play counts)
+        """
+        play_counts = np.asarray(play_counts, dtype=np.int64)
+        balances = np.asarray(balances, dtype=float).reshape(-1, len(play_counts))
+        if not self.count.any():
+            self.path_counts, self.path_cross = play_counts, np.zeros((len(play_counts), len(play_counts)))
+        self.count[play_counts] += len(balances)
+        self.total[play_counts] += balances.sum(axis=0)
+        self.total_sq[play_counts] += (balances ** 2).sum(axis=0)
+        if self.path_counts is None or not np.array_equal(self.path_counts, play_counts):
+            self.path_counts, self.paths, self.path_cross = None, 0, None
+            return
+        self.paths += len(balances)
+        self.path_cross += balances.T @ balances
+
+    def merge(self, other):
+        """Adds the statistics of another accumulator into this one."""
+        size = max(len(self.count), len(other.count))
+        empty = not self.count.any()
+        for name in ('count', 'total', 'total_sq'):
+            mine, theirs = getattr(self, name), getattr(other, name)
+            merged = np.zeros(size, dtype=mine.dtype)
+            merged[:len(mine)] += mine
+            merged[:len(theirs)] += theirs
+            setattr(self, name, merged)
+        if self.paths and other.paths and np.array_equal(self.path_counts, other.path_counts):
+            self.paths += other.paths
+            self.path_cross = self.path_cross + other.path_cross
+        elif other.paths and empty:
+            self.path_counts, self.paths, self.path_cross = other.path_counts, other.paths, other.path_cross.copy()
+        else:
+            self.path_counts, self.paths, self.path_cross = None, 0, None
+        return self
+
+    def path_covariance(self):
+        """Returns the sample covariance of the recorded paths across their play counts, None without whole paths."""
+        if self.paths < 2:
+            return None
+        mean = self.total[self.path_counts] / self.paths
+        return (self.path_cross - self.paths * np.outer(mean, mean)) / (self.paths - 1)
+
+    def play_counts(self):
+        """Returns the play counts with at least one observation."""
+        return np.nonzero(self.count)[0]
+
+    def mean(self):
+        """Returns the mean balance at each observed play count."""
+        observed = self.count > 0
+        return self.total[observed] / self.count[observed]
+
+    def variance(self):
+        """Returns the sample variance of the balance at each observed play count."""
+        observed = self.count > 0
+        n = self.count[observed]
+        mean = self.total[observed] / n
+        squares = self.total_sq[observed] - n * mean ** 2
+        # Variance is undefined for a single observation
+        return np.where(n > 1, np.maximum(squares, 0) / np.maximum(n - 1, 1), np.nan)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Builds the accumulator from a dataframe with 'Play Count' and 'Balance' columns."""
+        play_counts = df['Play Count'].to_numpy(dtype=np.int64)
+        stats = cls(int(play_counts.max()) if len(play_counts) else 0)
+        stats.add(play_counts, df['Balance'].to_numpy(dtype=float))
+        return stats
+
+
+class EVModel:
+    """
+    Weighted least squares line of balance against play count, fitted in closed form.
+
+    Each play count contributes its mean balance weighted by the inverse variance of that mean
+    (count / variance), so later play counts with wider spreads count for less. Every play count of a path follows
+    the same bankroll, so when whole paths were recorded the covariance of the coefficients is that of the fit of
+    one path divided by the number of paths, rather than the one of independent means.
+
+    Attributes:
+        intercept (float): fitted balance at zero plays
+        slope (float): fitted expected value per play
+        covariance (np.array): 2x2 covariance matrix of (intercept, slope)
+
+    Methods:
+        fit: Fits the model on a PlayCountStats accumulator.
+        predict: Returns the expected balance at one or more play counts.
+        confidence_interval: Returns lower and upper bounds of the expected balance.
+    """
+
+    def __init__(self, intercept, slope, covariance):
+        """Initialize an EVModel with fitted coefficients."""
+        self.intercept = intercept
+        self.slope = slope
+        self.covariance = covariance
+
+    @classmethod
+    def fit(cls, stats):
+        """
+        Fits the weighted least squares line on aggregated statistics
+        Args:
+            stats (PlayCountStats): per play count statistics of a simulation
+        Returns:
+            EVModel: fitted model
+        """
+        x = stats.play_counts().astype(float)
+        y = stats.mean()
+        n = stats.count[stats.count > 0]
+        variance = stats.variance()
+
+        # Play counts with no spread (e.g. a single repetition) borrow the smallest observed variance
+        valid = np.isfinite(variance) & (variance > 0)
+        floor = variance[valid].min() if valid.any() else 1.0
+        variance = np.where(valid, variance, floor)
+        w = n / variance
+
+        # Normal equations of the 2 parameter weighted fit
+        s0 = w.sum()
+        s1 = (w * x).sum()
+        s2 = (w * x * x).sum()
+        t0 = (w * y).sum()
+        t1 = (w * x * y).sum()
+        det = s0 * s2 - s1 * s1
+        if len(x) < 2 or det == 0:
+            return cls(float(t0 / s0) if s0 else 0.0, 0.0, np.array([[1 / s0 if s0 else np.inf, 0.0], [0.0, 0.0]]))
+
+        slope = (s0 * t1 - s1 * t0) / det
+        intercept = (t0 - slope * s1) / s0
+        paths = stats.path_covariance()
+        if paths is None or not np.array_equal(stats.path_counts, stats.play_counts()):
+            # Observations of unknown paths are taken as independent
+            covariance = np.array([[s2, -s1], [-s1, s0]]) / det
+        else:
+            # The coefficients are a fixed linear map of the mean curve, (X'WX)^-1 X'W
+            fit = np.array([[s2, -s1], [-s1, s0]]) @ np.vstack([w, w * x]) / det
+            covariance = fit @ paths @ fit.T / stats.paths
+        return cls(float(intercept), float(slope), covariance)
+
+    def predict(self, play_counts):
+        """Returns the expected balance at one or more play counts."""
+        x = np.asarray(play_counts, dtype=float).ravel()
+        return self.intercept + self.slope * x
+
+    def confidence_interval(self, play_counts, level=0.95):
+        """
+        Returns the confidence interval of the expected balance
+        Args:
+            play_counts (int or array): play counts to evaluate
+            level (float): confidence level between 0 and 1
+        Returns:
+            tuple: arrays of lower and upper bounds
+        """
+        x = np.asarray(play_counts, dtype=float).ravel()
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        c = self.covariance
+        se = np.sqrt(np.maximum(c[0, 0] + 2 * x * c[0, 1] + x * x * c[1, 1], 0))
+        prediction = self.predict(x)
+        return prediction - z * se, prediction + z * se
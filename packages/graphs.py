@@ -1,129 +1,10 @@
 import numpy as np
 import matplotlib.pyplot as plt
-import streamlit as st
 
-def roulette_plot(line_plot, frequency_plot, box_plot, stats_table):
-    """
-    Plots all the graphs for the roulette strategies
-    Args:
-        line_plot ('fig' object): Line plot information
-        frequency_plot ('fig' object): Frequency plot information
-        box_plot ('fig' object): Box plot information
-    Returns:
-        None
-    """
-    # Assigning statistical data
-
-    col1, col2 = st.columns([1, 1])
-    with col1:
-        st.pyplot(line_plot, use_container_width=True)
-        tooltip_css1 = """
-        .tooltip1 {
-        position: relative;
-        display: block;
-        }
-
-        .tooltip1::after {
-        content: "This graph is a scatterplot that reveals various ending balances that occured in samples with the corresponding number of plays";
-        position: absolute;
-        bottom: 100%;
-        left: 50%;
-        transform: translateX(-50%);
-        background-color: #333;
-        color: #fff;
-        padding: 5px;
-        border-radius: 5px;
-        font-size: 12px;
-        opacity: 0;
-        visibility: hidden;
-        transition: opacity 0.2s, visibility 0.2s;
-        }
-
-        .tooltip1:hover::after {
-        opacity: 1;
-        visibility: visible;
-        }
-        """
-
-        # Add the CSS to the Streamlit app
-        st.markdown(f'<style>{tooltip_css1}</style>', unsafe_allow_html=True)
-
-        # Add the tooltip-like element
-        st.markdown('<div class="tooltip1">Info</div>', unsafe_allow_html=True)
-    with col2:
-        st.pyplot(frequency_plot, use_container_width=True)
-        tooltip_css2 = """
-        .tooltip2 {
-        position: relative;
-        display: block;
-        }
-
-        .tooltip2::after {
-        content: "This graph is a histogram that displays the frequency of each ending balance amount of the sample repititions";
-        position: absolute;
-        bottom: 100%;
-        left: 50%;
-        transform: translateX(-50%);
-        background-color: #333;
-        color: #fff;
-        padding: 5px;
-        border-radius: 5px;
-        font-size: 12px;
-        opacity: 0;
-        visibility: hidden;
-        transition: opacity 0.2s, visibility 0.2s;
-        }
-
-        .tooltip2:hover::after {
-        opacity: 1;
-        visibility: visible;
-        }
-        """
-
-        # Add the CSS to the Streamlit app
-        st.markdown(f'<style>{tooltip_css2}</style>', unsafe_allow_html=True)
-
-        # Add the tooltip-like element
-        st.markdown('<div class="tooltip2">Info</div>', unsafe_allow_html=True)
-    col3, col4 = st.columns([1, 1])
-    with col3:
-        st.pyplot(box_plot, use_container_width=True)
-        tooltip_css3 = """
-        .tooltip3 {
-        position: relative;
-        display: block;
-        }
-
-        .tooltip3::after {
-        content: "This graph is a box and whisker plot that denotes the descriptive statistics of all samples in one run of the algorithm based on parameters set by the user.";
-        position: absolute;
-        bottom: 100%;
-        left: 50%;
-        transform: translateX(-50%);
-        background-color: #333;
-        color: #fff;
-        padding: 5px;
-        border-radius: 5px;
-        font-size: 12px;
-        opacity: 0;
-        visibility: hidden;
-        transition: opacity 0.2s, visibility 0.2s;
-        }
-
-        .tooltip3:hover::after {
-        opacity: 1;
-        visibility: visible;
-        }
-        """
-
-        # Add the CSS to the Streamlit app
-        st.markdown(f'<style>{tooltip_css3}</style>', unsafe_allow_html=True)
-
-        # Add the tooltip-like element
-        st.markdown('<div class="tooltip3">Info</div>', unsafe_allow_html=True)       
-    with col4:
-        st.markdown(stats_table, unsafe_allow_html=True)
-    
+"""
+Contains the matplotlib plots and tables for the roulette strategies
+"""
+
 def styling_configurations(fig, ax):
     """
     Contains all the styling information for our plots
@@ -218,9 +99,14 @@ def line_plot(strategy, num_plays, initial_balance, initial_bet, preference, tar
     """
 
     # Generating our samples
-    balance = np.array([])
-    for i in range(num_plays):
-        balance = np.append(balance, strategy(initial_balance, i, initial_bet, preference, target_balance))
+    if hasattr(strategy, 'simulate'):
+        # Run i is read after i spins, so every point still comes from an independent run
+        trajectories = strategy.simulate(num_plays, initial_balance, num_plays, initial_bet, preference, target_balance, trajectory=True).trajectories
+        balance = trajectories[np.arange(num_plays), np.arange(num_plays)]
+    else:
+        balance = np.array([])
+        for i in range(num_plays):
+            balance = np.append(balance, strategy(initial_balance, i, initial_bet, preference, target_balance))
 
     # Plotting Configurations
     fig, ax = plt.subplots()
@@ -299,15 +185,22 @@ def box_plot(df, initial_balance, repeats, graph_width):
 
     return fig
 
-def stats_table(df, initial_balance):
+def stats_table(df, initial_balance, level=0.95, resamples=1000):
     """
-    Creates a table that relays all the statistics associated with the parameters input
+    Creates a table that relays all the statistics associated with the parameters input, with bootstrap
+    confidence intervals for the Monte Carlo error of each estimate
     Args:
         df (DataFrame): dataframe that we are plotting
+        initial_balance (int or float): the initial balance based on user input
+        level (float): confidence level of the intervals
+        resamples (int): number of bootstrap resamples
 
     Returns:
         'fig' object: table that displays all the stats
     """
+    from packages.bootstrap import bootstrap, mode as sample_mode, sample_std, share_at_least, share_below
+
+    balances = df['Balance'].to_numpy(dtype=float)
     mean = round(df['Balance'].mean(), 2)
     median = df['Balance'].median()
     max = df['Balance'].max()
@@ -318,23 +211,36 @@ def stats_table(df, initial_balance):
     percentage_win_str = f"{percentage_win:.2f}%"
     percentage_lose = df[df['Balance'] < initial_balance].shape[0] / df.shape[0] * 100
     percentage_lose_str = f"{percentage_lose:.2f}%"
-    
+
+    # Bootstrap intervals, the extremes have none since a resample can never exceed the observed max or min
+    def interval(statistic, suffix=''):
+        lower, upper = bootstrap(balances, statistic, resamples, level)
+        return f"{lower:.2f}{suffix} to {upper:.2f}{suffix}"
+
+    mean_ci = interval(np.mean)
+    median_ci = interval(np.median)
+    mode_ci = interval(sample_mode)
+    stdev_ci = interval(sample_std)
+    percentage_win_ci = interval(share_at_least(initial_balance), '%')
+    percentage_lose_ci = interval(share_below(initial_balance), '%')
+    level_str = f"{level * 100:.0f}% CI"
+
     # Setting up data text
     stats_table = f"""
     <center>
 
     **Descriptive Statistics**
 
-    |                    |                         |
-    |--------------------|-------------------------|
-    | **Mean**           | {mean}                  |
-    | **Median**         | {median}                |
-    | **Max**            | {max}                   |
-    | **Min**            | {min}                   |
-    | **Mode**           | {mode}                  |
-    | **Standard Deviation** | {stdev}            |
-    | **Chance of gaining money** | {percentage_win} |
-    | **Chance of losing money**  | {percentage_lose} |
+    |                    |                         | {level_str} |
+    |--------------------|-------------------------|-------------|
+    | **Mean**           | {mean}                  | {mean_ci}   |
+    | **Median**         | {median}                | {median_ci} |
+    | **Max**            | {max}                   | –           |
+    | **Min**            | {min}                   | –           |
+    | **Mode**           | {mode}                  | {mode_ci}   |
+    | **Standard Deviation** | {stdev}            | {stdev_ci}  |
+    | **Chance of gaining money** | {percentage_win_str} | {percentage_win_ci} |
+    | **Chance of losing money**  | {percentage_lose_str} | {percentage_lose_ci} |
 
     </center>
     """
@@ -344,3 +250,111 @@ def stats_table(df, initial_balance):
 
 
 
+
+def stopping_time_plot(result, num_plays):
+    """
+    Creates a stacked histogram of the number of spins each repetition played, split by why it stopped
+    Args:
+        result (ProgressionResult): batched simulation with its stopping statistics
+        num_plays (int): number of plays
+    Returns:
+        'fig' object: contains information about our stopping time plot
+    """
+    from packages.progressions import STOP_REASONS
+
+    # Plotting configurations
+    fig, ax = plt.subplots()
+    styling_configurations(fig, ax)
+
+    # Setting size
+    fig.set_size_inches(10,4)
+
+    labels = [reason.replace('_', ' ').capitalize() for reason in STOP_REASONS]
+    groups = [result.plays[result.stop_reasons == code] for code in range(len(STOP_REASONS))]
+    colors = ['white', 'limegreen', 'red', 'orange']
+    ax.hist(groups, bins=min(50, num_plays), range=(0, num_plays), stacked=True, color=colors, edgecolor='black', label=labels)
+
+    # Labels
+    ax.set_title("Stopping Times by Stop Reason, n = " + str(len(result.plays)), color = 'white')
+    ax.set_xlabel("Spins Played", color = 'white')
+    ax.set_ylabel("Frequency", color = 'white')
+    ax.legend(facecolor='none', labelcolor='white')
+    for label in ax.get_xticklabels():
+        label.set_color('white')
+    for label in ax.get_yticklabels():
+        label.set_color(color = 'white')
+
+    return fig
+
+def stop_reason_plot(result):
+    """
+    Creates a bar chart of the share of repetitions per stop reason
+    Args:
+        result (ProgressionResult): batched simulation with its stopping statistics
+    Returns:
+        'fig' object: contains information about our stop reason plot
+    """
+    counts = result.stop_reason_counts()
+    labels = [reason.replace('_', ' ').capitalize() for reason in counts]
+    shares = np.array(list(counts.values())) / len(result.plays) * 100
+
+    # Plotting configurations
+    fig, ax = plt.subplots()
+    styling_configurations(fig, ax)
+
+    # Setting size
+    fig.set_size_inches(10,4)
+
+    bars = ax.bar(labels, shares, color='white', edgecolor='black')
+
+    # Labels
+    ax.set_title("Why Repetitions Stopped, n = " + str(len(result.plays)), color = 'white')
+    ax.set_ylabel("Share of Repetitions (%)", color = 'white')
+    for label in ax.get_xticklabels():
+        label.set_color('white')
+    for label in ax.get_yticklabels():
+        label.set_color(color = 'white')
+
+    for bar, value in zip(bars, shares):
+        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height(), f"{value:.1f}%",
+                ha='center', va='bottom', color='red')
+
+    return fig
+
+def path_stats_table(result):
+    """
+    Creates a table of the path statistics recorded during the simulation
+    Args:
+        result (ProgressionResult): batched simulation with its stopping statistics
+
+    Returns:
+        string: markdown table that displays the path statistics
+    """
+    mean_plays = round(float(result.plays.mean()), 2)
+    median_plays = float(np.median(result.plays))
+    mean_peak = round(float(result.peaks.mean()), 2)
+    mean_drawdown = round(float(result.max_drawdowns.mean()), 2)
+    worst_drawdown = round(float(result.max_drawdowns.max()), 2)
+    mean_streak = round(float(result.longest_losing_streaks.mean()), 2)
+    longest_streak = int(result.longest_losing_streaks.max())
+
+    # Setting up data text
+    path_table = f"""
+    <center>
+
+    **Path Statistics**
+
+    |                    |                         |
+    |--------------------|-------------------------|
+    | **Mean spins played**   | {mean_plays}       |
+    | **Median spins played** | {median_plays}     |
+    | **Mean peak balance**   | {mean_peak}        |
+    | **Mean max drawdown**   | {mean_drawdown}    |
+    | **Worst max drawdown**  | {worst_drawdown}   |
+    | **Mean longest losing streak** | {mean_streak} |
+    | **Longest losing streak** | {longest_streak} |
+
+    </center>
+    """
+
+    return path_table
@@ -0,0 +1,729 @@
+import io
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from packages.blackjack_logic import DEFAULT_RULES, TableRules, blackjack_checkpoints, blackjack_simulator, default_checkpoints, \
+    validate_checkpoints
+from packages.chunked import StreamingSummary
+from packages.count_index import COUNTING_SYSTEMS
+from packages.memory_planner import MEMORY_BUDGET, format_bytes, plan_blackjack
+from packages.progressions import PROGRESSIONS, STOP_REASONS, per_repetition
+from packages.roulette_engine import WHEELS
+from packages.simulation_service import ServiceBusy, SimulationService
+
+"""
+Contains the local HTTP/JSON API that serves the simulators to other programs, using only the standard library.
+
+Endpoints, each taking a POST body of one JSON parameter set or a list of them:
+
+    POST /blackjack/hands          every hand of blackjack_simulator, one column per field
+    POST /blackjack/checkpoints    bankroll aggregates of many runs at the checkpoints, as in the trajectory charts
+    POST /roulette/<progression>   ending balances and path statistics of a progression, e.g. /roulette/martingale
+    GET  /                         endpoints with their default parameters
+    GET  /health                   load of the simulation service and batching counters
+
+Responses are compact JSON, or an .npz archive of NumPy arrays with ?format=npz (or an Accept header of
+application/x-npz). With ?stream=1 long results are sent as JSON lines, one chunk of ?chunk= repetitions (or hands)
+at a time followed by a summary line, so a client can consume a run larger than it wants to hold.
+
+Concurrent requests that only differ in their number of repetitions and per repetition parameters are merged into
+one vectorized run by a Batcher and split up again, as long as the merged run stays within the work and memory limits
+of one parameter set. Every run goes through a SimulationService, so identical requests are computed once and an
+overloaded server answers 503 straight away. Start the server with:
+
+    python -m packages.http_api --port 8000
+"""
+
+# Largest request body in bytes
+MAX_BODY = 2 ** 20
+
+# Most hands or spins one parameter set may simulate, blackjack plays about 20,000 hands a second and the batched
+# roulette kernel some millions of spins
+MAX_HANDS = 2_000_000
+MAX_SPINS = 50_000_000
+
+# Most decks in a shoe, as many as the Strategy Explorer offers
+MAX_DECKS = 8
+
+# Repetitions (or hands) per JSON line of a streamed response by default
+STREAM_CHUNK = 1000
+
+# Quantile levels of the checkpoint aggregates
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+NPZ_TYPE = 'application/x-npz'
+
+
+class RequestTooLarge(Exception):
+    """Raised when a parameter set needs more work or memory than one response may take."""
+
+
+class Endpoint:
+    """
+    One simulation served by the API.
+
+    Attributes:
+        defaults (dict): every parameter of the endpoint with its default value
+        max_work (int): most hands or spins one parameter set may simulate
+        prepare (function): validates a parsed parameter set in place and returns the hands or spins it simulates,
+            raises RequestTooLarge if an unstreamed response would not fit in memory
+        batch_key (function): returns the key parameter sets must share to run as one batch, None to run alone
+        run (function): returns the payload of every parameter set of one batch, in order
+        stream (function): yields the payloads of one parameter set chunk by chunk, then its summary
+        repetitions (str): parameter a batch adds up into one run, None if parameter sets never share a batch
+
+    Methods:
+        parse: Returns a validated copy of a parameter set with the defaults filled in.
+        fits: Returns whether parameter sets merged into one run stay within the work and memory limits.
+    """
+
+    def __init__(self, defaults, max_work, prepare, batch_key, run, stream, repetitions=None):
+        """Initialize an Endpoint."""
+        self.defaults = defaults
+        self.max_work = max_work
+        self.prepare = prepare
+        self.batch_key = batch_key
+        self.run = run
+        self.stream = stream
+        self.repetitions = repetitions
+
+    def parse(self, parameters, streaming=False):
+        """Returns a validated copy of a parameter set with the defaults filled in, raises ValueError otherwise."""
+        if not isinstance(parameters, dict):
+            raise ValueError("every parameter set must be a JSON object")
+        unknown = set(parameters) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"unknown parameters: {', '.join(sorted(unknown))}")
+        parsed = dict(self.defaults)
+        for name, value in parameters.items():
+            default = self.defaults[name]
+            # Parameters without a default are checked by prepare
+            if value is None or default is None:
+                parsed[name] = value
+            elif isinstance(default, bool):
+                parsed[name] = bool(value)
+            elif isinstance(default, (int, float)):
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    raise ValueError(f"{name} must be a number")
+                parsed[name] = type(default)(value)
+            else:
+                parsed[name] = str(value)
+        if self.prepare(parsed, streaming) > self.max_work:
+            raise RequestTooLarge(f"a parameter set may simulate at most {self.max_work:,} hands or spins")
+        return parsed
+
+    def fits(self, items):
+        """Returns whether parameter sets of one batch key run as one stay within the work and memory limits."""
+        # A batch is the run of its first parameter set with the repetitions of all of them
+        merged = dict(items[0], **{self.repetitions: sum(item[self.repetitions] for item in items)})
+        try:
+            return self.prepare(merged, False) <= self.max_work
+        except RequestTooLarge:
+            return False
+
+
+def _positive(parameters, *names):
+    """Raises ValueError unless every named parameter is at least 1."""
+    for name in names:
+        if parameters[name] < 1:
+            raise ValueError(f"{name} must be at least 1")
+
+
+def _non_negative(parameters, *names):
+    """Raises ValueError unless every named parameter is a finite number of at least 0."""
+    for name in names:
+        if not math.isfinite(parameters[name]) or parameters[name] < 0:
+            raise ValueError(f"{name} must be at least 0")
+
+
+def _bounds(sizes):
+    """Returns the (start, stop) rows of consecutive blocks of the given sizes."""
+    stops = np.cumsum(sizes)
+    return list(zip(stops - sizes, stops))
+
+
+def _chunks(total, chunk):
+    """Returns the sizes of the chunks total is streamed in."""
+    return [min(chunk, total - start) for start in range(0, total, chunk)]
+
+
+def _decks(parameters):
+    """Returns the decks in the shoe of the parameter set's rules."""
+    return parameters['rules'].decks if parameters['rules'] is not None else 1
+
+
+def _prepare_blackjack(parameters):
+    """Checks the blackjack parameters and builds the rules, returns the hands simulated."""
+    _positive(parameters, 'num_plays')
+    if parameters['counting_strategy'] not in COUNTING_SYSTEMS:
+        raise ValueError(f"counting_strategy must be one of {', '.join(COUNTING_SYSTEMS)}")
+    rules = parameters['rules']
+    if rules is not None and not isinstance(rules, TableRules):
+        if not isinstance(rules, dict):
+            raise ValueError("rules must be an object of TableRules arguments")
+        checked = {}
+        for name, value in rules.items():
+            if name not in vars(DEFAULT_RULES):
+                raise ValueError(f"rules: unknown rule {name!r}, one of {', '.join(vars(DEFAULT_RULES))}")
+            default = getattr(DEFAULT_RULES, name)
+            if isinstance(value, bool) != isinstance(default, bool) or not isinstance(value, (int, float)) \
+                    or not math.isfinite(value) or type(default) is int and value != int(value):
+                kind = {bool: 'true or false', int: 'an integer'}.get(type(default), 'a number')
+                raise ValueError(f"rules: {name} must be {kind}")
+            checked[name] = type(default)(value)
+        if checked.get('decks', DEFAULT_RULES.decks) > MAX_DECKS:
+            raise ValueError(f"rules: decks must be at most {MAX_DECKS}")
+        try:
+            parameters['rules'] = TableRules(**checked)
+        except ValueError as error:
+            raise ValueError(f"rules: {error}") from None
+    return parameters['num_plays']
+
+
+def _prepare_hands(parameters, streaming):
+    """Checks the per hand parameters, the hands are held in memory even when streamed."""
+    hands = _prepare_blackjack(parameters)
+    plan = plan_blackjack(hands, 1, decks=_decks(parameters), modes=('hands',))
+    if not plan.fits:
+        raise RequestTooLarge(f"the hands would need {format_bytes(plan.estimates['hands'][0])}, "
+                              f"use /blackjack/checkpoints instead")
+    return hands
+
+
+def _prepare_checkpoints(parameters, streaming):
+    """Checks the checkpoint parameters, returns the hands simulated."""
+    _prepare_blackjack(parameters)
+    _positive(parameters, 'repetitions')
+    checkpoints = parameters['checkpoints']
+    if checkpoints is None:
+        checkpoints = default_checkpoints(parameters['num_plays'])
+    parameters['checkpoints'] = tuple(validate_checkpoints(checkpoints, parameters['num_plays']).tolist())
+    # A streamed response only holds one chunk of repetitions at a time
+    if not streaming:
+        plan = plan_blackjack(parameters['num_plays'], parameters['repetitions'], parameters['checkpoints'],
+                              _decks(parameters), modes=('checkpoints',))
+        if not plan.fits:
+            raise RequestTooLarge(f"the runs would need {format_bytes(plan.estimates['checkpoints'][0])}, "
+                                  f"stream them with ?stream=1")
+    return parameters['num_plays'] * parameters['repetitions']
+
+
+def _prepare_roulette(parameters, streaming):
+    """Checks the roulette parameters, returns the spins simulated."""
+    _positive(parameters, 'repeats', 'num_plays')
+    _non_negative(parameters, 'initial_balance', 'floor_balance')
+    if not math.isfinite(parameters['initial_bet']) or parameters['initial_bet'] <= 0:
+        raise ValueError("initial_bet must be positive")
+    if parameters['preference'] not in ('red', 'black', 'green'):
+        raise ValueError("preference must be red, black or green")
+    if parameters['wheel'] not in WHEELS:
+        raise ValueError(f"wheel must be one of {', '.join(WHEELS)}")
+    if parameters['seed'] is not None and not isinstance(parameters['seed'], int):
+        raise ValueError("seed must be an integer")
+    if parameters['target_balance'] is not None:
+        parameters['target_balance'] = float(parameters['target_balance'])
+    spins = parameters['num_plays'] * parameters['repeats']
+    if parameters['trajectory'] and not streaming and spins * 8 > MEMORY_BUDGET:
+        raise RequestTooLarge(f"the trajectories would need {format_bytes(spins * 8)}, stream them with ?stream=1")
+    return spins
+
+
+def _hands_payload(frame):
+    """Returns every column of a per hand DataFrame as an array, card columns as fixed width strings."""
+    payload = {column: frame[column].to_numpy() for column in frame.columns}
+    return {column: values.astype(str) if values.dtype == object else values for column, values in payload.items()}
+
+
+def _run_hands(items):
+    """Runs one blackjack_simulator per parameter set."""
+    return [_hands_payload(blackjack_simulator(item['num_plays'], item['starting_bankroll'], item['base_bet'],
+                                               item['counting_strategy'], rules=item['rules'])) for item in items]
+
+
+def _stream_hands(item, chunk):
+    """Simulates the hands in one go and streams them chunk by chunk."""
+    payload = _run_hands([item])[0]
+    for start in range(0, item['num_plays'], chunk):
+        yield {column: values[start:start + chunk] for column, values in payload.items()}
+    yield {'done': True, 'final_balance': payload['Balance'][-1],
+           'outcomes': np.array([payload[column].sum() for column in ('Win', 'Loss', 'Draw')])}
+
+
+def _checkpoint_key(item):
+    """Parameter sets of the same game share a run, whatever their number of repetitions."""
+    return ('checkpoints', item['num_plays'], item['starting_bankroll'], item['base_bet'], item['counting_strategy'],
+            repr(item['rules']), item['checkpoints'])
+
+
+def _checkpoint_payload(results, rows, paths):
+    """Returns the aggregates of a block of rows of CheckpointResults."""
+    balances = results.balances[rows]
+    payload = {'checkpoints': results.checkpoints, 'mean': balances.mean(axis=0),
+               'quantile_levels': np.array(QUANTILES), 'quantiles': np.quantile(balances, QUANTILES, axis=0),
+               'final_balances': balances[:, -1], 'outcomes': results.outcomes[rows].sum(axis=0)}
+    if paths:
+        payload['balances'] = balances
+    return payload
+
+
+def _simulate_checkpoints(item, repetitions):
+    """Runs blackjack_checkpoints for a parameter set with a given number of repetitions."""
+    return blackjack_checkpoints(item['num_plays'], item['starting_bankroll'], item['base_bet'], repetitions,
+                                 item['counting_strategy'], item['checkpoints'], rules=item['rules'])
+
+
+def _run_checkpoints(items):
+    """Runs the repetitions of every parameter set of a batch as one blackjack_checkpoints call."""
+    repetitions = [item['repetitions'] for item in items]
+    results = _simulate_checkpoints(items[0], sum(repetitions))
+    return [_checkpoint_payload(results, slice(start, stop), item['paths'])
+            for item, (start, stop) in zip(items, _bounds(repetitions))]
+
+
+def _stream_checkpoints(item, chunk):
+    """Streams the repetitions chunk by chunk, keeping only running sums and the final balance summary."""
+    total = None
+    final = StreamingSummary()
+    outcomes = np.zeros(3)
+    for repetitions in _chunks(item['repetitions'], chunk):
+        results = _simulate_checkpoints(item, repetitions)
+        sums = results.balances.sum(axis=0)
+        total = sums if total is None else total + sums
+        final.add(results.final_balances())
+        outcomes += results.outcomes.sum(axis=0)
+        payload = {'final_balances': results.final_balances(), 'outcomes': results.outcomes.sum(axis=0)}
+        if item['paths']:
+            payload['balances'] = results.balances
+        yield payload
+    yield {'done': True, 'checkpoints': np.array(item['checkpoints']), 'mean': total / item['repetitions'],
+           'quantile_levels': np.array(QUANTILES), 'final_quantiles': np.array([final.quantile(q) for q in QUANTILES]),
+           'outcomes': outcomes}
+
+
+def _roulette_payload(result, rows):
+    """Returns the arrays of a block of rows of a ProgressionResult."""
+    payload = {'balances': result.balances[rows], 'plays': result.plays[rows],
+               'stop_reasons': result.stop_reasons[rows], 'peaks': result.peaks[rows],
+               'max_drawdowns': result.max_drawdowns[rows]}
+    if result.trajectories is not None:
+        payload['trajectories'] = result.trajectories[rows]
+    return payload
+
+
+def _roulette_endpoint(name):
+    """Returns the Endpoint of one compiled progression."""
+    progression = PROGRESSIONS[name]
+
+    def batch_key(item):
+        # A seeded run must draw exactly the spins of its seed
+        if item['seed'] is not None:
+            return None
+        return ('roulette', name, item['num_plays'], item['wheel'], item['trajectory'])
+
+    def simulate(items, repeats, seed=None):
+        def column(field, missing=None):
+            return np.concatenate([per_repetition(missing if item[field] is None else item[field], count)
+                                   for item, count in zip(items, repeats)])
+
+        first = items[0]
+        preferences = np.repeat([item['preference'] for item in items], repeats)
+        return progression.simulate(sum(repeats), column('initial_balance'), first['num_plays'], column('initial_bet'),
+                                    preferences, column('target_balance', np.inf), column('floor_balance'),
+                                    first['trajectory'], seed, first['wheel'])
+
+    def run(items):
+        repeats = [item['repeats'] for item in items]
+        result = simulate(items, repeats, items[0]['seed'] if len(items) == 1 else None)
+        return [_roulette_payload(result, slice(start, stop)) for start, stop in _bounds(repeats)]
+
+    def stream(item, chunk):
+        sizes = _chunks(item['repeats'], chunk)
+        seeds = np.random.SeedSequence(item['seed']).spawn(len(sizes))
+        balances = StreamingSummary()
+        stop_reasons = np.zeros(len(STOP_REASONS), dtype=np.int64)
+        for size, seed in zip(sizes, seeds):
+            result = simulate([item], [size], seed)
+            balances.add(result.balances)
+            stop_reasons += np.bincount(result.stop_reasons, minlength=len(STOP_REASONS))
+            yield _roulette_payload(result, slice(None))
+        yield {'done': True, 'mean_balance': balances.mean(), 'quantile_levels': np.array(QUANTILES),
+               'balance_quantiles': np.array([balances.quantile(q) for q in QUANTILES]), 'stop_reasons': stop_reasons}
+
+    defaults = {'repeats': 1000, 'initial_balance': 1000.0, 'num_plays': 100, 'initial_bet': 10.0, 'preference': 'red',
+                'target_balance': None, 'floor_balance': 0.0, 'wheel': 'american', 'seed': None, 'trajectory': False}
+    return Endpoint(defaults, MAX_SPINS, _prepare_roulette, batch_key, run, stream, 'repeats')
+
+
+def _blackjack_defaults():
+    return {'num_plays': 500, 'starting_bankroll': 1000.0, 'base_bet': 10.0, 'counting_strategy': 'high_low',
+            'rules': None}
+
+
+def default_endpoints():
+    """Returns the Endpoint of every path the API serves."""
+    endpoints = {
+        '/blackjack/hands': Endpoint(_blackjack_defaults(), MAX_HANDS, _prepare_hands, lambda item: None, _run_hands,
+                                     _stream_hands),
+        '/blackjack/checkpoints': Endpoint(dict(_blackjack_defaults(), repetitions=100, checkpoints=None, paths=False),
+                                           MAX_HANDS, _prepare_checkpoints, _checkpoint_key, _run_checkpoints,
+                                           _stream_checkpoints, 'repetitions'),
+    }
+    for name in PROGRESSIONS:
+        endpoints[f'/roulette/{name}'] = _roulette_endpoint(name)
+    return endpoints
+
+
+class _Batch:
+    """Parameter sets waiting to run together, and their payloads once they have."""
+
+    def __init__(self):
+        self.items = []
+        self.payloads = None
+        self.error = None
+        self.finished = threading.Event()
+
+
+class Batcher:
+    """
+    Merges concurrent requests of the same batch key into one shared run.
+
+    The first request of a key opens a batch and waits a short window for others to join it, then runs every
+    parameter set of the batch with one call on the simulation service. Requests that arrive once the batch has left,
+    or that would take the batch past max_batch parameter sets or past the limits of its endpoint, open the next one.
+
+    Attributes:
+        service (SimulationService): service the merged runs are submitted to
+        window (float): seconds an open batch waits for further requests
+        max_batch (int): most parameter sets in one batch
+
+    Methods:
+        submit: Adds parameter sets to open batches of their key and returns their payloads once they have run.
+        stats: Returns the number of parameter sets and of the runs they were merged into.
+    """
+
+    def __init__(self, service, window=0.005, max_batch=256):
+        """Initialize a Batcher with no open batches."""
+        self.service = service
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._open = {}
+        self._counters = {'parameter_sets': 0, 'runs': 0, 'largest_batch': 0}
+
+    def submit(self, session_id, key, run, items, fits=None):
+        """
+        Adds parameter sets to open batches of their key and waits for them to run
+        Args:
+            session_id (str): client the request comes from, a batch runs on behalf of the client that opened it
+            key (tuple): batch key, parameter sets of one key can be merged into one run
+            run (function): returns the payload of every parameter set of a list, in order
+            items (list): parsed parameter sets
+            fits (function, optional): returns whether a list of parameter sets may run as one batch, every single
+                parameter set is assumed to fit
+        Returns:
+            list: payload of every parameter set of items
+        """
+        fits = fits or (lambda batch_items: True)
+        # A list too large for one batch is split, its parts run one after the other
+        parts = [[]]
+        for item in items:
+            if parts[-1] and (len(parts[-1]) == self.max_batch or not fits(parts[-1] + [item])):
+                parts.append([])
+            parts[-1].append(item)
+        return [payload for part in parts for payload in self._submit(session_id, key, run, part, fits)]
+
+    def _submit(self, session_id, key, run, items, fits):
+        """Adds parameter sets that fit in one batch to the open batch of their key, or opens the next one."""
+        with self._lock:
+            self._counters['parameter_sets'] += len(items)
+            batch = self._open.get(key)
+            leader = (batch is None or len(batch.items) + len(items) > self.max_batch
+                      or not fits(batch.items + items))
+            if leader:
+                batch = self._open[key] = _Batch()
+            start = len(batch.items)
+            batch.items.extend(items)
+
+        if leader:
+            time.sleep(self.window)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+                self._counters['runs'] += 1
+                self._counters['largest_batch'] = max(self._counters['largest_batch'], len(batch.items))
+            try:
+                batch.payloads = self.service.run(session_id, run, batch.items)
+            except Exception as error:
+                batch.error = error
+            batch.finished.set()
+        else:
+            batch.finished.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.payloads[start:start + len(items)]
+
+    def stats(self):
+        """Returns a dict of the parameter sets submitted, the runs they were merged into and the largest batch."""
+        with self._lock:
+            return dict(self._counters)
+
+
+def _jsonable(value):
+    """Converts a payload to JSON types, integral float arrays become integer lists for a more compact body."""
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == 'f' and np.isfinite(value).all() and (value == np.round(value)).all():
+            return value.astype(np.int64).tolist()
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def encode_json(payload):
+    """Returns a payload as compact JSON bytes."""
+    return json.dumps(_jsonable(payload), separators=(',', ':')).encode()
+
+
+def encode_npz(payloads, single):
+    """Returns payloads as an uncompressed .npz archive, keys are prefixed with the parameter set index for lists."""
+    arrays = {}
+    for index, payload in enumerate(payloads):
+        for name, value in payload.items():
+            arrays[name if single else f"{index}/{name}"] = np.asarray(value)
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+class SimulationAPI:
+    """
+    The simulators behind the HTTP endpoints, independent of the server that carries the requests.
+
+    Attributes:
+        endpoints (dict): Endpoint per path
+        service (SimulationService): runs every simulation, with coalescing and admission control
+        batcher (Batcher): merges concurrent requests into shared runs
+
+    Methods:
+        parse: Returns the endpoint of a path and the parsed parameter sets of a request body.
+        handle: Returns the payload of every parameter set of a request.
+        stream: Yields the JSON lines of a streamed request.
+        describe: Returns the endpoints with their default parameters.
+        stats: Returns the load of the service and the batching counters.
+    """
+
+    def __init__(self, workers=None, max_queued=64, max_per_client=8, window=0.005, endpoints=None):
+        """Initialize the API with its own simulation service."""
+        self.endpoints = endpoints or default_endpoints()
+        self.service = SimulationService(workers, max_queued, max_per_client)
+        self.batcher = Batcher(self.service, window)
+
+    def parse(self, path, body, streaming=False):
+        """
+        Looks up the endpoint of a path and validates a request body
+        Args:
+            path (str): request path
+            body (dict or list): one parameter set or a list of them
+            streaming (bool): whether the response will be streamed, which allows results larger than memory
+        Returns:
+            tuple: (Endpoint, list of parsed parameter sets, whether the body was a single parameter set), or None
+                for an unknown path
+        """
+        endpoint = self.endpoints.get(path.rstrip('/'))
+        if endpoint is None:
+            return None
+        single = not isinstance(body, list)
+        items = [endpoint.parse(parameters, streaming) for parameters in ([body] if single else body)]
+        if not items:
+            raise ValueError("the list of parameter sets is empty")
+        return endpoint, items, single
+
+    def handle(self, endpoint, items, session_id):
+        """Returns the payload of every parameter set, running the ones that share a batch key together."""
+        payloads = [None] * len(items)
+        batches = {}
+        for index, item in enumerate(items):
+            key = endpoint.batch_key(item)
+            if key is None:
+                payloads[index] = self.service.run(session_id, endpoint.run, [item])[0]
+            else:
+                batches.setdefault(key, []).append(index)
+
+        for key, indices in batches.items():
+            results = self.batcher.submit(session_id, key, endpoint.run, [items[index] for index in indices],
+                                          endpoint.fits)
+            for index, payload in zip(indices, results):
+                payloads[index] = payload
+        return payloads
+
+    def stream(self, endpoint, items, session_id, chunk=STREAM_CHUNK):
+        """Yields one JSON line per chunk of every parameter set, each ending with a summary line with 'done' set."""
+        for index, item in enumerate(items):
+            chunks = endpoint.stream(item, chunk)
+            while True:
+                # Each chunk is its own job on the service, so long streams take turns with the other clients
+                payload = self.service.run(session_id, next, chunks, None)
+                if payload is None:
+                    break
+                yield encode_json(dict(payload, index=index)) + b'\n'
+
+    def describe(self):
+        """Returns a dict of every path with its default parameters."""
+        return {path: {name: repr(value) if isinstance(value, TableRules) else value
+                       for name, value in endpoint.defaults.items()} for path, endpoint in self.endpoints.items()}
+
+    def stats(self):
+        """Returns the load of the simulation service and the batching counters."""
+        return {'service': self.service.stats(), 'batching': self.batcher.stats()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Carries requests to the SimulationAPI of the server."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip('/')
+        if path == '':
+            self._send(200, encode_json(self.server.api.describe()))
+        elif path == '/health':
+            self._send(200, encode_json(self.server.api.stats()))
+        else:
+            self._error(404, f"no endpoint at {path}")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        api = self.server.api
+        # Every connection is its own client, so one host running many clients is not throttled as one
+        session_id = f"{self.client_address[0]}:{self.client_address[1]}"
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length > MAX_BODY:
+                raise RequestTooLarge(f"request bodies are limited to {format_bytes(MAX_BODY)}")
+            body = json.loads(self.rfile.read(length) or b'{}')
+            streaming = query.get('stream') in ('1', 'true')
+            parsed = api.parse(url.path, body, streaming)
+            if parsed is None:
+                return self._error(404, f"no endpoint at {url.path}")
+            endpoint, items, single = parsed
+
+            binary = query.get('format') == 'npz' or NPZ_TYPE in self.headers.get('Accept', '')
+            if streaming:
+                if binary:
+                    raise ValueError("streamed responses are JSON lines, format=npz is not supported")
+                chunk = int(query.get('chunk', STREAM_CHUNK))
+                if chunk < 1:
+                    raise ValueError("chunk must be at least 1")
+                return self._send_stream(api.stream(endpoint, items, session_id, chunk))
+
+            payloads = api.handle(endpoint, items, session_id)
+            if binary:
+                self._send(200, encode_npz(payloads, single), NPZ_TYPE)
+            else:
+                self._send(200, encode_json(payloads[0] if single else payloads))
+        except ServiceBusy as error:
+            self._error(503, str(error), {'Retry-After': '1'})
+        except RequestTooLarge as error:
+            self._error(413, str(error))
+        except (ValueError, TypeError) as error:
+            self._error(400, str(error))
+        except Exception as error:
+            self._error(500, f"{type(error).__name__}: {error}")
+
+    def _send(self, status, body, content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, headers=None):
+        self._send(status, encode_json({'error': message}), headers=headers)
+
+    def _send_stream(self, lines):
+        # The first line is computed before the headers go out, so a busy service can still answer 503
+        first = next(lines)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self._write_chunk(first)
+        try:
+            for line in lines:
+                self._write_chunk(line)
+        except Exception as error:
+            # The status is already sent, the error becomes the last line
+            self._write_chunk(encode_json({'error': f"{type(error).__name__}: {error}"}) + b'\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b'\r\n')
+
+
+class APIServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server of a SimulationAPI, one thread per connection.
+
+    Attributes:
+        api (SimulationAPI): simulations behind the endpoints
+        verbose (bool): log every request to stderr
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, api=None, verbose=False):
+        """Initialize the server and bind it to a (host, port) address, port 0 picks a free port."""
+        super().__init__(address, _Handler)
+        self.api = api or SimulationAPI()
+        self.verbose = verbose
+
+
+def start_server(host='127.0.0.1', port=0, api=None):
+    """Starts an APIServer on a background thread and returns it, server.server_address holds the bound port."""
+    server = APIServer((host, port), api)
+    threading.Thread(target=server.serve_forever, name='simulation-api', daemon=True).start()
+    return server
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serves the simulators over a local HTTP/JSON API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None, help='simulation worker threads, one per CPU by default')
+    parser.add_argument('--window', type=float, default=0.005, help='seconds a batch waits for further requests')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    server = APIServer((args.host, args.port), SimulationAPI(args.workers, window=args.window), args.verbose)
+    print(f"Serving {', '.join(server.api.endpoints)} on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.api.service.shutdown(wait=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,384 @@
+import time
+import numpy as np
+
+from packages.blackjack_logic import BASIC_STRATEGY, DEFAULT_RULES, Card, Hand, compile_rules
+
+"""
+Contains the infinite deck simulation mode for estimating the expected value of a strategy without counting.
+
+Cards are drawn independently from the rank probabilities in large pre-generated blocks of rank codes, and every
+decision is a lookup into tables built once from a Strategy. Rounds are played and settled as play_round plays them
+under the table rules: insurance, the dealer's peek, late surrender, splits and resplits with a split hand doubling
+on its first card, the dealer's draw table and the payouts of CompiledRules.returns. Only the shoe differs, so the
+reported EV is the EV of the strategy the app plays, less the effect of card removal.
+"""
+
+# Rank codes index this list, the strategy functions only ever see these strings
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+RANK_VALUES = np.array([Card(rank).get_value() for rank in RANKS], dtype=np.int8)
+RANK_PROBABILITIES = np.full(len(RANKS), 1 / len(RANKS))
+ACE = RANKS.index('A')
+TEN_VALUED = np.array([RANK_VALUES[code] == 10 for code in range(len(RANKS))])
+
+# Soft hands are played differently depending on which of these cards they hold, checked in this order
+SOFT_CARDS = ['9', '8', '7', '6']
+
+
+class StrategyTables:
+    """
+    Lookup tables of a strategy's playing decisions at a fixed count.
+
+    Attributes:
+        hit (np.array): bool table indexed by [hand value, soft, soft card category, ace counted as 11, upcard code].
+        double (np.array): bool table indexed by [first card code, second card code, upcard code].
+        split_double (np.array): bool table indexed by [split card code, upcard code], whether a split hand doubles
+            on its first card, the point at which play_round asks.
+        surrender (np.array): bool table indexed by [first card code, second card code, upcard code].
+        split (np.array): bool table indexed by [pair card code, upcard code].
+        insurance (bool): whether the strategy insures at the count.
+        count (int or float): running count the tables were built for.
+        strategy (Strategy): strategy the tables were built from.
+    """
+
+    def __init__(self, count=0, strategy=BASIC_STRATEGY):
+        """Builds every table by asking the strategy about representative hands."""
+        self.count = count
+        self.strategy = strategy
+        self.hit = np.zeros((32, 2, len(SOFT_CARDS) + 1, 2, len(RANKS)), dtype=bool)
+        self.double = np.zeros((len(RANKS), len(RANKS), len(RANKS)), dtype=bool)
+        self.split_double = np.zeros((len(RANKS), len(RANKS)), dtype=bool)
+        self.surrender = np.zeros((len(RANKS), len(RANKS), len(RANKS)), dtype=bool)
+        self.split = np.zeros((len(RANKS), len(RANKS)), dtype=bool)
+        self.insurance = bool(strategy.should_insurance(count))
+        upcards = [Card(rank) for rank in RANKS]
+
+        for hand_ranks in _hands_below_21():
+            hand = _make_hand(hand_ranks)
+            key = hand_key(hand_ranks)
+            for code, upcard in enumerate(upcards):
+                self.hit[key + (code,)] = strategy.hit_or_stand(hand, upcard, count)
+
+        # Decisions on the first cards are asked about the exact cards, strategies may look at more than the total
+        for first, first_rank in enumerate(RANKS):
+            for code, upcard in enumerate(upcards):
+                self.split_double[first, code] = strategy.double_down(_make_hand([first_rank]), upcard, count)
+            for second, second_rank in enumerate(RANKS):
+                hand = _make_hand([first_rank, second_rank])
+                for code, upcard in enumerate(upcards):
+                    self.double[first, second, code] = strategy.double_down(hand, upcard, count)
+                    self.surrender[first, second, code] = strategy.should_surrender(hand, upcard, count)
+                    if first == second:
+                        self.split[first, code] = strategy.should_split(hand, upcard, count)
+
+
+def _make_hand(ranks):
+    """Returns a Hand object holding cards of the given ranks."""
+    hand = Hand()
+    for rank in ranks:
+        hand.add_card(Card(rank))
+    return hand
+
+
+def _hands_below_21(prefix=(), start=0):
+    """Yields every multiset of card ranks worth less than 21, the only hands the strategy is asked about."""
+    # Face cards play exactly like a 10 for the player, so '10' stands in for all of them
+    ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'A']
+    for index in range(start, len(ranks)):
+        hand_ranks = prefix + (ranks[index],)
+        hand = _make_hand(hand_ranks)
+        if sum(card.get_value() for card in hand.cards) >= 21:
+            continue
+        if hand.get_value() < 21:
+            yield hand_ranks
+        yield from _hands_below_21(hand_ranks, index)
+
+
+def soft_category(has_cards):
+    """Returns 1 to 4 for the first of SOFT_CARDS a hand holds, 0 if it holds none."""
+    for category, present in enumerate(has_cards, start=1):
+        if present:
+            return category
+    return 0
+
+
+def hand_key(ranks):
+    """Returns the (value, soft, soft card category, ace counted as 11) key of a hand given as card ranks."""
+    hand = _make_hand(ranks)
+    soft = hand.is_soft_hand()
+    category = soft_category([card in ranks for card in SOFT_CARDS]) if soft else 0
+    hard = sum(card.get_value() for card in hand.cards)
+    return hand.get_value(), int(soft), category, int(hand.get_value() != hard)
+
+
+def rank_mask(ranks):
+    """Returns a bool array over the rank codes, True for the ranks in a rule's set of ranks or upcards."""
+    return np.array([rank in ranks for rank in RANKS])
+
+
+def _natural(first, second):
+    """Whether each pair of first two cards is an ace and a ten valued card, the check of is_natural."""
+    return ((first == ACE) & TEN_VALUED[second]) | (TEN_VALUED[first] & (second == ACE))
+
+
+def _occurrence(rows):
+    """Returns for every entry how many earlier entries hold the same row."""
+    order = np.argsort(rows, kind='stable')
+    ordered = rows[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    occurrence = np.empty(len(rows), dtype=np.int64)
+    occurrence[order] = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+    return occurrence
+
+
+class InfiniteDeckResult:
+    """
+    Holds the outcome of an infinite deck simulation, in units of the base bet.
+
+    Attributes:
+        hands (int): number of player hands played, a split counts as two as in blackjack_simulator
+        rounds (int): number of rounds dealt
+        ev (float): mean net result per hand
+        std (float): standard deviation of the net result per hand
+        standard_error (float): Monte Carlo standard error of ev
+        frequencies (dict): share of hands that were won, lost, drawn and blackjacks
+        hands_per_minute (float): throughput of the run
+    """
+
+    def __init__(self, results, rounds, elapsed, frequencies):
+        """Initialize the result from the per hand net results."""
+        self.hands = len(results)
+        self.rounds = rounds
+        self.ev = float(results.mean())
+        self.std = float(results.std())
+        self.standard_error = self.std / np.sqrt(self.hands)
+        self.frequencies = frequencies
+        self.hands_per_minute = self.hands / elapsed * 60 if elapsed > 0 else float('inf')
+
+
+class _CardBlock:
+    """Pre-generated rows of independent rank codes, one row per round in flight."""
+
+    def __init__(self, rng, rows, width=24):
+        self.rng = rng
+        self.width = width
+        self.cards = rng.choice(len(RANKS), size=(rows, width), p=RANK_PROBABILITIES).astype(np.uint8)
+        self.position = np.zeros(rows, dtype=np.int64)
+
+    def draw(self, rows):
+        """Returns the next card of each given row, a row given several times deals consecutive cards in order."""
+        taken = np.bincount(rows, minlength=len(self.position))
+        exhausted = np.flatnonzero(self.position + taken > self.width)
+        if len(exhausted):
+            # Astronomically long rounds simply get a fresh row of independent cards
+            self.cards[exhausted] = self.rng.choice(len(RANKS), size=(len(exhausted), self.width), p=RANK_PROBABILITIES)
+            self.position[exhausted] = 0
+        cards = self.cards[rows, self.position[rows] + _occurrence(rows)]
+        self.position += taken
+        return cards
+
+
+class _Hands:
+    """Struct of arrays describing player hands in flight."""
+
+    def __init__(self, first, second):
+        size = len(first)
+        self.total = np.zeros(size, dtype=np.int16)
+        self.aces = np.zeros(size, dtype=np.int16)
+        self.soft_cards = np.zeros((len(SOFT_CARDS), size), dtype=bool)
+        self.first = first
+        self.second = second
+        self.add(np.arange(size), first)
+        self.add(np.arange(size), second)
+
+    def add(self, index, cards):
+        """Adds one card to each indexed hand."""
+        self.total[index] += RANK_VALUES[cards]
+        self.aces[index] += cards == ACE
+        for row, rank in enumerate(SOFT_CARDS):
+            self.soft_cards[row, index] |= cards == RANKS.index(rank)
+
+    def value(self):
+        """Best total of every hand, counting one ace as 11 when it does not bust, as Hand.get_value."""
+        return np.where((self.aces > 0) & (self.total + 10 <= 21), self.total + 10, self.total)
+
+    def soft(self):
+        """Whether every ace can count as 11, as Hand.is_soft_hand."""
+        return (self.aces > 0) & (self.total + 10 * self.aces <= 21)
+
+    def category(self):
+        """Soft card category of every hand, see soft_category."""
+        category = np.zeros(len(self.total), dtype=np.int8)
+        for row in range(len(SOFT_CARDS) - 1, -1, -1):
+            category[self.soft_cards[row]] = row + 1
+        return np.where(self.soft(), category, 0)
+
+    def key(self):
+        """The hit table key of every hand, see hand_key."""
+        value = self.value()
+        return value, self.soft().astype(np.int8), self.category(), (value != self.total).astype(np.int8)
+
+    def is_blackjack(self):
+        """Whether the first two cards are an ace and a ten valued card, the check _settle makes."""
+        return _natural(self.first, self.second)
+
+
+def _play_dealer(block, rounds, first, second, draws):
+    """Returns the final dealer value of every round, drawing while the draw table of CompiledRules says so."""
+    hard = RANK_VALUES[first].astype(np.int64) + RANK_VALUES[second]
+    ace = (first == ACE) | (second == ACE)
+    while True:
+        drawing = np.flatnonzero(draws[hard, ace.astype(np.int64)])
+        if not len(drawing):
+            return np.where(ace & (hard + 10 <= 21), hard + 10, hard)
+        cards = block.draw(rounds[drawing])
+        hard[drawing] += RANK_VALUES[cards]
+        ace[drawing] |= cards == ACE
+
+
+def _split_hands(block, tables, table, rounds, pair, upcard):
+    """
+    Deals the split hands of the given rounds their second cards, resplitting pairs as play_round does
+    Args:
+        block (_CardBlock): cards of the rounds
+        tables (StrategyTables): playing decisions
+        table (CompiledRules): compiled table rules
+        rounds (np.array): rounds whose pair is split
+        pair (np.array): pair card code of every round of the block
+        upcard (np.array): dealer upcard code of every round of the block
+    Returns:
+        tuple: round, first card, second card and whether it doubled on its first card of every split hand
+    """
+    split_double, resplit_ranks = rank_mask(table.split_double_upcards), rank_mask(table.resplit_ranks)
+    held = np.zeros(len(pair), dtype=np.int64)
+    held[rounds] = 2
+    pending = np.repeat(rounds, 2)
+    played = [(pending[:0], pair[:0], pair[:0], np.zeros(0, dtype=bool))]
+    while len(pending):
+        first, up = pair[pending], upcard[pending]
+        doubled = split_double[up] & tables.split_double[first, up]
+        second = block.draw(pending)
+
+        # Hands of one round resplit in turn while the round has room for another hand
+        resplit = np.flatnonzero(~doubled & (second == first) & resplit_ranks[first] & tables.split[first, up])
+        resplit = resplit[_occurrence(pending[resplit]) < table.max_hands - held[pending[resplit]]]
+        held += np.bincount(pending[resplit], minlength=len(held))
+
+        kept = np.ones(len(pending), dtype=bool)
+        kept[resplit] = False
+        played.append((pending[kept], first[kept], second[kept], doubled[kept]))
+        pending = np.repeat(pending[resplit], 2)
+    return tuple(np.concatenate(parts) for parts in zip(*played))
+
+
+def _play_block(rng, tables, table, size):
+    """Plays size rounds and returns the net result of every hand and the outcome counts."""
+    block = _CardBlock(rng, size)
+    rounds = np.arange(size)
+    returns = table.returns
+    player_first, dealer_up = block.draw(rounds), block.draw(rounds)
+    player_second, dealer_hole = block.draw(rounds), block.draw(rounds)
+    dealer_natural = _natural(dealer_up, dealer_hole)
+
+    # Insurance pays 2:1 on the dealer's blackjack, the player insures half the bet
+    insured = tables.insurance & rank_mask(table.insurance_upcards)[dealer_up]
+    insurance = np.where(insured, 0.5 * (returns['insurance'] * dealer_natural - 1), 0.0)
+
+    # A peeking dealer ends the round on a blackjack before the player acts, surrender ends it after the first cards
+    peeked = rank_mask(table.peek_upcards)[dealer_up] & dealer_natural
+    split = ~peeked & (player_first == player_second) & tables.split[player_first, dealer_up]
+    surrendered = (~peeked & ~split & rank_mask(table.surrender_upcards)[dealer_up]
+                   & tables.surrender[player_first, player_second, dealer_up])
+
+    # Unsplit rounds keep their two cards, split rounds become two or more hands starting from one card each
+    unsplit = rounds[~peeked & ~split & ~surrendered]
+    split_round, split_first, split_second, split_doubled = _split_hands(block, tables, table, rounds[split],
+                                                                         player_first, dealer_up)
+    hand_round = np.concatenate([unsplit, split_round])
+    hands = _Hands(np.concatenate([player_first[unsplit], split_first]),
+                   np.concatenate([player_second[unsplit], split_second]))
+    index = np.arange(len(hand_round))
+    is_split = index >= len(unsplit)
+    upcard = dealer_up[hand_round]
+    doubled = np.concatenate([tables.double[player_first[unsplit], player_second[unsplit], dealer_up[unsplit]],
+                              split_doubled])
+    stake = np.where(doubled, 2.0, 1.0)
+
+    # Doubled unsplit hands take exactly one card, doubled split hands play on as play_round plays them
+    hands.add(index[doubled & ~is_split], block.draw(hand_round[doubled & ~is_split]))
+    can_hit = ~(doubled & ~is_split)
+
+    while True:
+        key = hands.key()
+        hitting = index[can_hit & (key[0] < 21)]
+        if not len(hitting):
+            break
+        hit = tables.hit[tuple(part[hitting] for part in key) + (upcard[hitting],)]
+        can_hit[hitting[~hit]] = False
+        hitting = hitting[hit]
+        hands.add(hitting, block.draw(hand_round[hitting]))
+
+    dealer = _play_dealer(block, rounds, dealer_up, dealer_hole, np.array(table.dealer_draws))[hand_round]
+    value = hands.value()
+    bust = value > 21
+    blackjack = ~bust & hands.is_blackjack()
+    win = ~bust & ~blackjack & ((dealer > 21) | (value > dealer))
+    draw = ~bust & ~blackjack & ~win & (value == dealer)
+    lose = ~(blackjack | win | draw)
+    result = stake * np.select([blackjack, win, draw], [returns['blackjack'] - 1, returns['win'] - 1,
+                                                        returns['push'] - 1], -1)
+
+    # Peeked and surrendered rounds settle their one hand, a surrender counts as a loss
+    ended, gave_up = rounds[peeked], rounds[surrendered]
+    pushed = _natural(player_first[ended], player_second[ended])
+    no_hands = np.zeros(len(ended) + len(gave_up), dtype=bool)
+    hand_round = np.concatenate([hand_round, ended, gave_up])
+    result = np.concatenate([result, np.where(pushed, returns['push'] - 1, -1.0),
+                             np.full(len(gave_up), returns['surrender'] - 1.0)])
+    won = np.concatenate([win | blackjack, no_hands])
+    lose = np.concatenate([lose, ~pushed, np.ones(len(gave_up), dtype=bool)])
+    draw = np.concatenate([draw, pushed, np.zeros(len(gave_up), dtype=bool)])
+    blackjack = np.concatenate([blackjack, no_hands])
+
+    # The insurance bet is settled with the first hand of its round
+    first = np.unique(hand_round, return_index=True)[1]
+    result[first] += insurance[hand_round[first]]
+
+    counts = np.array([won.sum(), lose.sum(), draw.sum(), blackjack.sum()])
+    return result, counts
+
+
+def infinite_deck_ev(num_hands, seed=None, block_size=500_000, count=0, tables=None, strategy=BASIC_STRATEGY,
+                     rules=None):
+    """
+    Estimates the expected value per hand of a strategy with an infinite deck
+    Args:
+        num_hands (int): number of player hands to play, at least
+        seed (int, optional): seed for the random generator
+        block_size (int): rounds dealt per vectorized block
+        count (int or float): running count the decisions are taken at, 0 for basic strategy
+        tables (StrategyTables, optional): prebuilt decision tables, built from strategy at count if not given
+        strategy (Strategy): playing decisions, the module's basic strategy by default
+        rules (TableRules, optional): table rules, DEFAULT_RULES if not given, the number of decks and the reshuffle
+            point do not apply to an infinite deck
+    Returns:
+        InfiniteDeckResult: EV, spread and outcome frequencies in units of the base bet
+    """
+    rng = np.random.default_rng(seed)
+    tables = StrategyTables(count, strategy) if tables is None else tables
+    table = compile_rules(rules or DEFAULT_RULES)
+    results, counts, rounds = [], np.zeros(4, dtype=np.int64), 0
+
+    start = time.perf_counter()
+    played = 0
+    while played < num_hands:
+        size = min(block_size, num_hands - played)
+        result, block_counts = _play_block(rng, tables, table, size)
+        results.append(result)
+        counts += block_counts
+        rounds += size
+        played += len(result)
+    elapsed = time.perf_counter() - start
+
+    results = np.concatenate(results)
+    frequencies = dict(zip(['Win', 'Loss', 'Draw', 'Blackjack'], counts / len(results)))
+    return InfiniteDeckResult(results, rounds, elapsed, frequencies)
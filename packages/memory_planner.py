@@ -0,0 +1,261 @@
+import sys
+import time
+
+from packages.blackjack_logic import (BASIC_STRATEGY, BlackjackRun, Deck, blackjack_checkpoints,
+                                      blackjack_simulator, default_checkpoints, validate_checkpoints)
+from packages.chunked import MAX_DISTINCT, blackjack_summary
+
+"""
+Contains the planner that picks how much of a blackjack simulation is kept, before the simulation starts.
+
+A run can keep every hand as a row of the per hand DataFrame, keep the bankroll of every repetition at the
+checkpoints along with the live shoe the run is grown from, or only stream the checkpoints into per play count
+statistics. The peak memory and the time of each mode are estimated from the parameters and calibrated per row
+costs, and the richest mode that fits the memory budget is chosen, so a run too large for the server degrades to
+leaner output instead of exhausting its memory.
+
+Measure the per row costs of this machine with:
+
+    python -m packages.memory_planner --calibrate
+"""
+
+# Execution modes from the richest output to the leanest
+MODES = ('hands', 'checkpoints', 'streaming')
+MODE_NAMES = {'hands': 'full per hand DataFrame', 'checkpoints': 'per checkpoint arrays',
+              'streaming': 'streaming summaries only'}
+
+# Peak memory one simulation may use by default
+MEMORY_BUDGET = 512 * 2 ** 20
+
+# Repetitions per chunk of the streaming mode, as in blackjack_summary
+STREAMING_CHUNK = 64
+
+
+class CostModel:
+    """
+    Calibrated per row costs of the blackjack execution modes.
+
+    Attributes:
+        hand_row_bytes (float): bytes a settled hand keeps as a row of the per hand DataFrame
+        hand_build_bytes (float): bytes a hand holds while the rows of one repetition are being collected
+        run_bytes (float): bytes of the live simulator state of one repetition with a single deck shoe
+        run_bytes_per_deck (float): further bytes of that state per deck in the shoe
+        checkpoint_bytes (float): bytes of one recorded bankroll, including the copy made when a run grows
+        play_count_bytes (float): bytes of the per play count statistics per play
+        summary_bytes (float): bytes of a distinct final balance in a streaming summary
+        hands_per_second (dict): simulated hands per second of each mode
+
+    Methods:
+        estimate: Returns the (peak bytes, seconds) of one mode.
+    """
+
+    def __init__(self, hand_row_bytes=115, hand_build_bytes=575, run_bytes=2200, run_bytes_per_deck=416,
+                 checkpoint_bytes=16, play_count_bytes=24, summary_bytes=16, hands_per_second=None):
+        """Initialize a CostModel, by default with the costs measured on the development machine."""
+        self.hand_row_bytes = hand_row_bytes
+        self.hand_build_bytes = hand_build_bytes
+        self.run_bytes = run_bytes
+        self.run_bytes_per_deck = run_bytes_per_deck
+        self.checkpoint_bytes = checkpoint_bytes
+        self.play_count_bytes = play_count_bytes
+        self.summary_bytes = summary_bytes
+        self.hands_per_second = hands_per_second or {'hands': 20000, 'checkpoints': 22000, 'streaming': 22000}
+
+    def __repr__(self):
+        return (f"CostModel(hand_row_bytes={self.hand_row_bytes:.0f}, hand_build_bytes={self.hand_build_bytes:.0f}, "
+                f"run_bytes={self.run_bytes:.0f}, run_bytes_per_deck={self.run_bytes_per_deck:.0f}, "
+                f"checkpoint_bytes={self.checkpoint_bytes:.0f}, play_count_bytes={self.play_count_bytes:.0f}, "
+                f"summary_bytes={self.summary_bytes:.0f}, "
+                f"hands_per_second={ {mode: round(rate) for mode, rate in self.hands_per_second.items()} })")
+
+    def estimate(self, mode, num_plays, repetitions, checkpoints, decks=1):
+        """
+        Estimates the peak memory and the time of one execution mode
+        Args:
+            mode (string): one of MODES
+            num_plays (int): number of plays per repetition
+            repetitions (int): number of repetitions
+            checkpoints (int): number of checkpoints recorded per repetition
+            decks (int): decks in the shoe
+        Returns:
+            tuple: (peak bytes, seconds)
+        """
+        run = self.run_bytes + self.run_bytes_per_deck * decks + self.checkpoint_bytes * checkpoints
+        if mode == 'hands':
+            peak = repetitions * num_plays * self.hand_row_bytes + num_plays * self.hand_build_bytes
+        elif mode == 'checkpoints':
+            peak = repetitions * run
+        elif mode == 'streaming':
+            peak = (min(STREAMING_CHUNK, repetitions) * run + num_plays * self.play_count_bytes
+                    + min(repetitions, MAX_DISTINCT) * self.summary_bytes)
+        else:
+            raise ValueError(f"mode must be one of {MODES}")
+        return float(peak), repetitions * num_plays / self.hands_per_second[mode]
+
+
+DEFAULT_COSTS = CostModel()
+
+
+class ExecutionPlan:
+    """
+    Estimated cost of every execution mode of one simulation and the mode chosen for it.
+
+    Attributes:
+        mode (str): chosen mode, one of MODES
+        estimates (dict): (peak bytes, seconds) of every mode considered
+        budget (float): memory budget in bytes
+        fits (bool): whether the chosen mode fits the budget, False when even the leanest one does not
+
+    Methods:
+        describe: Returns a one line description of the plan.
+    """
+
+    def __init__(self, mode, estimates, budget):
+        """Initialize an ExecutionPlan."""
+        self.mode = mode
+        self.estimates = estimates
+        self.budget = budget
+        self.fits = estimates[mode][0] <= budget
+
+    def __repr__(self):
+        return f"ExecutionPlan({self.mode!r}, budget={self.budget!r})"
+
+    def describe(self):
+        """Returns the chosen mode with its estimated memory and time, and the richer modes it falls back from."""
+        peak, seconds = self.estimates[self.mode]
+        text = (f"Running as {MODE_NAMES[self.mode]}: about {format_bytes(peak)} and {format_seconds(seconds)} "
+                f"(budget {format_bytes(self.budget)}).")
+        skipped = [mode for mode in MODES if mode in self.estimates and MODES.index(mode) < MODES.index(self.mode)]
+        if skipped:
+            needs = ", ".join(f"the {MODE_NAMES[mode]} would need {format_bytes(self.estimates[mode][0])}"
+                              for mode in skipped)
+            text += f" {needs[0].upper()}{needs[1:]}."
+        if not self.fits:
+            text += " Even the leanest mode is over the budget."
+        return text
+
+
+def format_bytes(size):
+    """Returns a byte count in B, KB, MB or GB."""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def format_seconds(seconds):
+    """Returns a duration in seconds, minutes or hours."""
+    if seconds < 60:
+        return f"{seconds:.1f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def plan_blackjack(num_plays, repetitions, checkpoints=None, decks=1, budget=MEMORY_BUDGET, modes=MODES,
+                   costs=DEFAULT_COSTS):
+    """
+    Picks the richest execution mode of a blackjack simulation whose estimated peak memory fits a budget
+    Args:
+        num_plays (int): number of plays per repetition
+        repetitions (int): number of repetitions
+        checkpoints (list, optional): play counts to record, default_checkpoints(num_plays) if not given
+        decks (int): decks in the shoe
+        budget (float): memory budget in bytes
+        modes (tuple): modes the caller can use, richest first
+        costs (CostModel): per row costs
+    Returns:
+        ExecutionPlan: the chosen mode and the estimate of every mode, the leanest mode if none fits
+    """
+    checkpoints = len(default_checkpoints(num_plays) if checkpoints is None else checkpoints)
+    estimates = {mode: costs.estimate(mode, num_plays, repetitions, checkpoints, decks) for mode in modes}
+    chosen = next((mode for mode in modes if estimates[mode][0] <= budget), modes[-1])
+    return ExecutionPlan(chosen, estimates, budget)
+
+
+def run_blackjack(plan, num_plays, starting_bankroll, base_bet, repetitions, counting_strategy, checkpoints=None,
+                  strategy=BASIC_STRATEGY, bet_ramp=None, rules=None):
+    """
+    Runs a blackjack simulation in the mode of a plan, the other arguments are those of blackjack_checkpoints
+    Returns:
+        list: one per hand DataFrame per repetition, for the 'hands' mode
+        or CheckpointResults, for the 'checkpoints' mode
+        or tuple: the (PlayCountStats, StreamingSummary, outcomes) of blackjack_summary, for the 'streaming' mode
+    """
+    if plan.mode == 'hands':
+        return [blackjack_simulator(num_plays, starting_bankroll, base_bet, counting_strategy, strategy,
+                                    bet_ramp=bet_ramp, rules=rules) for _ in range(repetitions)]
+    if plan.mode == 'checkpoints':
+        return blackjack_checkpoints(num_plays, starting_bankroll, base_bet, repetitions, counting_strategy,
+                                     checkpoints, strategy, bet_ramp, rules)
+    return blackjack_summary(num_plays, starting_bankroll, base_bet, repetitions, counting_strategy, checkpoints,
+                             strategy, STREAMING_CHUNK, bet_ramp=bet_ramp, rules=rules)
+
+
+def calibrate(num_plays=2000, repetitions=20):
+    """
+    Measures the per row costs of the execution modes on this machine with tracemalloc
+    Args:
+        num_plays (int): plays per measured repetition
+        repetitions (int): repetitions of the measured checkpoint and streaming runs
+    Returns:
+        CostModel: the measured costs
+    """
+    import tracemalloc
+
+    def measure(function):
+        # Memory and time are measured on separate calls, tracing slows the simulator down
+        tracemalloc.start()
+        result = function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        function()
+        return result, peak, time.perf_counter() - start
+
+    # Imports and first call allocations are not part of the per row costs
+    blackjack_simulator(10, 0, 1, 'high_low')
+    frame, peak, seconds = measure(lambda: blackjack_simulator(num_plays, 0, 1, 'high_low'))
+    hand_row_bytes = frame.memory_usage(deep=True).sum() / num_plays
+    hand_build_bytes = peak / num_plays
+    hands_per_second = {'hands': num_plays / seconds}
+
+    checkpoints = validate_checkpoints(default_checkpoints(num_plays), num_plays)
+    _, peak, seconds = measure(lambda: BlackjackRun(0, 1, 'high_low').grow(repetitions, num_plays))
+    hands_per_second['checkpoints'] = repetitions * num_plays / seconds
+    # A run holds its shoe, which is largest when freshly shuffled
+    per_deck = sys.getsizeof(Deck(2).cards) - sys.getsizeof(Deck(1).cards)
+    checkpoint_bytes = DEFAULT_COSTS.checkpoint_bytes
+    base = peak / repetitions - per_deck - checkpoint_bytes * len(checkpoints)
+
+    _, peak, seconds = measure(lambda: blackjack_summary(num_plays, 0, 1, repetitions, 'high_low',
+                                                               chunk=STREAMING_CHUNK))
+    hands_per_second['streaming'] = repetitions * num_plays / seconds
+    return CostModel(hand_row_bytes, hand_build_bytes, base, per_deck, checkpoint_bytes,
+                     DEFAULT_COSTS.play_count_bytes, DEFAULT_COSTS.summary_bytes, hands_per_second)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Estimates the memory and time of every blackjack execution mode")
+    parser.add_argument('--plays', type=int, default=500, help='plays per repetition')
+    parser.add_argument('--repetitions', type=int, default=1000)
+    parser.add_argument('--decks', type=int, default=1)
+    parser.add_argument('--budget-mb', type=float, default=MEMORY_BUDGET / 2 ** 20, help='memory budget in MB')
+    parser.add_argument('--calibrate', action='store_true', help='measure the per row costs of this machine first')
+    args = parser.parse_args()
+
+    costs = calibrate() if args.calibrate else DEFAULT_COSTS
+    if args.calibrate:
+        print(costs)
+    plan = plan_blackjack(args.plays, args.repetitions, decks=args.decks, budget=args.budget_mb * 2 ** 20, costs=costs)
+    for mode, (peak, seconds) in plan.estimates.items():
+        print(f"{MODE_NAMES[mode]:<28} {format_bytes(peak):>10} {format_seconds(seconds):>10}"
+              f"{'   <- chosen' if mode == plan.mode else ''}")
+    print(plan.describe())
+
+
+if __name__ == '__main__':
+    main()
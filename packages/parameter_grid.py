@@ -0,0 +1,130 @@
+import numpy as np
+
+from packages.blackjack_logic import BASIC_STRATEGY, blackjack_checkpoints
+
+"""
+Contains the parameter grid runner for sensitivity surfaces.
+
+Every configuration of a grid gets its own block of repetitions and the parameters are broadcast along the repetition
+axis, so a whole grid of roulette configurations runs as one batched progression call. Flat bet blackjack scales
+exactly with the bet and shifts with the bankroll, so one simulation in betting units gives the whole blackjack grid.
+"""
+
+# Progression parameters that can span a grid axis
+PROGRESSION_AXES = ('initial_balance', 'initial_bet', 'target_balance', 'floor_balance', 'preference')
+
+
+class GridResult:
+    """
+    Summary statistics of every configuration of a two dimensional parameter grid.
+
+    Attributes:
+        x_name (str): parameter along the columns
+        x_values (np.array): values of the x parameter
+        y_name (str): parameter along the rows
+        y_values (np.array): values of the y parameter
+        mean_balance (np.array): mean ending balance, shape (len(y_values), len(x_values))
+        profit_probability (np.array): share of repetitions ending above their starting balance
+        ruin_probability (np.array): share of repetitions that were ruined
+        repeats (int): repetitions per configuration
+
+    Methods:
+        frame: Returns the grid as a long DataFrame, one row per configuration.
+    """
+
+    def __init__(self, x_name, x_values, y_name, y_values, mean_balance, profit_probability, ruin_probability, repeats):
+        """Initialize a GridResult."""
+        self.x_name = x_name
+        self.x_values = np.asarray(x_values)
+        self.y_name = y_name
+        self.y_values = np.asarray(y_values)
+        self.mean_balance = mean_balance
+        self.profit_probability = profit_probability
+        self.ruin_probability = ruin_probability
+        self.repeats = repeats
+
+    def frame(self):
+        """Returns a DataFrame with the two parameters and the three statistics of every configuration."""
+        import pandas as pd
+
+        y, x = np.meshgrid(self.y_values, self.x_values, indexing='ij')
+        return pd.DataFrame({self.x_name: x.ravel(), self.y_name: y.ravel(),
+                             'Mean Ending Balance': self.mean_balance.ravel(),
+                             'Probability of Profit': self.profit_probability.ravel(),
+                             'Probability of Ruin': self.ruin_probability.ravel()})
+
+
+def progression_grid(progression, repeats, num_plays, x_name, x_values, y_name, y_values, seed=None,
+                     wheel='american', **fixed):
+    """
+    Simulates a progression over every configuration of a two parameter grid in one batched call
+    Args:
+        progression (CompiledProgression): batched progression kernel
+        repeats (int): repetitions per configuration
+        num_plays (int): maximum number of spins per repetition
+        x_name (string): parameter varied along the columns, one of PROGRESSION_AXES
+        x_values (list): values of the x parameter
+        y_name (string): parameter varied along the rows, one of PROGRESSION_AXES
+        y_values (list): values of the y parameter
+        seed (int, optional): seed for the random generator
+        wheel (string): "american" or "european"
+        **fixed: values of the parameters that are not on an axis
+    Returns:
+        GridResult: mean ending balance, probability of profit and probability of ruin per configuration
+    """
+    if x_name == y_name or not {x_name, y_name} <= set(PROGRESSION_AXES):
+        raise ValueError(f"Grid axes must be two different parameters out of {PROGRESSION_AXES}")
+    parameters = {'initial_balance': 200, 'initial_bet': 10, 'target_balance': np.inf, 'floor_balance': 0,
+                  'preference': 'red'}
+    parameters.update(fixed)
+    if parameters['target_balance'] is None:
+        parameters['target_balance'] = np.inf
+
+    # Configuration (row, column) owns repetitions [(row * columns + column) * repeats, ... + repeats)
+    rows, columns = len(y_values), len(x_values)
+    y_index, x_index = np.meshgrid(np.arange(rows), np.arange(columns), indexing='ij')
+    parameters[x_name] = np.repeat(np.asarray(x_values)[x_index.ravel()], repeats)
+    parameters[y_name] = np.repeat(np.asarray(y_values)[y_index.ravel()], repeats)
+    total = rows * columns * repeats
+
+    result = progression.simulate(total, parameters['initial_balance'], num_plays, parameters['initial_bet'],
+                                  parameters['preference'], parameters['target_balance'], parameters['floor_balance'],
+                                  seed=seed, wheel=wheel)
+
+    shape = (rows, columns, repeats)
+    start = np.broadcast_to(np.asarray(parameters['initial_balance'], dtype=float), (total,))
+    balances = result.balances.reshape(shape)
+    profit = (result.balances > start).reshape(shape)
+    # Ruined repetitions stopped at the floor or could no longer cover their next bet
+    ruined = np.isin(result.stop_reasons, (2, 3)).reshape(shape)
+    return GridResult(x_name, x_values, y_name, y_values, balances.mean(axis=2), profit.mean(axis=2),
+                      ruined.mean(axis=2), repeats)
+
+
+def blackjack_grid(num_plays, repetitions, counting_strategy, base_bets, starting_bankrolls, strategy=BASIC_STRATEGY):
+    """
+    Evaluates flat bet blackjack over a grid of bets and starting bankrolls from a single simulation
+    Args:
+        num_plays (int): number of plays per repetition
+        repetitions (int): repetitions shared by every configuration
+        counting_strategy (string): "high_low", "zen" or "halves"
+        base_bets (list): bets along the columns
+        starting_bankrolls (list): starting bankrolls along the rows
+        strategy (Strategy): playing decisions
+    Returns:
+        GridResult: mean ending balance, probability of profit and probability of the bankroll reaching zero
+    """
+    # Bankroll after every play of repetitions played with a bet of 1 from a bankroll of 0
+    units = blackjack_checkpoints(num_plays, 0, 1, repetitions, counting_strategy, np.arange(1, num_plays + 1),
+                                  strategy).balances
+    bets = np.asarray(base_bets, dtype=float)
+    bankrolls = np.asarray(starting_bankrolls, dtype=float)
+
+    # A configuration's balance is bankroll + bet * units, so each statistic is a threshold on the units
+    final = units[:, -1]
+    lowest = units.min(axis=1)
+    mean_balance = bankrolls[:, None] + bets[None, :] * final.mean()
+    profit_probability = np.broadcast_to((final > 0).mean(), mean_balance.shape).copy()
+    ruin_probability = (lowest[None, None, :] <= -bankrolls[:, None, None] / bets[None, :, None]).mean(axis=2)
+    return GridResult('Base Bet', bets, 'Starting Bankroll', bankrolls, mean_balance, profit_probability,
+                      ruin_probability, repetitions)
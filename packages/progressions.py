@@ -0,0 +1,559 @@
+import threading
+
+import numpy as np
+
+from packages.roulette_engine import WHEELS
+
+"""
+Contains the declarative bet progression engine for the roulette strategies.
+
+A progression is described by a Progression spec (how the bet changes on a win or a loss, when it resets and the
+table limits) and compiled once into a batched NumPy kernel that plays every repetition at the same time.
+"""
+
+RULE_ACTIONS = ('keep', 'reset', 'multiply', 'add', 'step', 'cancel', 'append')
+
+# Why a repetition stopped, indexed by ProgressionResult.stop_reasons
+STOP_REASONS = ('completed', 'target', 'floor', 'bet_exceeds_balance')
+
+
+class Rule:
+    """
+    Represents how the bet changes after a win or a loss.
+
+    Attributes:
+        action (str): One of 'keep', 'reset', 'multiply', 'add', 'step', 'cancel' or 'append'.
+        amount (float): Factor for 'multiply', base bet units for 'add', sequence levels for 'step'.
+
+    Actions:
+        keep: Bet the same amount again.
+        reset: Go back to the base bet (and to the start of the sequence or line).
+        multiply: Multiply the bet by amount.
+        add: Add amount base bets to the bet, negative amounts take away.
+        step: Move amount levels along the progression's sequence.
+        cancel: Cross off the first and last numbers of the Labouchere line.
+        append: Add the lost bet to the end of the Labouchere line.
+    """
+
+    def __init__(self, action, amount=None):
+        """Initialize a Rule with an action and its amount."""
+        if action not in RULE_ACTIONS:
+            raise ValueError(f"Unknown rule action '{action}', expected one of {RULE_ACTIONS}")
+        self.action = action
+        self.amount = amount
+
+    def __repr__(self):
+        return f"Rule({self.action!r}, {self.amount!r})"
+
+
+class Progression:
+    """
+    Declarative description of a bet progression.
+
+    Attributes:
+        name (str): Display name of the progression.
+        on_win (Rule): Bet update after a winning spin.
+        on_loss (Rule): Bet update after a losing spin.
+        sequence (list): Multiples of the base bet walked through by 'step' rules (e.g. Fibonacci).
+        line (list): Starting Labouchere line in base bet units, used by 'cancel' and 'append' rules.
+        reset_after_wins (int): Reset to the base bet after this many wins in a row (e.g. Paroli).
+        cycle_target (float): Reset once the cycle profit reaches this many base bets, never betting more than
+            needed to reach it (e.g. Oscar's Grind).
+        table_min (float): Smallest bet the table accepts.
+        table_max (float): Largest bet the table accepts.
+        cap_to_balance (bool): After a loss, lower the bet to the remaining balance.
+    """
+
+    def __init__(self, name, on_win, on_loss, sequence=None, line=None, reset_after_wins=None, cycle_target=None,
+                 table_min=None, table_max=None, cap_to_balance=False):
+        """Initialize a Progression spec."""
+        self.name = name
+        self.on_win = on_win
+        self.on_loss = on_loss
+        self.sequence = sequence
+        self.line = line
+        self.reset_after_wins = reset_after_wins
+        self.cycle_target = cycle_target
+        self.table_min = table_min
+        self.table_max = table_max
+        self.cap_to_balance = cap_to_balance
+
+    def __repr__(self):
+        return f"Progression({self.name!r}, on_win={self.on_win!r}, on_loss={self.on_loss!r})"
+
+
+class ProgressionResult:
+    """
+    Holds the outcome of a batched progression simulation.
+
+    Attributes:
+        balances (np.array): Ending balance of every repetition.
+        plays (np.array): Number of spins each repetition actually played, i.e. its stopping time.
+        trajectories (np.array): Balance after every spin, shape (repetitions, num_plays + 1), if requested.
+        stop_reasons (np.array): Index into STOP_REASONS of why each repetition stopped.
+        peaks (np.array): Highest balance each repetition reached.
+        max_drawdowns (np.array): Largest fall from a previous peak of each repetition.
+        longest_losing_streaks (np.array): Most consecutive losing spins of each repetition.
+        likelihood_ratios (np.array): Likelihood ratio of every repetition's spins under the true win probability
+            over the tilted one it was drawn with, if the run was tilted (see rare_events).
+        tilt_counts (tuple): (wins, spins) played at every tilt level, each shaped (repetitions, levels), if the run
+            was tilted.
+
+    Methods:
+        stop_reason_counts: Returns the number of repetitions per stop reason.
+    """
+
+    def __init__(self, balances, plays, trajectories=None, stop_reasons=None, peaks=None, max_drawdowns=None,
+                 longest_losing_streaks=None, likelihood_ratios=None, tilt_counts=None):
+        """Initialize a ProgressionResult."""
+        self.balances = balances
+        self.plays = plays
+        self.trajectories = trajectories
+        self.stop_reasons = stop_reasons
+        self.peaks = peaks
+        self.max_drawdowns = max_drawdowns
+        self.longest_losing_streaks = longest_losing_streaks
+        self.likelihood_ratios = likelihood_ratios
+        self.tilt_counts = tilt_counts
+
+    def stop_reason_counts(self):
+        """Returns a dict of the number of repetitions per stop reason, in STOP_REASONS order."""
+        counts = np.bincount(self.stop_reasons, minlength=len(STOP_REASONS))
+        return dict(zip(STOP_REASONS, counts.tolist()))
+
+
+def per_repetition(value, repeats):
+    """Returns a scalar or per repetition parameter as a float array with one value per repetition."""
+    return np.broadcast_to(np.asarray(value, dtype=float), (repeats,))
+
+
+def win_probabilities(preference, wheel='american'):
+    """Returns the chance of winning a colour bet, per repetition if preference is an array of colours."""
+    colors = WHEELS[wheel].colors
+    if isinstance(preference, str):
+        return (colors == preference.lower()).mean()
+    chances = {color: (colors == color).mean() for color in ('red', 'black', 'green')}
+    return np.array([chances[color.lower()] for color in preference])
+
+
+def fibonacci_sequence(length):
+    """Returns the first length Fibonacci numbers starting 1, 1, 2."""
+    sequence = [1, 1]
+    while len(sequence) < length:
+        sequence.append(sequence[-1] + sequence[-2])
+    return sequence[:length]
+
+
+def _rule_table(spec):
+    """Returns per outcome coefficient arrays indexed by [loss, win]."""
+    table = {key: np.zeros(2) for key in ('multiply', 'add', 'step')}
+    table.update({key: np.zeros(2, dtype=bool) for key in ('reset', 'cancel', 'append')})
+    for outcome, rule in ((0, spec.on_loss), (1, spec.on_win)):
+        table['multiply'][outcome] = 1.0
+        if rule.action == 'reset':
+            table['reset'][outcome] = True
+        elif rule.action == 'multiply':
+            table['multiply'][outcome] = rule.amount
+        elif rule.action == 'add':
+            table['add'][outcome] = rule.amount
+        elif rule.action == 'step':
+            table['step'][outcome] = rule.amount
+        elif rule.action in ('cancel', 'append'):
+            table[rule.action][outcome] = True
+    return table
+
+
+class CompiledProgression:
+    """
+    A Progression compiled into a batched NumPy kernel.
+
+    Calling the object plays a single repetition with the same signature as the original hand-written
+    strategies, so it can be passed anywhere a strategy function is expected.
+
+    Methods:
+        simulate: Plays many repetitions at once and returns a ProgressionResult.
+        run: Starts a ProgressionRun that can later be extended or given more repetitions.
+    """
+
+    def __init__(self, spec):
+        """Validate the spec and precompute its rule tables."""
+        actions = {spec.on_win.action, spec.on_loss.action}
+        if actions & {'step'} and not spec.sequence:
+            raise ValueError(f"{spec.name}: 'step' rules need a sequence")
+        if actions & {'cancel', 'append'} and not spec.line:
+            raise ValueError(f"{spec.name}: 'cancel' and 'append' rules need a line")
+        self.spec = spec
+        self.name = spec.name
+        self.rules = _rule_table(spec)
+        self.sequence = np.asarray(spec.sequence, dtype=float) if spec.sequence else None
+        self.line = np.asarray(spec.line, dtype=float) if spec.line else None
+
+    def __call__(self, initial_balance, num_plays, initial_bet, preference, target_balance=None, floor_balance=0):
+        """Plays one repetition and returns the ending balance."""
+        return float(self.simulate(1, initial_balance, num_plays, initial_bet, preference, target_balance,
+                                   floor_balance).balances[0])
+
+    def simulate(self, repeats, initial_balance, num_plays, initial_bet, preference, target_balance=None,
+                 floor_balance=0, trajectory=False, seed=None, wheel='american', tilt=None):
+        """
+        Plays every repetition of the progression at once
+
+        initial_balance, initial_bet, preference, target_balance and floor_balance also accept one value per
+        repetition, so a whole grid of configurations runs as a single batch (see parameter_grid).
+        Args:
+            repeats (int): number of independent repetitions
+            initial_balance (int or float or np.array): starting amount
+            num_plays (int): maximum number of spins per repetition
+            initial_bet (int or float or np.array): base bet the progression builds on
+            preference (string or np.array): colour bet on, "red", "black" or "green"
+            target_balance (int or float or np.array, optional): stop once the balance reaches or exceeds this
+                value, np.inf for no target
+            floor_balance (int or float or np.array): stop once the balance falls to or below this value
+            trajectory (bool): also record the balance after every spin
+            seed (int, optional): seed for the random generator
+            wheel (string): "american" (0 and 00) or "european" (single 0)
+            tilt (np.array, optional): win probability the spins are drawn with instead of the wheel's, indexed by
+                the current losing streak (longer streaks use the last entry), for importance sampling
+        Returns:
+            ProgressionResult: ending balances, stopping times and reasons, path statistics and optional trajectories
+        """
+        return self.run(initial_balance, initial_bet, preference, target_balance, floor_balance, trajectory, seed,
+                        wheel, tilt).grow(repeats, num_plays)
+
+    def run(self, initial_balance, initial_bet, preference, target_balance=None, floor_balance=0, trajectory=False,
+            seed=None, wheel='american', tilt=None):
+        """Returns an empty ProgressionRun of this progression, grown later with its grow method."""
+        return ProgressionRun(self, initial_balance, initial_bet, preference, target_balance, floor_balance,
+                              trajectory, seed, wheel, tilt)
+
+    def _start(self, repeats, initial_balance, initial_bet, preference, target_balance, floor_balance, wheel,
+               tilt=None):
+        """Returns the state of repetitions that have not played yet, parameters and path statistics included."""
+        state = self._initial_state(repeats, initial_balance, initial_bet)
+        # Per repetition parameters travel with the state, so a grid of configurations is just more rows
+        state['base'] = per_repetition(initial_bet, repeats).copy()
+        state['win_probability'] = per_repetition(win_probabilities(preference, wheel), repeats).copy()
+        state['target'] = per_repetition(np.inf if target_balance is None else target_balance, repeats).copy()
+        state['floor'] = per_repetition(floor_balance, repeats).copy()
+        state['row'] = np.arange(repeats)
+
+        # Path statistics are kept as running per repetition values, so no trajectory is needed for them
+        state['plays'] = np.zeros(repeats, dtype=np.int64)
+        state['stop_reason'] = np.zeros(repeats, dtype=np.int8)
+        state['peak'] = state['balance'].copy()
+        state['max_drawdown'] = np.zeros(repeats)
+        state['losing_streak'] = np.zeros(repeats, dtype=np.int64)
+        state['longest_losing_streak'] = np.zeros(repeats, dtype=np.int64)
+        if tilt is not None:
+            # Importance sampling keeps the log likelihood ratio and the spins played at every tilt level
+            state['log_weight'] = np.zeros(repeats)
+            state['tilt_wins'] = np.zeros((repeats, len(tilt)), dtype=np.int64)
+            state['tilt_spins'] = np.zeros((repeats, len(tilt)), dtype=np.int64)
+        return state
+
+    def _play(self, state, rng, num_plays, trajectories=None, tilt=None):
+        """
+        Plays every repetition of a state that has not stopped for up to num_plays more spins, in place
+        Args:
+            state (dict): per repetition arrays from _start, or left behind by an earlier _play
+            rng (np.random.Generator): generator the earlier spins of this state were drawn from
+            num_plays (int): number of further spins
+            trajectories (np.array, optional): receives the balance after every spin, shape (repetitions,
+                num_plays + 1) with the current balance already in the first column
+            tilt (np.array, optional): tilted win probability per losing streak level, the state must come from
+                _start with the same tilt
+        Returns:
+            None
+        """
+        repeats = len(state['row'])
+        if 'line' in state:
+            # Every loss appends one number, so the line can never outgrow this capacity
+            missing = int(state['tail'].max()) + num_plays + 1 - state['line'].shape[1]
+            if missing > 0:
+                state['line'] = np.pad(state['line'], ((0, 0), (0, missing)))
+
+        # Rows still in play, compacted once most of them have stopped so finished paths cost nothing
+        final = state
+        active = state['stop_reason'] == 0
+        for step in range(num_plays):
+            # Stop rules are checked before each spin, as in the original strategies
+            self._stop(active, state)
+            if not active.any():
+                if trajectories is not None:
+                    trajectories[:, step + 1:] = state['balance'][:, None]
+                break
+            if trajectories is None and active.sum() < len(active) // 2:
+                self._flush(final, state, ~active)
+                state = {key: value[active] for key, value in state.items()}
+                active = np.ones(len(state['row']), dtype=bool)
+
+            balance, bet = state['balance'], state['bet']
+            # Draws stay indexed by the original row, so compaction never changes which spins a repetition sees
+            uniform = rng.random(repeats)[state['row']]
+            if tilt is None:
+                won = uniform < state['win_probability']
+            else:
+                won = self._tilted_spin(state, uniform, active, tilt)
+            balance += np.where(active, np.where(won, bet, -bet), 0)
+            state['plays'] += active
+            self._update(state, won, active, state['base'])
+
+            np.maximum(state['peak'], balance, out=state['peak'])
+            np.maximum(state['max_drawdown'], state['peak'] - balance, out=state['max_drawdown'])
+            state['losing_streak'] = np.where(active, np.where(won, 0, state['losing_streak'] + 1), state['losing_streak'])
+            np.maximum(state['longest_losing_streak'], state['losing_streak'], out=state['longest_losing_streak'])
+
+            if trajectories is not None:
+                trajectories[:, step + 1] = balance
+
+        # Repetitions that played every spin still record a stop rule their last spin triggered
+        self._stop(active, state)
+        self._flush(final, state, np.ones(len(active), dtype=bool))
+
+    @staticmethod
+    def _tilted_spin(state, uniform, active, tilt):
+        """Draws one spin with the tilted win probabilities and records its likelihood ratio and tilt level."""
+        level = np.minimum(state['losing_streak'], len(tilt) - 1)
+        sampled = tilt[level]
+        won = uniform < sampled
+        true = state['win_probability']
+        state['log_weight'] += np.where(active, np.where(won, np.log(true / sampled),
+                                                         np.log((1 - true) / (1 - sampled))), 0)
+        rows = np.nonzero(active)[0]
+        state['tilt_spins'][rows, level[rows]] += 1
+        state['tilt_wins'][rows, level[rows]] += won[rows]
+        return won
+
+    @staticmethod
+    def _flush(final, state, rows):
+        """Writes the given rows of a compacted state back to their place in the full state."""
+        if state is final:
+            return
+        positions = state['row'][rows]
+        for key, value in state.items():
+            final[key][positions] = value[rows]
+
+    @staticmethod
+    def _stop(active, state):
+        """Deactivates the repetitions a stop rule applies to and records the first matching reason."""
+        balance = state['balance']
+        reasons = [(1, balance >= state['target']), (2, balance <= state['floor']), (3, state['bet'] > balance)]
+        for code, stopping in reasons:
+            stopped = active & stopping
+            state['stop_reason'][stopped] = code
+            active &= ~stopped
+
+    def _initial_state(self, repeats, initial_balance, initial_bet):
+        """Returns the per repetition state arrays at the start of a run."""
+        state = {
+            'balance': per_repetition(initial_balance, repeats).copy(),
+            'bet': per_repetition(initial_bet, repeats).copy(),
+            'level': np.zeros(repeats, dtype=np.int64),
+            'streak': np.zeros(repeats, dtype=np.int64),
+            'cycle_profit': np.zeros(repeats),
+        }
+        if self.sequence is not None:
+            state['bet'] = initial_bet * np.full(repeats, self.sequence[0])
+        if self.line is not None:
+            # _play widens the line to the capacity the spins it plays can need
+            state['line'] = np.zeros((repeats, len(self.line)))
+            state['line'][:, :len(self.line)] = self.line
+            state['head'] = np.zeros(repeats, dtype=np.int64)
+            state['tail'] = np.full(repeats, len(self.line), dtype=np.int64)
+            state['bet'] = initial_bet * self._line_units(state)
+        return state
+
+    def _line_units(self, state):
+        """Returns the first plus last number of each Labouchere line, or the single number left."""
+        rows = np.arange(len(state['head']))
+        first = state['line'][rows, state['head']]
+        last = state['line'][rows, np.maximum(state['tail'] - 1, 0)]
+        return np.where(state['tail'] - state['head'] > 1, first + last, first)
+
+    def _update(self, state, won, active, base):
+        """Applies the compiled win and loss rules to every active repetition."""
+        spec, rules = self.spec, self.rules
+        outcome = won.astype(np.int64)
+        bet, balance = state['bet'], state['balance']
+        reset = rules['reset'][outcome]
+
+        streak = np.where(won, state['streak'] + 1, 0)
+        if spec.reset_after_wins is not None:
+            reset = reset | (streak >= spec.reset_after_wins)
+            streak = np.where(reset, 0, streak)
+
+        cycle_profit = state['cycle_profit'] + np.where(won, bet, -bet)
+        if spec.cycle_target is not None:
+            cycle_done = cycle_profit >= spec.cycle_target * base
+            reset = reset | cycle_done
+            cycle_profit = np.where(cycle_done, 0, cycle_profit)
+
+        if self.sequence is not None:
+            level = np.clip(state['level'] + rules['step'][outcome].astype(np.int64), 0, len(self.sequence) - 1)
+            level = np.where(reset, 0, level)
+            new_bet = base * self.sequence[level]
+            state['level'] = np.where(active, level, state['level'])
+        elif self.line is not None:
+            new_bet = self._update_line(state, won, active, reset, base)
+        else:
+            new_bet = np.where(reset, base, bet * rules['multiply'][outcome] + rules['add'][outcome] * base)
+
+        # A progression that runs out of bet starts over
+        new_bet = np.where(new_bet <= 0, base, new_bet)
+        if spec.cycle_target is not None:
+            # Never bet more than what completes the cycle
+            new_bet = np.minimum(new_bet, np.maximum(spec.cycle_target * base - cycle_profit, base))
+        if spec.table_min is not None or spec.table_max is not None:
+            new_bet = np.clip(new_bet, spec.table_min, spec.table_max)
+        if spec.cap_to_balance:
+            new_bet = np.where(~won & (new_bet >= balance), balance, new_bet)
+
+        state['bet'][:] = np.where(active, new_bet, bet)
+        state['streak'][:] = np.where(active, streak, state['streak'])
+        state['cycle_profit'][:] = np.where(active, cycle_profit, state['cycle_profit'])
+
+    def _update_line(self, state, won, active, reset, base):
+        """Crosses off or appends to the Labouchere lines and returns the next bets."""
+        rules = self.rules
+        outcome = won.astype(np.int64)
+        cancel = active & rules['cancel'][outcome]
+        append = active & rules['append'][outcome]
+
+        state['head'] = np.where(cancel, state['head'] + 1, state['head'])
+        state['tail'] = np.where(cancel, state['tail'] - 1, state['tail'])
+        rows = np.nonzero(append)[0]
+        state['line'][rows, state['tail'][rows]] = (state['bet'] / base)[rows]
+        state['tail'] = np.where(append, state['tail'] + 1, state['tail'])
+
+        # A crossed off line, or a reset rule, starts a fresh line
+        restart = active & ((state['tail'] <= state['head']) | reset)
+        rows = np.nonzero(restart)[0]
+        state['line'][rows, :len(self.line)] = self.line
+        state['head'][rows] = 0
+        state['tail'][rows] = len(self.line)
+        return base * self._line_units(state)
+
+
+class ProgressionRun:
+    """
+    A batched progression run that can be grown instead of recomputed.
+
+    Every batch of repetitions keeps its random generator and the end state of its paths (balance, bet, stopped
+    flag and path statistics), so more spins continue the existing paths from where they stopped and more
+    repetitions only simulate the new paths. Growing a run costs the spins and paths added, not the total.
+
+    Attributes:
+        progression (CompiledProgression): kernel the run plays
+        num_plays (int): spins every repetition has been played up to
+        repeats (int): repetitions simulated so far
+        trajectory (bool): whether the balance after every spin is recorded
+        tilt (np.array): tilted win probability per losing streak level, None for plain Monte Carlo
+
+    Methods:
+        extend: Plays every repetition on up to a larger number of spins.
+        add_repetitions: Simulates further repetitions up to the current number of spins.
+        grow: Extends and adds repetitions as needed, then returns the result.
+        result: Returns the merged ProgressionResult of every batch.
+    """
+
+    def __init__(self, progression, initial_balance, initial_bet, preference, target_balance=None, floor_balance=0,
+                 trajectory=False, seed=None, wheel='american', tilt=None):
+        """Initialize an empty ProgressionRun, the parameters accept the same values as simulate."""
+        self.progression = progression
+        self.num_plays = 0
+        self.repeats = 0
+        self.trajectory = trajectory
+        self.tilt = None if tilt is None else np.atleast_1d(np.asarray(tilt, dtype=float))
+        self._parameters = (initial_balance, initial_bet, preference, target_balance, floor_balance, wheel)
+        self._seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self._batches = []
+        self._lock = threading.Lock()
+
+    def _generator(self, batch):
+        """Returns the generator of a batch, the first one draws from the seed itself as simulate always has."""
+        if batch == 0:
+            return np.random.default_rng(self._seed)
+        child = np.random.SeedSequence(self._seed.entropy, spawn_key=self._seed.spawn_key + (batch - 1,))
+        return np.random.default_rng(child)
+
+    def _advance(self, batch, num_plays):
+        """Plays one batch on for num_plays more spins."""
+        trajectories = None
+        if self.trajectory:
+            trajectories = np.empty((len(batch['state']['row']), num_plays + 1))
+            trajectories[:, 0] = batch['state']['balance']
+        self.progression._play(batch['state'], batch['rng'], num_plays, trajectories, self.tilt)
+        if self.trajectory:
+            batch['trajectories'] = np.hstack([batch['trajectories'], trajectories[:, 1:]])
+
+    def extend(self, num_plays):
+        """Plays every repetition on up to num_plays spins, repetitions that hit a stop rule stay stopped."""
+        with self._lock:
+            if num_plays < self.num_plays:
+                raise ValueError(f"The run has already played {self.num_plays} spins")
+            for batch in self._batches:
+                self._advance(batch, num_plays - self.num_plays)
+            self.num_plays = num_plays
+        return self
+
+    def add_repetitions(self, repeats):
+        """Simulates repeats further repetitions, on their own random stream, up to the current number of spins."""
+        with self._lock:
+            state = self.progression._start(repeats, *self._parameters, self.tilt)
+            batch = {'state': state, 'rng': self._generator(len(self._batches))}
+            if self.trajectory:
+                batch['trajectories'] = state['balance'][:, None].copy()
+            self._advance(batch, self.num_plays)
+            self._batches.append(batch)
+            self.repeats += repeats
+        return self
+
+    def grow(self, repeats, num_plays):
+        """Grows the run to at least repeats repetitions of num_plays spins and returns the first repeats of them."""
+        if num_plays != self.num_plays:
+            self.extend(num_plays)
+        if repeats > self.repeats:
+            self.add_repetitions(repeats - self.repeats)
+        return self.result(repeats)
+
+    def result(self, repeats=None):
+        """Returns the ProgressionResult of the first repeats repetitions, every repetition by default."""
+        with self._lock:
+            def merged(key):
+                return np.concatenate([batch['state'][key] for batch in self._batches])[:repeats]
+
+            trajectories = None
+            if self.trajectory:
+                trajectories = np.concatenate([batch['trajectories'] for batch in self._batches])[:repeats]
+            likelihood_ratios = tilt_counts = None
+            if self.tilt is not None:
+                likelihood_ratios = np.exp(merged('log_weight'))
+                tilt_counts = (merged('tilt_wins'), merged('tilt_spins'))
+            return ProgressionResult(merged('balance'), merged('plays'), trajectories, merged('stop_reason'),
+                                     merged('peak'), merged('max_drawdown'), merged('longest_losing_streak'),
+                                     likelihood_ratios, tilt_counts)
+
+
+def compile_progression(spec):
+    """Compiles a Progression spec into a batched kernel."""
+    return CompiledProgression(spec)
+
+
+MARTINGALE = Progression("Martingale", on_win=Rule('reset'), on_loss=Rule('multiply', 2))
+REVERSE_MARTINGALE = Progression("Reverse Martingale", on_win=Rule('multiply', 2), on_loss=Rule('reset'))
+DALEMBERT = Progression("D'Alembert", on_win=Rule('add', -1), on_loss=Rule('add', 1), cap_to_balance=True)
+FIBONACCI = Progression("Fibonacci", on_win=Rule('step', -2), on_loss=Rule('step', 1),
+                        sequence=fibonacci_sequence(60))
+LABOUCHERE = Progression("Labouchere", on_win=Rule('cancel'), on_loss=Rule('append'), line=[1, 2, 3, 4])
+PAROLI = Progression("Paroli", on_win=Rule('multiply', 2), on_loss=Rule('reset'), reset_after_wins=3)
+OSCARS_GRIND = Progression("Oscar's Grind", on_win=Rule('add', 1), on_loss=Rule('keep'), cycle_target=1)
+
+PROGRESSIONS = {
+    'martingale': compile_progression(MARTINGALE),
+    'reverse_martingale': compile_progression(REVERSE_MARTINGALE),
+    'dalembert': compile_progression(DALEMBERT),
+    'fibonacci': compile_progression(FIBONACCI),
+    'labouchere': compile_progression(LABOUCHERE),
+    'paroli': compile_progression(PAROLI),
+    'oscars_grind': compile_progression(OSCARS_GRIND),
+}
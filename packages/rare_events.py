@@ -0,0 +1,139 @@
+import numpy as np
+
+from packages.progressions import win_probabilities
+
+"""
+Contains the importance sampling estimator of rare catastrophic losses of the roulette progressions.
+
+Plain Monte Carlo needs about 100 / p repetitions to see an event of probability p a hundred times, so the long losing
+streaks that ruin a martingale are rarely observed at all. Here the spins are instead drawn with a tilted win
+probability that depends on the current losing streak, and every repetition carries the likelihood ratio of its spins,
+which makes the weighted share of repetitions ending below the threshold an unbiased estimate of the true
+probability. The tilt is tuned with a few small cross entropy pilot runs that raise an intermediate drawdown level
+step by step until it reaches the threshold, so the pilots and the final run together cost about one ordinary run.
+"""
+
+# Losing streak levels with their own tilted probability, longer streaks share the last one
+LEVELS = 32
+
+# Tilted probabilities are kept inside this range, so no spin outcome becomes impossible
+TILT_BOUNDS = (0.01, 0.99)
+
+
+class RareEventEstimate:
+    """
+    Importance sampling estimate of the probability that a progression ends below a balance.
+
+    Attributes:
+        threshold (float): balance the probability of ending strictly below is estimated
+        probability (float): estimated probability
+        standard_error (float): standard error of the estimate
+        relative_error (float): standard error over the estimate, the accuracy that stays bounded as the event
+            gets rarer
+        events (int): repetitions of the final run that ended below the threshold
+        repeats (int): repetitions of the final run
+        pilot_repeats (int): repetitions spent tuning the tilt
+        tilt (np.array): tilted win probability per losing streak level
+        true_probability (float): untilted win probability of a spin
+
+    Methods:
+        interval: Returns a normal confidence interval of the probability.
+        equivalent_repeats: Returns the plain Monte Carlo repetitions needed for the same standard error.
+    """
+
+    def __init__(self, threshold, probability, standard_error, events, repeats, pilot_repeats, tilt, true_probability):
+        """Initialize a RareEventEstimate."""
+        self.threshold = threshold
+        self.probability = probability
+        self.standard_error = standard_error
+        self.relative_error = standard_error / probability if probability > 0 else float('nan')
+        self.events = events
+        self.repeats = repeats
+        self.pilot_repeats = pilot_repeats
+        self.tilt = tilt
+        self.true_probability = true_probability
+
+    def interval(self, level=0.95):
+        """Returns the (lower, upper) normal confidence interval of the probability, clipped at zero."""
+        from statistics import NormalDist
+
+        spread = NormalDist().inv_cdf(0.5 + level / 2) * self.standard_error
+        return max(self.probability - spread, 0.0), self.probability + spread
+
+    def equivalent_repeats(self):
+        """Returns the plain Monte Carlo repetitions whose standard error p(1 - p) / n would match this estimate."""
+        if not self.standard_error > 0:
+            return float('nan')
+        return self.probability * (1 - self.probability) / self.standard_error ** 2
+
+
+def cross_entropy_tilt(result, event, tilt, smoothing=0.7):
+    """
+    Cross entropy update of the tilt from a tilted run
+    Args:
+        result (ProgressionResult): tilted run with likelihood ratios and tilt counts
+        event (np.array): whether each repetition is in the (intermediate) event
+        tilt (np.array): tilt the run was drawn with
+        smoothing (float): weight of the update against the previous tilt
+    Returns:
+        np.array: win probability per losing streak level that best reproduces the weighted event paths
+    """
+    weights = result.likelihood_ratios * event
+    wins, spins = result.tilt_counts
+    won, played = weights @ wins, weights @ spins
+    # Levels the event paths never reached keep their tilt
+    update = np.where(played > 0, won / np.where(played > 0, played, 1), tilt)
+    return np.clip(smoothing * update + (1 - smoothing) * tilt, *TILT_BOUNDS)
+
+
+def tail_probability(progression, threshold, repeats, initial_balance, num_plays, initial_bet, preference,
+                     target_balance=None, floor_balance=0, seed=None, wheel='american', levels=LEVELS, rarity=0.1,
+                     pilot_repeats=None, max_iterations=12):
+    """
+    Estimates the probability that a progression ends below a balance with importance sampling
+    Args:
+        progression (CompiledProgression): batched progression kernel
+        threshold (int or float): ending balance the probability of falling strictly below is estimated
+        repeats (int): repetitions of the final tilted run
+        initial_balance (int or float): starting amount
+        num_plays (int): maximum number of spins per repetition
+        initial_bet (int or float): base bet the progression builds on
+        preference (string): colour bet on, "red", "black" or "green"
+        target_balance (int or float, optional): stop once the balance reaches or exceeds this value
+        floor_balance (int or float): stop once the balance falls to or below this value
+        seed (int, optional): seed for the random generators
+        wheel (string): "american" or "european"
+        levels (int): losing streak levels with their own tilted probability
+        rarity (float): share of pilot repetitions beyond each intermediate drawdown level
+        pilot_repeats (int, optional): repetitions per pilot run, a tenth of repeats (at least 1000) by default
+        max_iterations (int): largest number of pilot runs
+    Returns:
+        RareEventEstimate: the probability with its standard error and the tilt used
+    """
+    true_probability = float(win_probabilities(preference, wheel))
+    tilt = np.full(levels, true_probability)
+    pilot_repeats = pilot_repeats or max(1000, repeats // 10)
+    seeds = np.random.SeedSequence(seed).spawn(max_iterations + 1)
+    parameters = (initial_balance, num_plays, initial_bet, preference, target_balance, floor_balance)
+
+    # Ending below the threshold needs a drawdown of at least this much, and unlike the ending balance the largest
+    # drawdown keeps growing with the losing streaks, so the intermediate levels are set on it
+    needed = np.min(initial_balance) - threshold
+    pilots = 0
+    for iteration in range(max_iterations):
+        result = progression.simulate(pilot_repeats, *parameters, seed=seeds[iteration], wheel=wheel, tilt=tilt)
+        pilots += pilot_repeats
+        level = np.quantile(result.max_drawdowns, 1 - rarity)
+        event = result.balances < threshold
+        reached = level >= needed and event.any()
+        tilt = cross_entropy_tilt(result, event if reached else result.max_drawdowns >= level, tilt)
+        if reached:
+            break
+
+    result = progression.simulate(repeats, *parameters, seed=seeds[-1], wheel=wheel, tilt=tilt)
+    hits = result.balances < threshold
+    weighted = result.likelihood_ratios * hits
+    probability = float(weighted.mean())
+    standard_error = float(weighted.std(ddof=1) / np.sqrt(repeats)) if repeats > 1 else float('nan')
+    return RareEventEstimate(threshold, probability, standard_error, int(hits.sum()), repeats, pilots, tilt,
+                             true_probability)
@@ -0,0 +1,180 @@
+import random
+import numpy as np
+from statistics import NormalDist
+
+from packages.blackjack_logic import Deck, CardCounter, Player, BASIC_STRATEGY, play_round
+
+"""
+Contains risk of ruin and bankroll requirement analytics for the counting strategies.
+
+Per hand statistics are measured with the simulator's own play_round. The closed form metrics use the diffusion
+approximation of the bankroll, and the Monte Carlo check resamples the measured hand outcomes along batched paths
+that stop as soon as they are ruined or reach their target.
+"""
+
+
+class HandStatistics:
+    """
+    Distribution of the net result of one hand (a split round counts as one hand), in units of the bet.
+
+    Attributes:
+        values (np.array): distinct net results of a hand
+        probabilities (np.array): observed frequency of each value
+        hands (int): number of hands the statistics were measured on
+        mean (float): expected result per hand
+        std (float): standard deviation per hand
+    """
+
+    def __init__(self, outcomes):
+        """Initialize from the net result of every simulated hand."""
+        self.values, counts = np.unique(outcomes, return_counts=True)
+        self.probabilities = counts / counts.sum()
+        self.hands = len(outcomes)
+        self.mean = float(np.mean(outcomes))
+        self.std = float(np.std(outcomes, ddof=1))
+
+
+def hand_statistics(counting_strategy, num_hands, strategy=BASIC_STRATEGY, seed=None):
+    """
+    Measures the per hand result distribution of a counting strategy with the simulator
+    Args:
+        counting_strategy (string): "high_low", "zen" or "halves"
+        num_hands (int): number of rounds to simulate
+        strategy (Strategy): playing decisions
+        seed (int, optional): seed for the shuffles
+    Returns:
+        HandStatistics: per hand distribution in units of the bet
+    """
+    if seed is not None:
+        random.seed(seed)
+    deck = Deck()
+    counter = CardCounter()
+    counting_method = getattr(counter, counting_strategy)
+    player = Player(0)
+    outcomes = np.empty(num_hands)
+    for hand in range(num_hands):
+        # Same reshuffle rule as blackjack_simulator
+        if len(deck.cards) < 15:
+            deck = Deck()
+            counter.reset_count()
+        before = player.get_bankroll()
+        play_round(deck, counter, counting_method, player, 1, strategy)
+        outcomes[hand] = player.get_bankroll() - before
+    return HandStatistics(outcomes)
+
+
+def win_rate_per_100(stats, bet):
+    """Returns the expected win per 100 hands at a flat bet."""
+    return 100 * stats.mean * bet
+
+
+def std_per_100(stats, bet):
+    """Returns the standard deviation of the result of 100 hands at a flat bet."""
+    return 10 * stats.std * bet
+
+
+def n0(stats):
+    """Returns N0, the number of hands after which the expected win equals one standard deviation."""
+    return stats.std ** 2 / stats.mean ** 2 if stats.mean != 0 else float('inf')
+
+
+def score(stats):
+    """Returns SCORE, the win rate per 100 hands of a $10,000 bankroll betting the Kelly amount."""
+    return 1e6 * stats.mean ** 2 / stats.std ** 2 if stats.mean > 0 else 0.0
+
+
+def risk_of_ruin(stats, bankroll, bet, hands=None):
+    """
+    Returns the diffusion approximation of the probability of losing the whole bankroll
+    Args:
+        stats (HandStatistics): per hand distribution
+        bankroll (float): starting bankroll
+        bet (float): flat bet per hand
+        hands (int, optional): horizon in hands, None for playing forever
+    Returns:
+        float: probability of ruin
+    """
+    mean, variance = stats.mean * bet, (stats.std * bet) ** 2
+    if hands is None:
+        return 1.0 if mean <= 0 else float(np.exp(-2 * mean * bankroll / variance))
+    # First passage of a Brownian motion with drift below -bankroll within the horizon
+    normal = NormalDist()
+    spread = np.sqrt(variance * hands)
+    drift = mean * hands
+    ruin = normal.cdf((-bankroll - drift) / spread)
+    tail = normal.cdf((-bankroll + drift) / spread)
+    # Combined in log space, exp(-2 mean bankroll / variance) alone overflows for losing games
+    log_term = -2 * mean * bankroll / variance + np.log(tail) if tail > 0 else -np.inf
+    return float(min(1.0, ruin + np.exp(min(log_term, 0.0))))
+
+
+def bankroll_for_risk(stats, bet, risk):
+    """Returns the bankroll needed so that the risk of ruin of playing forever equals risk."""
+    if stats.mean <= 0:
+        return float('inf')
+    return float(-(stats.std * bet) ** 2 * np.log(risk) / (2 * stats.mean * bet))
+
+
+class RuinCheck:
+    """
+    Outcome of the Monte Carlo risk of ruin check.
+
+    Attributes:
+        ruined (float): share of paths that lost the bankroll
+        reached_target (float): share of paths that reached the target
+        unfinished (float): share of paths still playing at the horizon
+        mean_hands (float): average number of hands played before stopping
+    """
+
+    def __init__(self, ruined, reached_target, unfinished, mean_hands):
+        """Initialize a RuinCheck."""
+        self.ruined = ruined
+        self.reached_target = reached_target
+        self.unfinished = unfinished
+        self.mean_hands = mean_hands
+
+
+def monte_carlo_ruin(stats, bankroll, bet, hands, paths=10000, target=None, seed=None, block=64):
+    """
+    Checks the risk of ruin by resampling measured hand results along batched paths
+    Args:
+        stats (HandStatistics): per hand distribution
+        bankroll (float): starting bankroll
+        bet (float): flat bet per hand
+        hands (int): horizon in hands
+        paths (int): number of bankroll paths
+        target (float, optional): stop a path once its bankroll reaches this value
+        seed (int, optional): seed for the random generator
+        block (int): hands drawn at once for the paths still playing
+    Returns:
+        RuinCheck: shares of ruined, successful and unfinished paths
+    """
+    rng = np.random.default_rng(seed)
+    values = stats.values * bet
+    balance = np.full(paths, float(bankroll))
+    played = np.zeros(paths, dtype=np.int64)
+    ruined = np.zeros(paths, dtype=bool)
+    reached = np.zeros(paths, dtype=bool)
+    active = np.arange(paths)
+
+    for start in range(0, hands, block):
+        if not len(active):
+            break
+        steps = min(block, hands - start)
+        draws = values[rng.choice(len(values), size=(len(active), steps), p=stats.probabilities)]
+        path = balance[active, None] + np.cumsum(draws, axis=1)
+
+        # First hand at which each path is ruined or reaches its target, steps if neither happens
+        stop = path <= 0
+        if target is not None:
+            stop |= path >= target
+        stopped = stop.any(axis=1)
+        first = np.where(stopped, stop.argmax(axis=1), steps - 1)
+
+        balance[active] = path[np.arange(len(active)), first]
+        played[active] += first + 1
+        ruined[active] = stopped & (balance[active] <= 0)
+        reached[active] = stopped & ~ruined[active]
+        active = active[~stopped]
+
+    return RuinCheck(float(ruined.mean()), float(reached.mean()), float(len(active) / paths), float(played.mean()))
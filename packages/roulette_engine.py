@@ -0,0 +1,267 @@
+import numpy as np
+
+"""
+Contains the pocket level roulette engine.
+
+Spins are simulated as uint8 pocket indices. Every bet is turned into a boolean coverage row over the pockets of a
+wheel once, and a layout of bets collapses into a single net payout table, so resolving a spin costs one table
+lookup however many bets are on the layout.
+"""
+
+RED_NUMBERS = frozenset({1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36})
+
+# Payout to 1 of every bet type
+PAYOUTS = {
+    'straight': 35, 'split': 17, 'street': 11, 'corner': 8, 'top_line': 6, 'six_line': 5,
+    'dozen': 2, 'column': 2,
+    'red': 1, 'black': 1, 'even': 1, 'odd': 1, 'low': 1, 'high': 1,
+}
+
+# Bet types that cover a fixed set of pockets and take no selection
+OUTSIDE_BETS = ('red', 'black', 'even', 'odd', 'low', 'high')
+
+# Inside bets with the zeros are laid out differently on each wheel, the American top line replaces the first four
+ZERO_BETS = {
+    'european': {'split': [{0, 1}, {0, 2}, {0, 3}], 'street': [{0, 1, 2}, {0, 2, 3}], 'corner': [{0, 1, 2, 3}],
+                 'top_line': []},
+    'american': {'split': [{0, 1}, {0, 2}, {0, '00'}, {'00', 2}, {'00', 3}],
+                 'street': [{0, 1, 2}, {0, '00', 2}, {'00', 2, 3}], 'corner': [], 'top_line': [{0, '00', 1, 2, 3}]},
+}
+
+
+class Wheel:
+    """
+    Represents a roulette wheel.
+
+    Attributes:
+        name (str): 'european' or 'american'.
+        labels (list): Label of every pocket, the pocket index is its position in this list.
+        colors (np.array): 'red', 'black' or 'green' for every pocket.
+
+    Methods:
+        pocket: Returns the pocket index of a number, '00' for the American double zero.
+        spin: Returns uint8 pocket indices of independent spins.
+        probability: Returns the chance that a bet wins on this wheel.
+    """
+
+    def __init__(self, name, double_zero):
+        """Initialize a Wheel with a single zero, or with both zero and double zero."""
+        self.name = name
+        self.labels = [str(number) for number in range(37)] + (['00'] if double_zero else [])
+        self.colors = np.array(['green'] + ['red' if number in RED_NUMBERS else 'black' for number in range(1, 37)]
+                               + (['green'] if double_zero else []))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def pocket(self, number):
+        """Returns the pocket index of a number, '00' for the American double zero."""
+        label = str(number)
+        if label not in self.labels:
+            raise ValueError(f"{number} is not a pocket of the {self.name} wheel")
+        return self.labels.index(label)
+
+    def spin(self, size, rng=None):
+        """Returns uint8 pocket indices of independent spins with the given shape."""
+        rng = np.random.default_rng() if rng is None else rng
+        return rng.integers(0, len(self), size=size, dtype=np.uint8)
+
+    def probability(self, bet):
+        """Returns the chance that a bet wins on this wheel."""
+        return coverage_row(self, bet).mean()
+
+
+EUROPEAN = Wheel('european', double_zero=False)
+AMERICAN = Wheel('american', double_zero=True)
+WHEELS = {'european': EUROPEAN, 'american': AMERICAN}
+
+
+class Bet:
+    """
+    Represents a single bet on the table.
+
+    Attributes:
+        kind (str): Bet type, one of the keys of PAYOUTS.
+        selection: Numbers covered for inside bets (e.g. 17, (17, 20), (1, 2, 4, 5)), the dozen or column
+            number (1 to 3), or None for the even money bets.
+        amount (float): Amount staked, positive.
+    """
+
+    def __init__(self, kind, selection=None, amount=1):
+        """Initialize a Bet of a given kind."""
+        if kind not in PAYOUTS:
+            raise ValueError(f"Unknown bet type '{kind}', expected one of {tuple(PAYOUTS)}")
+        if not np.isfinite(amount) or amount <= 0:
+            raise ValueError(f"A bet's amount must be positive, got {amount}")
+        self.kind = kind
+        self.selection = selection
+        self.amount = amount
+
+    @property
+    def payout(self):
+        """Returns the payout to 1 of the bet."""
+        return PAYOUTS[self.kind]
+
+    def __repr__(self):
+        return f"Bet({self.kind!r}, {self.selection!r}, {self.amount!r})"
+
+
+def _numbers(selection):
+    """Returns the selection as a tuple of numbers or '00' labels."""
+    if isinstance(selection, (int, str)):
+        selection = (selection,)
+    return tuple(number if str(number) == '00' else int(number) for number in selection)
+
+
+def _covered_numbers(bet, wheel):
+    """Returns the set of numbers a bet covers, checking that inside bets are laid out on the wheel's table."""
+    kind = bet.kind
+    if kind in OUTSIDE_BETS:
+        numbers = range(1, 37)
+        return {
+            'red': set(RED_NUMBERS),
+            'black': set(numbers) - RED_NUMBERS,
+            'even': {n for n in numbers if n % 2 == 0},
+            'odd': {n for n in numbers if n % 2 == 1},
+            'low': set(range(1, 19)),
+            'high': set(range(19, 37)),
+        }[kind]
+    if kind == 'dozen':
+        if bet.selection not in (1, 2, 3):
+            raise ValueError("A dozen bet selects 1, 2 or 3")
+        return set(range(12 * bet.selection - 11, 12 * bet.selection + 1))
+    if kind == 'column':
+        if bet.selection not in (1, 2, 3):
+            raise ValueError("A column bet selects 1, 2 or 3")
+        return set(range(bet.selection, 37, 3))
+
+    numbers = _numbers(bet.selection)
+    covered = set(numbers)
+    sizes = {'straight': 1, 'split': 2, 'street': 3, 'corner': 4, 'top_line': 5, 'six_line': 6}
+    if len(covered) != sizes[kind]:
+        raise ValueError(f"A {kind} bet covers {sizes[kind]} numbers, got {bet.selection}")
+    if kind == 'straight':
+        return covered
+
+    zeros = {n for n in covered if n in (0, '00')}
+    inner = sorted(covered - zeros)
+    if zeros:
+        valid = ZERO_BETS[wheel.name].get(kind, [])
+    elif kind == 'split':
+        a, b = inner
+        valid = [covered] if (b - a == 3) or (b - a == 1 and (a - 1) // 3 == (b - 1) // 3) else []
+    elif kind == 'street':
+        valid = [set(range(first, first + 3)) for first in range(1, 37, 3)]
+    elif kind == 'corner':
+        valid = [{n, n + 1, n + 3, n + 4} for n in range(1, 33) if n % 3 != 0]
+    elif kind == 'top_line':
+        valid = []
+    else:
+        valid = [set(range(first, first + 6)) for first in range(1, 32, 3)]
+    if covered not in valid:
+        raise ValueError(f"{sorted(map(str, covered))} is not a valid {kind} on the {wheel.name} table")
+    return covered
+
+
+def coverage_row(wheel, bet):
+    """Returns a boolean array over the pockets of the wheel that are covered by the bet."""
+    row = np.zeros(len(wheel), dtype=bool)
+    for number in _covered_numbers(bet, wheel):
+        row[wheel.pocket(number)] = True
+    return row
+
+
+class Layout:
+    """
+    Represents several bets placed together on every spin.
+
+    Attributes:
+        bets (list): Bet objects on the layout.
+
+    Methods:
+        stake: Returns the total amount staked per spin.
+        coverage: Returns the (bets x pockets) coverage table on a wheel.
+        payout_table: Returns the net result of one spin for every pocket of a wheel.
+        expected_value: Returns the exact expected net result of one spin.
+    """
+
+    def __init__(self, bets):
+        """Initialize a Layout with a list of bets."""
+        self.bets = list(bets)
+
+    def stake(self):
+        """Returns the total amount staked per spin."""
+        return float(sum(bet.amount for bet in self.bets))
+
+    def coverage(self, wheel):
+        """Returns the (bets x pockets) coverage table on a wheel."""
+        return np.array([coverage_row(wheel, bet) for bet in self.bets]).reshape(len(self.bets), len(wheel))
+
+    def payout_table(self, wheel):
+        """Returns the net result of one spin for every pocket of a wheel."""
+        returns = np.array([bet.amount * (bet.payout + 1) for bet in self.bets], dtype=float)
+        return returns @ self.coverage(wheel) - self.stake()
+
+    def expected_value(self, wheel):
+        """Returns the exact expected net result of one spin."""
+        return float(self.payout_table(wheel).mean())
+
+
+class LayoutResult:
+    """
+    Holds the outcome of a batched layout simulation.
+
+    Attributes:
+        balances (np.array): Ending balance of every repetition.
+        plays (np.array): Number of spins each repetition played before a stop rule.
+        trajectories (np.array): Balance after every spin, shape (repetitions, num_spins + 1), if requested.
+    """
+
+    def __init__(self, balances, plays, trajectories=None):
+        """Initialize a LayoutResult."""
+        self.balances = balances
+        self.plays = plays
+        self.trajectories = trajectories
+
+
+def simulate_layout(layout, wheel, repeats, num_spins, initial_balance, target_balance=None, floor_balance=0,
+                    trajectory=False, seed=None):
+    """
+    Plays the same layout on every spin for many repetitions at once
+    Args:
+        layout (Layout): bets placed on every spin
+        wheel (Wheel or str): EUROPEAN, AMERICAN or their names
+        repeats (int): number of independent repetitions
+        num_spins (int): maximum number of spins per repetition
+        initial_balance (int or float): starting amount
+        target_balance (int or float, optional): stop once the balance reaches or exceeds this value
+        floor_balance (int or float): stop once the balance falls to or below this value
+        trajectory (bool): also return the balance after every spin
+        seed (int, optional): seed for the random generator
+    Returns:
+        LayoutResult: ending balances, spins played and optional trajectories
+    """
+    wheel = WHEELS[wheel] if isinstance(wheel, str) else wheel
+    rng = np.random.default_rng(seed)
+    table = layout.payout_table(wheel)
+    stake = layout.stake()
+
+    pockets = wheel.spin((repeats, num_spins), rng)
+    paths = np.empty((repeats, num_spins + 1))
+    paths[:, 0] = initial_balance
+    np.cumsum(table[pockets], axis=1, out=paths[:, 1:])
+    paths[:, 1:] += initial_balance
+
+    # A repetition stops before the first spin it cannot cover or that a stop rule forbids
+    stopped = (paths[:, :-1] < stake) | (paths[:, :-1] <= floor_balance)
+    if target_balance is not None:
+        stopped |= paths[:, :-1] >= target_balance
+    any_stop = stopped.any(axis=1)
+    plays = np.where(any_stop, stopped.argmax(axis=1), num_spins)
+    balances = paths[np.arange(repeats), plays]
+
+    if not trajectory:
+        return LayoutResult(balances, plays)
+    frozen = np.arange(num_spins + 1)[None, :] > plays[:, None]
+    paths = np.where(frozen, balances[:, None], paths)
+    return LayoutResult(balances, plays, paths)
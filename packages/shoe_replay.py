@@ -0,0 +1,206 @@
+import numpy as np
+
+from packages.blackjack_logic import Card, CardCounter, Player, BASIC_STRATEGY, DEFAULT_RULES, compile_rules, play_round
+
+"""
+Contains the shoe replay engine for counterfactual strategy evaluation.
+
+Shoes are recorded compactly as a seed (or explicit rank code arrays) and replayed under several strategy variants in
+lockstep: every round starts from the same position of one shared shoe buffer for every variant, so the per round
+differences between variants come from their decisions and not from different cards.
+"""
+
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+
+# One Card object per rank, dealt by reference so replaying never copies or rebuilds cards
+CARDS = [Card(rank) for rank in RANKS]
+
+class ShoeRecord:
+    """
+    Compact record of a sequence of shuffled shoes.
+
+    Attributes:
+        seed (int): seed every shoe is derived from, None for explicitly recorded shoes
+        num_shoes (int): number of shoes in the record
+        decks (int): number of 52 card decks per shoe
+
+    Methods:
+        shoe: Returns the rank codes of one shoe as a uint8 array, in dealing order.
+        from_codes: Builds a record from explicit rank code arrays.
+    """
+
+    def __init__(self, seed, num_shoes, decks=1):
+        """Initialize a record whose shoes are regenerated on demand from the seed."""
+        self.seed = seed
+        self.num_shoes = num_shoes
+        self.decks = decks
+        self._codes = None
+
+    def __repr__(self):
+        if self._codes is not None:
+            return f"ShoeRecord.from_codes(<{self.num_shoes} shoes>)"
+        return f"ShoeRecord({self.seed!r}, {self.num_shoes!r}, decks={self.decks!r})"
+
+    @classmethod
+    def from_codes(cls, codes):
+        """Builds a record from explicit rank code arrays, one row per shoe."""
+        codes = np.asarray(codes, dtype=np.uint8)
+        record = cls(None, len(codes), codes.shape[1] // 52)
+        record._codes = codes
+        return record
+
+    def shoe(self, index):
+        """Returns the rank codes of one shoe as a uint8 array, in dealing order."""
+        if self._codes is not None:
+            return self._codes[index]
+        ordered = np.tile(np.repeat(np.arange(len(RANKS), dtype=np.uint8), 4), self.decks)
+        return np.random.default_rng([self.seed, index]).permutation(ordered)
+
+
+class ReplayDeck:
+    """
+    Deck compatible view over a shared shoe buffer.
+
+    Attributes:
+        buffer (np.array): rank codes of the shoe being replayed
+        position (int): index of the next card to deal
+
+    Methods:
+        deal_card: Returns the next card of the buffer.
+        remaining: Returns the number of cards left in the shoe.
+    """
+
+    def __init__(self, buffer, position=0):
+        """Initialize a view starting at a position of the buffer."""
+        self.buffer = buffer
+        self.position = position
+
+    @property
+    def cards(self):
+        """Cards left in the shoe, so len(deck.cards) works as with Deck."""
+        return self.buffer[self.position:]
+
+    def deal_card(self):
+        """Returns the next card of the buffer, wrapping around for the rare round that outlasts the shoe."""
+        card = CARDS[self.buffer[self.position % len(self.buffer)]]
+        self.position += 1
+        return card
+
+    def remaining(self):
+        """Returns the number of cards left in the shoe."""
+        return len(self.buffer) - self.position
+
+
+class Variant:
+    """
+    A strategy variant to replay.
+
+    Attributes:
+        name (str): Display name.
+        counting_strategy (str): CardCounter method, "high_low", "zen" or "halves".
+        strategy (Strategy): playing decisions.
+    """
+
+    def __init__(self, name, counting_strategy='high_low', strategy=BASIC_STRATEGY):
+        """Initialize a Variant."""
+        self.name = name
+        self.counting_strategy = counting_strategy
+        self.strategy = strategy
+
+    def __repr__(self):
+        return f"Variant({self.name!r}, {self.counting_strategy!r}, {self.strategy.name!r})"
+
+
+class ReplayResult:
+    """
+    Per round results of variants replayed on the same shoes.
+
+    Attributes:
+        names (list): variant names, in column order.
+        outcomes (np.array): net result of every round, shape (rounds, variants), in units of the base bet.
+        hands (np.array): hands settled in every round, 2 for a split, shape (rounds, variants).
+
+    Methods:
+        summary: Returns the mean result of every variant.
+        paired_difference: Returns the mean paired difference against a baseline and its standard error.
+    """
+
+    def __init__(self, names, outcomes, hands):
+        """Initialize a ReplayResult."""
+        self.names = names
+        self.outcomes = outcomes
+        self.hands = hands
+
+    def summary(self):
+        """Returns a list of (name, mean per round, standard error) for every variant."""
+        rounds = len(self.outcomes)
+        return [(name, float(self.outcomes[:, column].mean()), float(self.outcomes[:, column].std(ddof=1) / np.sqrt(rounds)))
+                for column, name in enumerate(self.names)]
+
+    def paired_difference(self, variant, baseline=0):
+        """
+        Compares a variant with a baseline on the same rounds
+        Args:
+            variant (int or str): column or name of the variant
+            baseline (int or str): column or name of the baseline
+        Returns:
+            dict: mean difference per round, its paired standard error, and the standard error two independent
+                runs of the same size would have had
+        """
+        a = self.names.index(variant) if isinstance(variant, str) else variant
+        b = self.names.index(baseline) if isinstance(baseline, str) else baseline
+        difference = self.outcomes[:, a] - self.outcomes[:, b]
+        rounds = len(difference)
+        paired = difference.std(ddof=1) / np.sqrt(rounds)
+        independent = np.sqrt((self.outcomes[:, a].var(ddof=1) + self.outcomes[:, b].var(ddof=1)) / rounds)
+        return {'mean': float(difference.mean()), 'standard_error': float(paired),
+                'independent_standard_error': float(independent)}
+
+
+def replay(variants, record, num_rounds, base_bet=1, rules=None):
+    """
+    Replays the recorded shoes under every variant in lockstep
+    Args:
+        variants (list): Variant objects to compare
+        record (ShoeRecord): shoes to replay, cycled if more rounds are requested than they hold
+        num_rounds (int): number of rounds to play
+        base_bet (float): bet per round
+        rules (TableRules, optional): table rules every variant plays, DEFAULT_RULES if not given, the record's shoes
+            are dealt down to the rules' reshuffle point
+    Returns:
+        ReplayResult: per round net results of every variant
+    """
+    table = compile_rules(rules or DEFAULT_RULES)
+    if 52 * record.decks < table.reshuffle_at:
+        raise ValueError(f"Shoes of {record.decks} decks are smaller than the reshuffle point of {table.reshuffle_at} cards")
+    counters = [CardCounter() for _ in variants]
+    methods = [getattr(counter, variant.counting_strategy) for counter, variant in zip(counters, variants)]
+    players = [Player(0) for _ in variants]
+    outcomes = np.zeros((num_rounds, len(variants)))
+    hands = np.zeros((num_rounds, len(variants)), dtype=np.int8)
+
+    shoe_index = 0
+    buffer = record.shoe(0)
+    position = 0
+    for round_index in range(num_rounds):
+        if len(buffer) - position < table.reshuffle_at:
+            shoe_index += 1
+            buffer = record.shoe(shoe_index % record.num_shoes)
+            position = 0
+            for counter in counters:
+                counter.reset_count()
+
+        # Every variant starts the round at the same card, the shoe then moves past the longest round and the
+        # cards only a longer round used are burned unseen by the other variants
+        furthest = position
+        for column, variant in enumerate(variants):
+            deck = ReplayDeck(buffer, position)
+            before = players[column].get_bankroll()
+            rows = play_round(deck, counters[column], methods[column], players[column], base_bet, variant.strategy,
+                              table)
+            outcomes[round_index, column] = (players[column].get_bankroll() - before) / base_bet
+            hands[round_index, column] = len(rows)
+            furthest = max(furthest, deck.position)
+        position = furthest
+
+    return ReplayResult([variant.name for variant in variants], outcomes, hands)
@@ -0,0 +1,195 @@
+import os
+import threading
+from collections import OrderedDict, deque
+
+"""
+Contains the process wide simulation service shared by every Streamlit session.
+
+Simulations are submitted as a function and its arguments on behalf of a session. A bounded pool of worker threads
+runs them, taking turns between the sessions that have work waiting so one session cannot starve the others.
+Identical requests submitted while one is still queued or running share that computation and its result. When the
+queue is full, or a session already has too much work in flight, submit raises ServiceBusy straight away instead of
+making everybody wait longer.
+"""
+
+
+class ServiceBusy(Exception):
+    """Raised when the service cannot accept more work right now."""
+
+
+class Ticket:
+    """
+    Handle on a submitted simulation, shared by every coalesced request.
+
+    Attributes:
+        key (tuple): coalescing key of the request
+        session_id (str): session that submitted the request first
+        waiters (int): number of requests sharing this computation
+
+    Methods:
+        done: Returns whether the simulation has finished.
+        result: Waits for the simulation and returns its result, or raises its exception.
+    """
+
+    def __init__(self, key, session_id, function, args, kwargs):
+        """Initialize a pending Ticket."""
+        self.key = key
+        self.session_id = session_id
+        self.waiters = 1
+        self._call = (function, args, kwargs)
+        self._finished = threading.Event()
+        self._result = None
+        self._error = None
+
+    def done(self):
+        """Returns whether the simulation has finished."""
+        return self._finished.is_set()
+
+    def result(self, timeout=None):
+        """Waits for the simulation and returns its result, or raises the exception it raised."""
+        if not self._finished.wait(timeout):
+            raise TimeoutError(f"simulation did not finish within {timeout} seconds")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _run(self):
+        """Runs the simulation and stores its outcome."""
+        function, args, kwargs = self._call
+        try:
+            self._result = function(*args, **kwargs)
+        except Exception as error:
+            self._error = error
+        self._call = None
+        self._finished.set()
+
+
+def request_key(function, args, kwargs):
+    """Returns the coalescing key of a call, two calls with the same key compute the same result."""
+    return (function.__module__, function.__qualname__, repr(args), repr(sorted(kwargs.items())))
+
+
+class SimulationService:
+    """
+    Bounded worker pool with per session fairness, request coalescing and admission control.
+
+    Attributes:
+        workers (int): number of worker threads
+        max_queued (int): most simulations waiting for a worker across all sessions
+        max_per_session (int): most simulations one session may have queued or running
+
+    Methods:
+        submit: Queues a simulation and returns its Ticket, raises ServiceBusy if it cannot be accepted.
+        run: Submits a simulation and waits for its result.
+        stats: Returns the current load and lifetime counters of the service.
+        shutdown: Stops the workers once the queued simulations are done.
+    """
+
+    def __init__(self, workers=None, max_queued=16, max_per_session=2):
+        """Initialize the service and start its worker threads."""
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queued = max_queued
+        self.max_per_session = max_per_session
+
+        self._lock = threading.Condition()
+        self._queues = OrderedDict()   # session id -> deque of tickets waiting for a worker
+        self._in_flight = {}           # coalescing key -> ticket queued or running
+        self._per_session = {}         # session id -> number of its tickets queued or running
+        self._queued = 0
+        self._running = 0
+        self._closed = False
+        self._counters = {'submitted': 0, 'coalesced': 0, 'rejected': 0, 'completed': 0}
+
+        self._threads = [threading.Thread(target=self._work, name=f"simulation-worker-{index}", daemon=True)
+                         for index in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, session_id, function, *args, **kwargs):
+        """
+        Queues a simulation on behalf of a session
+        Args:
+            session_id (str): session the request comes from
+            function (function): simulation to run, called as function(*args, **kwargs)
+        Returns:
+            Ticket: handle on the simulation, shared with identical requests already in flight
+        """
+        key = request_key(function, args, kwargs)
+        with self._lock:
+            if self._closed:
+                raise ServiceBusy("the simulation service is shutting down")
+            self._counters['submitted'] += 1
+
+            ticket = self._in_flight.get(key)
+            if ticket is not None:
+                # Identical work is already queued or running, share it instead of computing it again
+                ticket.waiters += 1
+                self._counters['coalesced'] += 1
+                return ticket
+
+            if self._queued >= self.max_queued:
+                self._counters['rejected'] += 1
+                raise ServiceBusy(f"{self._queued} simulations are already waiting, please try again shortly")
+            if self._per_session.get(session_id, 0) >= self.max_per_session:
+                self._counters['rejected'] += 1
+                raise ServiceBusy(f"this session already has {self.max_per_session} simulations in progress")
+
+            ticket = Ticket(key, session_id, function, args, kwargs)
+            self._in_flight[key] = ticket
+            self._per_session[session_id] = self._per_session.get(session_id, 0) + 1
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            self._queued += 1
+            self._lock.notify()
+            return ticket
+
+    def run(self, session_id, function, *args, timeout=None, **kwargs):
+        """Submits a simulation and waits for its result, raises ServiceBusy if it cannot be accepted."""
+        return self.submit(session_id, function, *args, **kwargs).result(timeout)
+
+    def stats(self):
+        """Returns a dict of the queued and running simulations, active sessions and lifetime counters."""
+        with self._lock:
+            return dict(self._counters, queued=self._queued, running=self._running, workers=self.workers,
+                        sessions=len(self._per_session))
+
+    def shutdown(self, wait=True):
+        """Stops accepting work and stops the workers once the queued simulations are done."""
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _next_ticket(self):
+        """Pops the oldest ticket of the session whose turn it is, then moves that session to the back."""
+        session_id, queue = next(iter(self._queues.items()))
+        ticket = queue.popleft()
+        del self._queues[session_id]
+        if queue:
+            self._queues[session_id] = queue
+        self._queued -= 1
+        return ticket
+
+    def _work(self):
+        """Worker loop, runs tickets in round robin order between sessions."""
+        while True:
+            with self._lock:
+                while not self._queues and not self._closed:
+                    self._lock.wait()
+                if not self._queues:
+                    return
+                ticket = self._next_ticket()
+                self._running += 1
+
+            ticket._run()
+
+            with self._lock:
+                self._running -= 1
+                self._counters['completed'] += 1
+                del self._in_flight[ticket.key]
+                remaining = self._per_session[ticket.session_id] - 1
+                if remaining:
+                    self._per_session[ticket.session_id] = remaining
+                else:
+                    del self._per_session[ticket.session_id]
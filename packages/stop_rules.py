@@ -0,0 +1,505 @@
+import numpy as np
+
+from packages.progressions import STOP_REASONS, win_probabilities
+
+"""
+Contains the dynamic programming solver for the target and floor stop rules of the roulette progressions.
+
+The states a progression can be in (balance, bet and the progression's own counters) are enumerated play by play from
+the starting state with the compiled kernel's own update, keeping only the states still carrying probability, so the
+state space is stored sparsely as one layer of distinct states per play with the index of each state's win and loss
+successors. Backward induction over the layers then gives the exact expected utility of ending balance of any target
+and floor, of a whole grid of them at once, and of the optimal stopping policy that may stop anywhere, and a forward
+pass gives the exact outcome distribution of the chosen rule.
+"""
+
+# Keys of the kernel state that tell two states apart
+STATE_KEYS = ('balance', 'bet', 'level', 'streak', 'cycle_profit')
+
+# States reached with less probability than this are dropped from the graph and valued as if they stopped
+PRUNE_PROBABILITY = 1e-12
+
+# Stop rules evaluated per backward pass, bounds the (rules x states) arrays of one layer
+RULES_PER_PASS = 32
+
+# Rule x state evaluations up to which every candidate is evaluated, larger grids are searched coarse to fine
+EXHAUSTIVE_WORK = 2e7
+
+# The pattern search starts with strides of this fraction of each axis
+SEARCH_STRIDES = 8
+
+# Relative rounding a rule's value may differ from the best policy's by and still count as reaching it
+BOUND_TOLERANCE = 1e-12
+
+
+def goal_utility(goal):
+    """Returns the utility of reaching a goal: 1 for ending balances at or above goal, 0 below."""
+    def utility(balance):
+        return (balance >= goal).astype(float)
+    return utility
+
+
+def crra_utility(risk_aversion):
+    """
+    Returns a constant relative risk aversion utility of the ending balance
+    Args:
+        risk_aversion (float): 0 values every dollar the same (expected balance), 1 is the log utility, above 1 is
+            more cautious and negative values seek risk
+    Returns:
+        function: utility of an array of ending balances
+    """
+    def utility(balance):
+        balance = np.maximum(balance, 1e-9)
+        if risk_aversion == 1:
+            return np.log(balance)
+        return balance ** (1 - risk_aversion) / (1 - risk_aversion)
+    return utility
+
+
+def _distinct(columns):
+    """
+    Finds the distinct rows of a table given column by column
+    Args:
+        columns (list): equally long arrays, one per column
+    Returns:
+        tuple: (index of one row of every distinct row, in lexicographic order, distinct row of every row)
+    """
+    # Whole valued columns, as with whole dollar sliders, pack into one integer key that sorts several times faster
+    key, span = np.zeros(len(columns[0]), dtype=np.int64), 1
+    for column in columns[::-1]:
+        if not len(column):
+            break
+        low = column.min()
+        width = column.max() - low + 1
+        if span * width >= 2 ** 62 or not np.array_equal(column, np.floor(column)):
+            break
+        key += (column - low).astype(np.int64) * span
+        span *= int(width)
+    else:
+        if span > 4 * len(key):
+            distinct, inverse = np.unique(key, return_index=True, return_inverse=True)[1:]
+            return distinct, inverse.ravel()
+        # Keys packed densely, e.g. small even bets, are ranked by a table over the key range without sorting
+        present = np.zeros(span, dtype=bool)
+        present[key] = True
+        inverse = (np.cumsum(present) - 1)[key]
+        distinct = np.empty(int(present.sum()), dtype=np.int64)
+        # Written backwards, so every distinct row keeps its first occurrence as np.unique does
+        distinct[inverse[::-1]] = np.arange(len(key) - 1, -1, -1)
+        return distinct, inverse
+
+    order = np.lexsort(columns[::-1])
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = np.any([np.diff(column[order]) != 0 for column in columns], axis=0)
+    inverse = np.empty(len(order), dtype=np.int64)
+    inverse[order] = np.cumsum(starts) - 1
+    return order[starts], inverse
+
+
+class StateGraph:
+    """
+    Layered graph of the states a progression reaches with non negligible probability.
+
+    Attributes:
+        layers (list): per play dict of the distinct states' STATE_KEYS arrays
+        win (list): per play index of every state's successor after a win in the next layer, -1 if it was pruned
+        loss (list): per play index of every state's successor after a loss in the next layer, -1 if it was pruned
+        win_balance (list): per play balance after a win, values the pruned successors
+        loss_balance (list): per play balance after a loss
+        forced (list): per play whether the state has to stop, broke or unable to cover its bet
+        win_probability (float): chance of winning a spin
+        pruned (float): probability mass dropped with the pruned states
+
+    Methods:
+        size: Returns the number of states over all layers.
+    """
+
+    def __init__(self, progression, initial_balance, initial_bet, preference, num_plays, wheel='american',
+                 prune=PRUNE_PROBABILITY):
+        """Enumerates the states reachable in num_plays spins from the starting state."""
+        if progression.line is not None:
+            raise ValueError(f"{progression.name}: line progressions have too many states for the solver")
+        self.win_probability = float(win_probabilities(preference, wheel))
+        p = self.win_probability
+        state = progression._initial_state(1, initial_balance, initial_bet)
+        layer = {key: state[key].astype(float) for key in STATE_KEYS}
+        mass = np.ones(1)
+        # Counters the progression never reads cannot tell two states apart
+        spec = progression.spec
+        used = {'level': progression.sequence is not None, 'streak': spec.reset_after_wins is not None,
+                'cycle_profit': spec.cycle_target is not None}
+        keys = ['balance', 'bet'] + [key for key in used if used[key]]
+        self.layers, self.win, self.loss, self.win_balance, self.loss_balance, self.forced = [], [], [], [], [], []
+        self.pruned = 0.0
+
+        for _ in range(num_plays):
+            forced = (layer['balance'] <= 0) | (layer['bet'] > layer['balance'])
+            playing = np.nonzero(~forced)[0]
+            # Win successors first, then loss successors, from one kernel update
+            states = self._successors(progression, layer, playing, initial_bet)
+            self.layers.append(layer)
+            self.forced.append(forced)
+            self.win_balance.append(layer['balance'] + layer['bet'])
+            self.loss_balance.append(layer['balance'] - layer['bet'])
+
+            # Distinct successors form the next layer, their probabilities tell which ones to keep
+            distinct, inverse = _distinct([states[key] for key in keys])
+            weights = np.concatenate([mass[playing] * p, mass[playing] * (1 - p)])
+            next_mass = np.bincount(inverse, weights=weights, minlength=len(distinct))
+            kept = next_mass >= prune
+            self.pruned += float(next_mass[~kept].sum())
+            position = np.where(kept, np.cumsum(kept) - 1, -1)
+
+            for children, successor in ((self.win, inverse[:len(playing)]), (self.loss, inverse[len(playing):])):
+                index = np.full(len(forced), -1, dtype=np.int64)
+                index[playing] = position[successor]
+                children.append(index)
+            layer = {key: states[key][distinct[kept]] for key in STATE_KEYS}
+            mass = next_mass[kept]
+            if not len(mass):
+                # Every path has stopped, the later plays have no states
+                break
+        self.layers.append(layer)
+        self.forced.append((layer['balance'] <= 0) | (layer['bet'] > layer['balance']))
+
+    @staticmethod
+    def _successors(progression, layer, rows, base):
+        """Returns the states of the given rows after a won and after a lost spin, as the kernel would update them."""
+        state = {key: np.tile(layer[key][rows], 2) for key in STATE_KEYS}
+        for key in ('level', 'streak'):
+            state[key] = state[key].astype(np.int64, copy=False)
+        outcome = np.arange(2 * len(rows)) < len(rows)
+        state['balance'] += np.where(outcome, state['bet'], -state['bet'])
+        progression._update(state, outcome, np.ones(len(outcome), dtype=bool), np.full(len(outcome), float(base)))
+        return {key: state[key] for key in STATE_KEYS}
+
+    def size(self):
+        """Returns the number of states over all layers."""
+        return sum(len(layer['balance']) for layer in self.layers)
+
+    def values(self, utility, targets, floors):
+        """
+        Expected utility of the ending balance under every (target, floor) stop rule, by backward induction
+        Args:
+            utility (function): utility of an array of ending balances
+            targets (np.array): target balance of every rule, np.inf for none
+            floors (np.array): floor balance of every rule
+        Returns:
+            np.array: expected utility of every rule from the starting state
+        """
+        # Values are laid out (rules, states), so every operation of a layer runs along its states
+        targets = np.asarray(targets, dtype=float)[:, None]
+        floors = np.asarray(floors, dtype=float)[:, None]
+        value = np.repeat(utility(self.layers[-1]['balance'])[None, :], len(targets), axis=0)
+        for play in range(len(self.layers) - 2, -1, -1):
+            balance = self.layers[play]['balance']
+            stopped = utility(balance)
+            # Only states between the lowest floor and the highest target can still be playing under some rule
+            rows = np.nonzero(~self.forced[play] & (balance > floors.min()) & (balance < targets.max()))[0]
+            if len(rows) == len(balance):
+                rows = None
+            continuation = self._continuation(play, value, utility, rows)
+            inside = balance if rows is None else balance[rows]
+            stop = (inside >= targets) | (inside <= floors)
+            np.copyto(continuation, stopped if rows is None else stopped[rows], where=stop)
+            # Usually every state of the layer can still be playing, and the values are the continuation as is
+            if rows is None:
+                value = continuation
+            else:
+                value = np.repeat(stopped[None, :], len(targets), axis=0)
+                value[:, rows] = continuation
+        return value[:, 0]
+
+    def optimal_value(self, utility):
+        """Returns the expected utility of the best policy that may stop at any state, and its stop decisions."""
+        value = utility(self.layers[-1]['balance'])[None, :]
+        decisions = [np.ones(value.shape[1], dtype=bool)]
+        for play in range(len(self.layers) - 2, -1, -1):
+            stopped = utility(self.layers[play]['balance'])
+            continuation = self._continuation(play, value, utility)[0]
+            stop = self.forced[play] | (stopped >= continuation)
+            value = np.where(stop, stopped, continuation)[None, :]
+            decisions.append(stop)
+        return float(value[0, 0]), decisions[::-1]
+
+    def voluntary_stops(self, decisions):
+        """
+        Where a policy stops of its own accord, by a forward pass over the layers
+        Args:
+            decisions (list): per play stop decision of every state, as returned by optimal_value
+        Returns:
+            tuple: (balances, probabilities) of the states the policy stops at without being forced to
+        """
+        mass = np.ones(1)
+        balances, weights = [], []
+        for play in range(len(self.layers) - 1):
+            voluntary = decisions[play] & ~self.forced[play]
+            balances.append(self.layers[play]['balance'][voluntary])
+            weights.append(mass[voluntary])
+            playing = np.nonzero(~decisions[play])[0]
+            mass = self._advance(play, mass, playing)
+        return np.concatenate(balances), np.concatenate(weights)
+
+    def _advance(self, play, mass, playing):
+        """Returns the probability of every state of the next layer from those of a layer and its states playing on."""
+        p = self.win_probability
+        next_mass = np.zeros(len(self.layers[play + 1]['balance']))
+        for children, chance in ((self.win[play], p), (self.loss[play], 1 - p)):
+            index = children[playing]
+            kept = index >= 0
+            next_mass += np.bincount(index[kept], weights=mass[playing[kept]] * chance, minlength=len(next_mass))
+        return next_mass
+
+    def _continuation(self, play, value, utility, rows=None):
+        """Expected next value of playing one more spin from the given states of a layer, for every row of value."""
+        p = self.win_probability
+        outcomes = []
+        for children, balance in ((self.win[play], self.win_balance[play]), (self.loss[play], self.loss_balance[play])):
+            if rows is not None:
+                children, balance = children[rows], balance[rows]
+            if not value.shape[1]:
+                outcomes.append(np.repeat(utility(balance)[None, :], len(value), axis=0))
+                continue
+            outcome = np.take(value, np.maximum(children, 0), axis=1)
+            pruned = np.nonzero(children < 0)[0]
+            if len(pruned):
+                # Pruned successors and the successors of stopped states are valued as if they stopped there
+                outcome[:, pruned] = utility(balance[pruned])
+            outcomes.append(outcome)
+        # The gathered outcomes are copies, blended in place
+        outcomes[0] *= p
+        outcomes[1] *= 1 - p
+        outcomes[0] += outcomes[1]
+        return outcomes[0]
+
+    def distribution(self, target_balance=None, floor_balance=0):
+        """
+        Exact outcome distribution of one stop rule, by a forward pass over the layers
+        Args:
+            target_balance (float, optional): stop once the balance reaches or exceeds this value
+            floor_balance (float): stop once the balance falls to or below this value
+        Returns:
+            OutcomeDistribution: probability of every ending balance and stop reason, and the expected plays
+        """
+        target = np.inf if target_balance is None else target_balance
+        p = self.win_probability
+        mass = np.ones(1)
+        balances, weights = [], []
+        reasons = np.zeros(len(STOP_REASONS))
+        plays = 0.0
+        for play in range(len(self.layers)):
+            layer = self.layers[play]
+            balance = layer['balance']
+            # Same order of stop reasons as the kernel: target, floor, then a bet the balance cannot cover
+            reached, fell, unable = balance >= target, balance <= floor_balance, self.forced[play]
+            stop = reached | fell | unable
+            if play == len(self.layers) - 1:
+                reasons[0] += mass[~stop].sum()
+                stop = np.ones(len(balance), dtype=bool)
+            reasons[1] += mass[reached].sum()
+            reasons[2] += mass[~reached & fell].sum()
+            reasons[3] += mass[~reached & ~fell & unable].sum()
+            balances.append(balance[stop])
+            weights.append(mass[stop])
+            if play == len(self.layers) - 1:
+                break
+
+            playing = np.nonzero(~stop)[0]
+            plays += mass[playing].sum()
+            for children, outcome_balance, chance in ((self.win[play], self.win_balance[play], p),
+                                                      (self.loss[play], self.loss_balance[play], 1 - p)):
+                pruned = playing[children[playing] < 0]
+                # Pruned successors end where they landed
+                balances.append(outcome_balance[pruned])
+                weights.append(mass[pruned] * chance)
+            mass = self._advance(play, mass, playing)
+
+        values, inverse = np.unique(np.concatenate(balances), return_inverse=True)
+        probabilities = np.bincount(inverse.ravel(), weights=np.concatenate(weights), minlength=len(values))
+        return OutcomeDistribution(values, probabilities, dict(zip(STOP_REASONS, reasons.tolist())), plays)
+
+
+class OutcomeDistribution:
+    """
+    Exact distribution of the ending balance under one stop rule.
+
+    Attributes:
+        values (np.array): distinct ending balances
+        probabilities (np.array): probability of each ending balance
+        stop_reasons (dict): probability of each of STOP_REASONS
+        expected_plays (float): expected number of spins played
+
+    Methods:
+        mean: Returns the expected ending balance.
+        share_at_least: Returns the probability of ending at or above a balance.
+        share_below: Returns the probability of ending below a balance.
+        frame: Returns the distribution as a DataFrame.
+    """
+
+    def __init__(self, values, probabilities, stop_reasons, expected_plays):
+        """Initialize an OutcomeDistribution."""
+        self.values = values
+        self.probabilities = probabilities
+        self.stop_reasons = stop_reasons
+        self.expected_plays = expected_plays
+
+    def mean(self):
+        """Returns the expected ending balance."""
+        return float(self.values @ self.probabilities)
+
+    def share_at_least(self, balance):
+        """Returns the probability of ending at or above balance."""
+        return float(self.probabilities[self.values >= balance].sum())
+
+    def share_below(self, balance):
+        """Returns the probability of ending below balance."""
+        return float(self.probabilities[self.values < balance].sum())
+
+    def frame(self):
+        """Returns a DataFrame with the 'Balance' and 'Probability' of every ending balance."""
+        import pandas as pd
+
+        return pd.DataFrame({'Balance': self.values, 'Probability': self.probabilities})
+
+
+class StopRuleSolution:
+    """
+    Best target and floor for an objective, with the exact outcomes they lead to.
+
+    Attributes:
+        target_balance (float): best target, None when playing on without a target is best
+        floor_balance (float): best floor
+        value (float): expected utility of the best target and floor
+        optimal_value (float): expected utility of the best policy that may stop at any state, an upper bound
+        no_play_value (float): utility of not playing at all
+        distribution (OutcomeDistribution): exact outcomes of the best target and floor
+        values (np.array): expected utility of every candidate, shape (len(floors), len(targets))
+        targets (np.array): candidate targets, np.inf for none
+        floors (np.array): candidate floors
+        states (int): number of states in the graph
+        pruned (float): probability mass of the states dropped from the graph
+    """
+
+    def __init__(self, target_balance, floor_balance, value, optimal_value, no_play_value, distribution, values,
+                 targets, floors, states, pruned):
+        """Initialize a StopRuleSolution."""
+        self.target_balance = target_balance
+        self.floor_balance = floor_balance
+        self.value = value
+        self.optimal_value = optimal_value
+        self.no_play_value = no_play_value
+        self.distribution = distribution
+        self.values = values
+        self.targets = targets
+        self.floors = floors
+        self.states = states
+        self.pruned = pruned
+
+
+def _weighted_median(values, weights):
+    """Returns the weighted median of values."""
+    order = np.argsort(values)
+    cumulative = np.cumsum(weights[order])
+    return values[order][np.searchsorted(cumulative, cumulative[-1] / 2)]
+
+
+def _grid_search(graph, utility, targets, floors, start, bound=np.inf):
+    """
+    Evaluates the stop rules of a grid, all of them when the graph is small enough, otherwise a pattern search from
+    the start cells whose stride halves until it moves one candidate at a time, or until a rule reaches the bound
+    Args:
+        graph (StateGraph): state graph of the settings
+        utility (function): utility of an array of ending balances
+        targets (np.array): candidate targets, np.inf for none
+        floors (np.array): candidate floors
+        start (list): (floor index, target index) cells the search starts from
+        bound (float): value no rule can exceed, the search ends at a rule reaching it
+    Returns:
+        np.array: expected utility of every evaluated rule, shape (len(floors), len(targets)), nan where not evaluated
+    """
+    values = np.full((len(floors), len(targets)), np.nan)
+
+    def inside(cell):
+        return 0 <= cell[0] < len(floors) and 0 <= cell[1] < len(targets)
+
+    def evaluate(cells):
+        cells = sorted({cell for cell in cells if inside(cell) and np.isnan(values[cell])})
+        for first in range(0, len(cells), RULES_PER_PASS):
+            rows, columns = np.array(cells[first:first + RULES_PER_PASS]).T
+            values[rows, columns] = graph.values(utility, targets[columns], floors[rows])
+
+    if values.size * graph.size() <= EXHAUSTIVE_WORK:
+        evaluate([(row, column) for row in range(len(floors)) for column in range(len(targets))])
+        return values
+
+    evaluate(start)
+    best = max(start, key=lambda cell: values[cell])
+    strides = [max(1, len(axis) // SEARCH_STRIDES) for axis in (floors, targets)]
+    # No other rule can do better than one as good as the best policy that may stop anywhere
+    reached = bound - BOUND_TOLERANCE * max(1.0, abs(bound))
+    while values[best] < reached:
+        row, column = best
+        neighbours = [cell for cell in ((row + up * strides[0], column + right * strides[1])
+                                        for up in (-1, 0, 1) for right in (-1, 0, 1)) if inside(cell)]
+        evaluate(neighbours)
+        moved = max(neighbours, key=lambda cell: values[cell])
+        if values[moved] > values[best]:
+            best = moved
+        elif strides == [1, 1]:
+            break
+        else:
+            strides = [max(1, stride // 2) for stride in strides]
+    return values
+
+
+def solve_stop_rules(progression, initial_balance, initial_bet, preference, num_plays, utility, step=10,
+                     max_target=5000, wheel='american', graph=None):
+    """
+    Finds the target and floor that maximise the expected utility of the ending balance
+    Args:
+        progression (CompiledProgression): progression kernel, without a Labouchere line
+        initial_balance (int or float): starting amount
+        initial_bet (int or float): base bet the progression builds on
+        preference (string): colour bet on, "red", "black" or "green"
+        num_plays (int): maximum number of spins
+        utility (function): utility of an array of ending balances, e.g. goal_utility or crra_utility
+        step (int): spacing of the candidate targets and floors, as on the page sliders
+        max_target (int): largest candidate target
+        wheel (string): "american" or "european"
+        graph (StateGraph, optional): state graph of these settings, built if not given
+    Returns:
+        StopRuleSolution: best target and floor with their exact outcome distribution
+    """
+    graph = graph or StateGraph(progression, initial_balance, initial_bet, preference, num_plays, wheel)
+    highest = max(layer['balance'].max(initial=initial_balance) for layer in graph.layers)
+    # Targets past the highest reachable balance all act as no target
+    targets = np.arange(step * (initial_balance // step + 1), min(max_target, highest) + 1, step, dtype=float)
+    targets = np.append(targets, np.inf)
+    floors = np.arange(0, initial_balance, step, dtype=float)
+
+    # The best policy that may stop anywhere is cheap to find, the rule search starts from the thresholds it stops at
+    optimal, decisions = graph.optimal_value(utility)
+    balances, weights = graph.voluntary_stops(decisions)
+    start = [(0, len(targets) - 1)]
+    if decisions[0][0]:
+        start.append((len(floors) - 1, 0))
+    else:
+        above, below = balances > initial_balance, balances < initial_balance
+        target = _weighted_median(balances[above], weights[above]) if weights[above].sum() > 0 else np.inf
+        floor = _weighted_median(balances[below], weights[below]) if weights[below].sum() > 0 else 0
+        # The lowest stop that gains on not playing, a goal itself, the policy also stops where nothing is left to gain
+        gains = above & (weights > 0) & (utility(balances) > utility(np.array([float(initial_balance)])))
+        lowest = balances[gains].min(initial=np.inf)
+        row = max(np.searchsorted(floors, floor, side='right') - 1, 0)
+        columns = [min(np.searchsorted(targets, balance), len(targets) - 1) for balance in (target, lowest)]
+        # States that can no longer gain also stop under the best policy, a rule may as well play them out from floor 0
+        start += [(row, columns[0]), (0, columns[0]), (0, columns[1])]
+    values = _grid_search(graph, utility, targets, floors, start, optimal)
+
+    # Ties go to the lowest floor and target, the first in the grid order
+    floor_index, target_index = np.unravel_index(np.nanargmax(values), values.shape)
+    target = None if np.isinf(targets[target_index]) else float(targets[target_index])
+    floor = float(floors[floor_index])
+    no_play = float(utility(np.array([float(initial_balance)]))[0])
+    return StopRuleSolution(target, floor, float(values[floor_index, target_index]), optimal, no_play,
+                            graph.distribution(target, floor), values, targets, floors, graph.size(), graph.pruned)
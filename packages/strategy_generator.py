@@ -0,0 +1,621 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from packages.blackjack_logic import Card, CardCounter, Strategy, DEFAULT_RULES, compile_rules
+from packages.count_index import COUNTING_SYSTEMS
+
+"""
+Contains the generator of basic strategy charts and count index plays for any set of table rules.
+
+Basic strategy comes from exact infinite deck expected values: the distribution of the dealer's final total for every
+upcard and a recursion over the player's hand totals give the EV of standing, hitting, doubling, surrendering and
+splitting in every (player hand, dealer upcard) cell. Index plays come from a batched simulation of the cells whose
+two best actions are close: every sample deals a random part of a finite shoe, keeps the count of the cards seen and
+plays both actions on the same remaining cards (common random numbers), and the count at which the deviation becomes
+the better play is read off a linear fit of the EV difference against the count. The cells are simulated in parallel
+and every chart is cached on disk per rule set, so it is only generated once.
+
+The chart models the game as play_round plays it: split hands are played by hitting or standing, since play_round
+asks about doubling before a split hand's second card, a natural after a split is paid as a blackjack, and the count
+index plays use the running count play_round passes to the strategy.
+
+Generate the chart of the default rules ahead of time with:
+
+    python -m packages.strategy_generator --samples 20000 --processes 4
+"""
+
+# Card values, an ace is 11 and every ten valued card is 10
+VALUES = np.arange(2, 12)
+PROBABILITIES = np.array([1, 1, 1, 1, 1, 1, 1, 1, 4, 1]) / 13
+CARDS_PER_DECK = np.array([4, 4, 4, 4, 4, 4, 4, 4, 16, 4])
+
+# Two card actions: stand, hit, double, surrender, and split for pairs
+ACTIONS = ('S', 'H', 'D', 'R')
+
+# Dealer final totals of a distribution, the last entry is a bust
+DEALER_TOTALS = np.arange(17, 22)
+
+# Cells whose best two actions are closer than this, in units of the bet, are simulated for index plays
+INDEX_MARGIN = 0.1
+
+# Cards of the remaining shoe every index sample may use, enough for a split round and the dealer
+WINDOW = 24
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'strategy_cache')
+
+# Bumped whenever the generator changes, so stale cached charts are not read back
+CHART_VERSION = 2
+
+
+def _hard(value):
+    """Returns the hard value of a card, an ace counts 1."""
+    return 1 if value == 11 else value
+
+
+def _total(hard, ace):
+    """Returns the best total of a hand from its hard total and whether it holds an ace."""
+    return hard + 10 if ace and hard + 10 <= 21 else hard
+
+
+def card_value(card):
+    """Returns the value of a Card, 11 for an ace."""
+    return 11 if card.value == 'A' else card.get_value()
+
+
+def hand_state(hand):
+    """Returns the (total, soft) state of a Hand, soft when an ace counts 11."""
+    hard = sum(card.get_value() for card in hand.cards)
+    ace = any(card.value == 'A' for card in hand.cards)
+    total = _total(hard, ace)
+    return total, int(total != hard)
+
+
+def dealer_distribution(upcard, rules=DEFAULT_RULES):
+    """
+    Returns the distribution of the dealer's final total with an infinite deck
+    Args:
+        upcard (int): value of the dealer's upcard, 11 for an ace
+        rules (TableRules): table rules, a peeking dealer's distribution is conditioned on no blackjack
+    Returns:
+        np.array: probabilities of ending on 17, 18, 19, 20, 21 and of busting
+    """
+    draws = compile_rules(rules).dealer_draws
+    memo = {}
+
+    def final(hard, ace):
+        if hard > 21:
+            return np.eye(6)[5]
+        if (hard, ace) not in memo:
+            if draws[hard][int(ace)]:
+                memo[(hard, ace)] = sum(p * final(hard + _hard(value), ace or value == 11)
+                                        for value, p in zip(VALUES, PROBABILITIES))
+            else:
+                memo[(hard, ace)] = np.eye(6)[_total(hard, ace) - 17]
+        return memo[(hard, ace)]
+
+    if not (rules.dealer_peek and upcard in (10, 11)):
+        return final(_hard(upcard), upcard == 11)
+    # The round ends before the player acts when the hole card completes a blackjack
+    natural = 21 - upcard
+    distribution = sum(p * final(_hard(upcard) + _hard(value), upcard == 11 or value == 11)
+                       for value, p in zip(VALUES, PROBABILITIES) if value != natural)
+    return distribution / (1 - PROBABILITIES[VALUES == natural][0])
+
+
+class _CellEV:
+    """Exact infinite deck EVs of the player's options against one dealer upcard."""
+
+    def __init__(self, upcard, rules):
+        self.rules = rules
+        self.dealer = dealer_distribution(upcard, rules)
+        self._best = {}
+
+    def stand(self, total):
+        """EV of standing on a total."""
+        if total > 21:
+            return -1.0
+        dealer = self.dealer
+        return dealer[5] + dealer[:5][DEALER_TOTALS < total].sum() - dealer[:5][DEALER_TOTALS > total].sum()
+
+    def hit(self, hard, ace):
+        """EV of taking one card and then hitting or standing optimally."""
+        return sum(p * self.best(hard + _hard(value), ace or value == 11) for value, p in zip(VALUES, PROBABILITIES))
+
+    def best(self, hard, ace):
+        """EV of hitting or standing optimally from a hand."""
+        if hard > 21:
+            return -1.0
+        if (hard, ace) not in self._best:
+            total = _total(hard, ace)
+            stand = self.stand(total)
+            self._best[(hard, ace)] = stand if total == 21 else max(stand, self.hit(hard, ace))
+        return self._best[(hard, ace)]
+
+    def double(self, hard, ace):
+        """EV of doubling, taking exactly one more card."""
+        return 2 * sum(p * self.stand(_total(hard + _hard(value), ace or value == 11))
+                       for value, p in zip(VALUES, PROBABILITIES))
+
+    def two_card(self, hard, ace):
+        """EVs of standing, hitting, doubling and surrendering a two card hand, nan where not allowed."""
+        surrender = -0.5 if self.rules.late_surrender else np.nan
+        return np.array([self.stand(_total(hard, ace)), self.hit(hard, ace), self.double(hard, ace), surrender])
+
+    def split_hand(self, pair, resplits):
+        """EV of one hand started from a split card, hit or stand only, resplitting up to resplits more times."""
+        total = 0.0
+        for value, p in zip(VALUES, PROBABILITIES):
+            if {pair, value} == {10, 11}:
+                ev = self.rules.blackjack_payout
+            else:
+                ev = self.best(_hard(pair) + _hard(value), pair == 11 or value == 11)
+            if value == pair and resplits > 0 and (pair != 11 or self.rules.resplit_aces):
+                ev = max(ev, 2 * self.split_hand(pair, resplits - 1))
+            total += p * ev
+        return total
+
+    def split(self, pair):
+        """EV of splitting a pair, resplits are shared out evenly between the two hands."""
+        return 2 * self.split_hand(pair, (self.rules.max_hands - 1) // 2)
+
+
+class Deviation:
+    """
+    An index play: a cell where the count decides between two actions.
+
+    Attributes:
+        table (str): 'hard', 'soft', 'pair' or 'insurance'
+        total (int): hand total, or pair card value for 'pair'
+        upcard (int): dealer upcard value, 11 for an ace
+        basic (str): basic strategy action
+        action (str): action taken once the count reaches the threshold
+        threshold (float): count at which the action becomes the better play
+        direction (int): 1 to deviate at counts at or above the threshold, -1 at or below it
+
+    Methods:
+        applies: Returns whether the deviation is taken at a count.
+    """
+
+    def __init__(self, table, total, upcard, basic, action, threshold, direction):
+        """Initialize a Deviation."""
+        self.table = table
+        self.total = int(total)
+        self.upcard = int(upcard)
+        self.basic = basic
+        self.action = action
+        self.threshold = float(threshold)
+        self.direction = int(direction)
+
+    def __repr__(self):
+        sign = '>=' if self.direction > 0 else '<='
+        return (f"Deviation({self.table} {self.total} vs {self.upcard}: {self.action} instead of {self.basic} "
+                f"at count {sign} {self.threshold:+.1f})")
+
+    def applies(self, count):
+        """Returns whether the deviation is taken at a count."""
+        return count >= self.threshold if self.direction > 0 else count <= self.threshold
+
+
+class StrategyChart:
+    """
+    Generated basic strategy and count index plays of one rule set.
+
+    Attributes:
+        rules (TableRules): rules the chart was generated for
+        actions (dict): best two card action per cell, arrays of ACTIONS indexed by [total, upcard] for 'hard' and
+            'soft' hands
+        split (np.array): whether to split a pair, indexed by [pair card value, upcard]
+        hit (np.array): whether to hit rather than stand, indexed by [total, soft, upcard], for any number of cards
+        ev (dict): exact EVs of each action, indexed by [total, upcard, action] for 'hard' and 'soft', and the EV of
+            splitting indexed by [pair card value, upcard] for 'pair'
+        deviations (dict): list of Deviation per counting system
+
+    Methods:
+        strategy: Returns a Strategy playing the chart, with the index plays of a counting system.
+        frame: Returns one table of the chart as a DataFrame of action codes.
+    """
+
+    def __init__(self, rules, actions, split, hit, ev, deviations=None):
+        """Initialize a StrategyChart."""
+        self.rules = rules
+        self.actions = actions
+        self.split = split
+        self.hit = hit
+        self.ev = ev
+        self.deviations = deviations or {}
+
+    def strategy(self, counting_system=None):
+        """Returns a Strategy playing the chart, with the index plays of counting_system if one is given."""
+        deviations = {(deviation.table, deviation.total, deviation.upcard): deviation
+                      for deviation in self.deviations.get(counting_system, [])}
+
+        def two_card_action(hand, upcard, count):
+            total, soft = hand_state(hand)
+            table = 'soft' if soft else 'hard'
+            action = self.actions[table][total, upcard]
+            deviation = deviations.get((table, total, upcard))
+            if deviation is not None and deviation.applies(count):
+                action = deviation.action
+            return action
+
+        def hit_or_stand(hand, dealer_upcard, count):
+            total, soft = hand_state(hand)
+            upcard = card_value(dealer_upcard)
+            deviation = deviations.get(('soft' if soft else 'hard', total, upcard))
+            # Hit or stand index plays hold for any number of cards, the others only for the first two
+            if deviation is not None and {deviation.basic, deviation.action} == {'H', 'S'} and deviation.applies(count):
+                return deviation.action == 'H'
+            return bool(self.hit[total, soft, upcard])
+
+        def double_down(hand, dealer_upcard, count):
+            return len(hand.cards) == 2 and two_card_action(hand, card_value(dealer_upcard), count) == 'D'
+
+        def should_surrender(hand, dealer_upcard, count):
+            return len(hand.cards) == 2 and two_card_action(hand, card_value(dealer_upcard), count) == 'R'
+
+        def should_split(hand, dealer_upcard, count):
+            if len(hand.cards) != 2 or hand.cards[0].value != hand.cards[1].value:
+                return False
+            pair, upcard = card_value(hand.cards[0]), card_value(dealer_upcard)
+            split = bool(self.split[pair, upcard])
+            deviation = deviations.get(('pair', pair, upcard))
+            if deviation is not None and deviation.applies(count):
+                split = deviation.action == 'P'
+            return split
+
+        def should_insurance(count):
+            deviation = deviations.get(('insurance', 0, 11))
+            return deviation is not None and deviation.applies(count)
+
+        name = "Generated Basic Strategy" + (f" + {counting_system} indexes" if counting_system else "")
+        return Strategy(name, hit_or_stand, double_down, should_split, should_surrender, should_insurance)
+
+    def frame(self, table='hard'):
+        """Returns the 'hard', 'soft' or 'pair' table as a DataFrame of action codes, one row per hand."""
+        import pandas as pd
+
+        columns = ['A' if upcard == 11 else str(upcard) for upcard in VALUES]
+        if table == 'pair':
+            rows = {('A,A' if pair == 11 else f"{pair},{pair}"): np.where(self.split[pair, VALUES], 'P', '')
+                    for pair in VALUES}
+        elif table == 'soft':
+            rows = {f"A,{total - 11}": self.actions['soft'][total, VALUES] for total in range(13, 21)}
+        else:
+            rows = {str(total): self.actions['hard'][total, VALUES] for total in range(5, 21)}
+        return pd.DataFrame.from_dict(rows, orient='index', columns=columns)
+
+
+def basic_chart(rules=DEFAULT_RULES):
+    """
+    Derives the basic strategy of a rule set from exact infinite deck EVs
+    Args:
+        rules (TableRules): table rules
+    Returns:
+        StrategyChart: best action in every cell, without index plays
+    """
+    actions = {table: np.full((22, 12), 'S', dtype='<U1') for table in ('hard', 'soft')}
+    ev = {table: np.full((22, 12, len(ACTIONS)), np.nan) for table in ('hard', 'soft')}
+    ev['pair'] = np.full((12, 12), np.nan)
+    split = np.zeros((12, 12), dtype=bool)
+    hit = np.zeros((22, 2, 12), dtype=bool)
+
+    for upcard in VALUES:
+        cell = _CellEV(upcard, rules)
+        for hard in range(2, 21):
+            for ace in (False, True):
+                total = _total(hard, ace)
+                if total < 21:
+                    hit[total, int(total != hard), upcard] = cell.hit(hard, ace) > cell.stand(total)
+        # Two card hands: hard 4 to 20 and soft 12 (a pair of aces) to 20
+        for table, ace, hards in (('hard', False, range(4, 21)), ('soft', True, range(2, 11))):
+            for hard in hards:
+                total = _total(hard, ace)
+                ev[table][total, upcard] = cell.two_card(hard, ace)
+                actions[table][total, upcard] = ACTIONS[int(np.nanargmax(ev[table][total, upcard]))]
+        for pair in VALUES:
+            hard = 2 * _hard(pair)
+            table, total = ('soft', 12) if pair == 11 else ('hard', hard)
+            ev['pair'][pair, upcard] = cell.split(pair)
+            split[pair, upcard] = ev['pair'][pair, upcard] > np.nanmax(ev[table][total, upcard])
+    return StrategyChart(rules, actions, split, hit, ev)
+
+
+def index_candidates(chart, margin=INDEX_MARGIN):
+    """
+    Returns the cells whose two best actions are within margin of each other, plus insurance
+    Args:
+        chart (StrategyChart): basic chart with exact EVs
+        margin (float): largest EV gap, in units of the bet, of a cell worth an index
+    Returns:
+        list: (table, total, upcard, basic action, alternative action) of every candidate cell
+    """
+    candidates = []
+    for table, totals in (('hard', range(5, 21)), ('soft', range(13, 21))):
+        for total in totals:
+            for upcard in VALUES:
+                evs = chart.ev[table][total, upcard]
+                order = [index for index in np.argsort(-np.nan_to_num(evs, nan=-np.inf)) if not np.isnan(evs[index])]
+                if len(order) > 1 and evs[order[0]] - evs[order[1]] < margin:
+                    candidates.append((table, total, upcard, ACTIONS[order[0]], ACTIONS[order[1]]))
+    for pair in VALUES:
+        for upcard in VALUES:
+            table, total = ('soft', 12) if pair == 11 else ('hard', 2 * pair)
+            best = np.nanmax(chart.ev[table][total, upcard])
+            if abs(chart.ev['pair'][pair, upcard] - best) < margin:
+                no_split = ACTIONS[int(np.nanargmax(chart.ev[table][total, upcard]))]
+                basic, other = ('P', no_split) if chart.split[pair, upcard] else (no_split, 'P')
+                candidates.append(('pair', pair, upcard, basic, other))
+    if chart.rules.insurance:
+        candidates.append(('insurance', 0, 11, 'N', 'I'))
+    return candidates
+
+
+def count_tags(counting_system):
+    """Returns the tag of every card value under a counting system, indexed by value."""
+    tags = np.zeros(12)
+    for value in VALUES:
+        counter = CardCounter()
+        getattr(counter, counting_system)(Card('A' if value == 11 else str(value)))
+        tags[value] = counter.get_running_count()
+    return tags
+
+
+def _player_cards(table, total):
+    """Returns a representative pair of card values for a cell."""
+    if table == 'pair':
+        return total, total
+    if table == 'soft':
+        return 11, total - 11
+    if table == 'insurance':
+        return 10, 8
+    if total >= 12:
+        return 10, total - 10
+    return total // 2 + 1, total - total // 2 - 1
+
+
+class _Shoes:
+    """Rows of remaining shoe windows dealt after a random number of seen cards."""
+
+    def __init__(self, rng, rules, removed, tags, samples):
+        shoe = np.repeat(VALUES, CARDS_PER_DECK * rules.decks)
+        for value in removed:
+            shoe = np.delete(shoe, np.nonzero(shoe == value)[0][0])
+        width = min(WINDOW, len(shoe))
+        shuffled = rng.permuted(np.tile(shoe, (samples, 1)), axis=1)
+        # Rounds are dealt from any depth that still leaves the reshuffle point and a full window
+        depth = rng.integers(0, max(len(shoe) - max(width, rules.reshuffle_at), 0) + 1, samples)
+        seen = np.concatenate([np.zeros((samples, 1)), np.cumsum(tags[shuffled], axis=1)], axis=1)
+        self.count = seen[np.arange(samples), depth] + tags[list(removed)].sum()
+        self.cards = shuffled[np.arange(samples)[:, None], depth[:, None] + np.arange(width)]
+        self.position = np.zeros(samples, dtype=np.int64)
+
+    def draw(self, rows):
+        """Returns the next card of each given row."""
+        cards = self.cards[rows, self.position[rows]]
+        self.position[rows] += 1
+        return cards
+
+
+def _hit_out(shoes, hard, ace, upcard, hit, rows):
+    """Hits the given hands in place until the hit table says stand or they reach 21."""
+    while len(rows):
+        total = np.where(ace[rows] & (hard[rows] + 10 <= 21), hard[rows] + 10, hard[rows])
+        soft = (total != hard[rows]).astype(np.int64)
+        rows = rows[(total < 21) & hit[np.minimum(total, 21), soft, upcard]]
+        cards = shoes.draw(rows)
+        hard[rows] += np.where(cards == 11, 1, cards)
+        ace[rows] |= cards == 11
+
+
+def _hand_totals(hard, ace):
+    """Best totals of arrays of hands."""
+    return np.where(ace & (hard + 10 <= 21), hard + 10, hard)
+
+
+def _settle(total, dealer):
+    """Net result of each hand standing on total against the dealer's final total."""
+    return np.where(total > 21, -1.0, np.where((dealer > 21) | (total > dealer), 1.0,
+                                               np.where(total == dealer, 0.0, -1.0)))
+
+
+def _play_action(shoes, rules, draws, hit, cell, action):
+    """Plays one action of a cell on every row of shoes and returns the net result of each row."""
+    table, total, upcard, first, second = cell
+    samples = len(shoes.count)
+    rows = np.arange(samples)
+    shoes.position[:] = 0
+    hole = shoes.draw(rows)
+    payout = rules.blackjack_payout
+
+    if action == 'R':
+        return np.full(samples, -0.5)
+    if action == 'P':
+        hands = []
+        for _ in range(2):
+            cards = shoes.draw(rows)
+            hard = _hard(first) + np.where(cards == 11, 1, cards)
+            ace = (first == 11) | (cards == 11)
+            natural = ((first == 11) & (cards == 10)) | ((first == 10) & (cards == 11))
+            _hit_out(shoes, hard, ace, upcard, hit, rows[~natural])
+            hands.append((hard, ace, natural))
+    else:
+        hard = np.full(samples, _hard(first) + _hard(second))
+        ace = np.full(samples, first == 11 or second == 11)
+        if action in ('H', 'D'):
+            cards = shoes.draw(rows)
+            hard += np.where(cards == 11, 1, cards)
+            ace |= cards == 11
+        if action == 'H':
+            _hit_out(shoes, hard, ace, upcard, hit, rows)
+        hands = [(hard, ace, np.zeros(samples, dtype=bool))]
+
+    # The dealer draws from the cards the player left, by the compiled draw table
+    dealer_hard = _hard(upcard) + np.where(hole == 11, 1, hole)
+    dealer_ace = (upcard == 11) | (hole == 11)
+    drawing = rows
+    while len(drawing):
+        drawing = drawing[draws[np.minimum(dealer_hard[drawing], 31), dealer_ace[drawing].astype(np.int64)]]
+        cards = shoes.draw(drawing)
+        dealer_hard[drawing] += np.where(cards == 11, 1, cards)
+        dealer_ace[drawing] |= cards == 11
+    dealer = _hand_totals(dealer_hard, dealer_ace)
+
+    stake = 2.0 if action == 'D' else 1.0
+    results = np.zeros(samples)
+    for hard, ace, natural in hands:
+        results += np.where(natural, payout, stake * _settle(_hand_totals(hard, ace), dealer))
+    return results
+
+
+def simulate_cell(rules, hit, candidate, counting_system, samples=20000, seed=0):
+    """
+    Estimates the index of one candidate cell with common random numbers
+    Args:
+        rules (TableRules): table rules
+        hit (np.array): hit or stand table the hands are played on with after the first action
+        candidate (tuple): (table, total, upcard, basic action, alternative action) from index_candidates
+        counting_system (string): "high_low", "zen" or "halves"
+        samples (int): simulated deals of the cell
+        seed (int or str): seed of the deals, the same for every action of the cell
+    Returns:
+        Deviation: the index play of the cell, None if the count never makes the alternative the better play
+    """
+    table, total, upcard, basic, other = candidate
+    first, second = _player_cards(table, total)
+    tags = count_tags(counting_system)
+    seed_text = f"{seed}-{counting_system}-{table}-{total}-{upcard}"
+    rng = np.random.default_rng(int.from_bytes(hashlib.sha1(seed_text.encode()).digest()[:8], 'little'))
+    shoes = _Shoes(rng, rules, (first, second, upcard), tags, samples)
+
+    keep = np.ones(samples, dtype=bool)
+    hole = shoes.cards[:, 0]
+    if rules.dealer_peek and upcard in (10, 11) and table != 'insurance':
+        # Rounds with a dealer blackjack end before the decision, insurance is decided before the peek
+        keep = hole != 21 - upcard
+    if table == 'insurance':
+        difference = np.where(hole == 10, 1.0, -0.5)
+    else:
+        draws = np.array(compile_rules(rules).dealer_draws)
+        cell = (table, total, upcard, first, second)
+        difference = (_play_action(shoes, rules, draws, hit, cell, other)
+                      - _play_action(shoes, rules, draws, hit, cell, basic))
+    count, difference = shoes.count[keep], difference[keep]
+
+    # Least squares line of the EV difference against the count, its root is the index
+    centered = count - count.mean()
+    slope = (centered @ (difference - difference.mean())) / (centered @ centered)
+    intercept = difference.mean() - slope * count.mean()
+    residual = difference - intercept - slope * count
+    slope_error = np.sqrt((residual @ residual) / (len(count) - 2) / (centered @ centered))
+    if slope == 0 or abs(slope) < 3 * slope_error:
+        return None
+    threshold = -intercept / slope
+    lower, upper = np.quantile(count, [0.05, 0.95])
+    if not lower <= threshold <= upper:
+        return None
+    return Deviation(table, total, upcard, basic, other, round(threshold, 1), 1 if slope > 0 else -1)
+
+
+def generate_chart(rules=DEFAULT_RULES, counting_systems=COUNTING_SYSTEMS, samples=20000, processes=1, seed=0,
+                   margin=INDEX_MARGIN):
+    """
+    Generates the basic strategy chart of a rule set and the index plays of every counting system
+    Args:
+        rules (TableRules): table rules
+        counting_systems (tuple): CardCounter methods to derive index plays for
+        samples (int): simulated deals per candidate cell and counting system
+        processes (int): worker processes the candidate cells are shared out to
+        seed (int): base seed, every cell derives its own
+        margin (float): largest EV gap, in units of the bet, of a cell worth an index
+    Returns:
+        StrategyChart: basic strategy with the index plays of every counting system
+    """
+    chart = basic_chart(rules)
+    candidates = index_candidates(chart, margin)
+    tasks = [(system, candidate) for system in counting_systems for candidate in candidates]
+    arguments = ([rules] * len(tasks), [chart.hit] * len(tasks), [candidate for _, candidate in tasks],
+                 [system for system, _ in tasks], [samples] * len(tasks), [seed] * len(tasks))
+    if processes == 1:
+        deviations = list(map(simulate_cell, *arguments))
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            deviations = list(pool.map(simulate_cell, *arguments, chunksize=max(1, len(tasks) // (4 * processes))))
+    chart.deviations = {system: [] for system in counting_systems}
+    for (system, _), deviation in zip(tasks, deviations):
+        if deviation is not None:
+            chart.deviations[system].append(deviation)
+    return chart
+
+
+def chart_path(rules, samples, seed=0, margin=INDEX_MARGIN, cache_dir=CACHE_DIR):
+    """Returns the cache file of the chart of a rule set and generator settings."""
+    key = f"{CHART_VERSION}|{rules!r}|{samples}|{seed}|{margin}"
+    return os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest()[:16] + '.npz')
+
+
+def save_chart(chart, path):
+    """Stores a chart in an .npz file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fields = ['system', 'table', 'total', 'upcard', 'basic', 'action', 'threshold', 'direction']
+    rows = [(system, d.table, d.total, d.upcard, d.basic, d.action, d.threshold, d.direction)
+            for system, deviations in chart.deviations.items() for d in deviations]
+    columns = dict(zip(fields, map(np.array, zip(*rows)))) if rows else {field: np.array([]) for field in fields}
+    np.savez_compressed(path, hard=chart.actions['hard'], soft=chart.actions['soft'], split=chart.split, hit=chart.hit,
+                        ev_hard=chart.ev['hard'], ev_soft=chart.ev['soft'], ev_pair=chart.ev['pair'],
+                        systems=np.array(list(chart.deviations)),
+                        **{f"deviation_{field}": values for field, values in columns.items()})
+
+
+def read_chart(rules, path):
+    """Reads a chart stored by save_chart."""
+    with np.load(path) as data:
+        deviations = {str(system): [] for system in data['systems']}
+        fields = ['table', 'total', 'upcard', 'basic', 'action', 'threshold', 'direction']
+        for row in zip(data['deviation_system'], *(data[f"deviation_{field}"] for field in fields)):
+            deviations[str(row[0])].append(Deviation(*(value.item() for value in row[1:])))
+        return StrategyChart(rules, {'hard': data['hard'], 'soft': data['soft']}, data['split'], data['hit'],
+                             {'hard': data['ev_hard'], 'soft': data['ev_soft'], 'pair': data['ev_pair']}, deviations)
+
+
+def load_chart(rules=DEFAULT_RULES, samples=20000, processes=1, seed=0, margin=INDEX_MARGIN, cache_dir=CACHE_DIR):
+    """
+    Returns the chart of a rule set from the disk cache, generating and caching it on a miss
+    Args:
+        rules (TableRules): table rules
+        samples (int): simulated deals per candidate cell and counting system
+        processes (int): worker processes used on a cache miss
+        seed (int): base seed
+        margin (float): largest EV gap of a cell worth an index
+        cache_dir (string): directory of the cached charts
+    Returns:
+        StrategyChart: basic strategy with the index plays of every counting system
+    """
+    path = chart_path(rules, samples, seed, margin, cache_dir)
+    if os.path.exists(path):
+        return read_chart(rules, path)
+    chart = generate_chart(rules, COUNTING_SYSTEMS, samples, processes, seed, margin)
+    save_chart(chart, path)
+    return chart
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generates and caches the strategy chart of the default rules")
+    parser.add_argument('--samples', type=int, default=20000, help='simulated deals per candidate cell')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+
+    chart = load_chart(DEFAULT_RULES, args.samples, args.processes, cache_dir=args.cache_dir)
+    for table in ('hard', 'soft', 'pair'):
+        print(chart.frame(table).to_string())
+    for system, deviations in chart.deviations.items():
+        print(f"{system}: " + ', '.join(map(repr, deviations)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,476 @@
+import numpy as np
+
+from packages.blackjack_logic import (BASIC_STRATEGY, DEFAULT_RULES, RANKS, Card, CardCounter, CheckpointResults, Hand,
+                                      compile_rules, default_checkpoints, validate_checkpoints)
+from packages.infinite_deck import ACE, RANK_VALUES, SOFT_CARDS, TEN_VALUED
+
+"""
+Contains the multi-seat table simulation, several seats playing against one dealer from a shared shoe.
+
+Many tables are played in lockstep one round at a time, and every hand of every seat at every table is a row of the
+same arrays, so the seats' decisions are taken together rather than one seat after another. Within a round the hands
+act in steps of at most one card each, so a decision sees every card of the earlier steps at its table. A strategy is
+asked once per distinct hand class, upcard and count and the answer is memoized, treating hands of the same total,
+softness, soft card, pair and two card status alike as packages.infinite_deck does. Rounds are settled as play_round
+settles them, and every seat counts each player card at the table and the dealer's upcard, but not the hole card or
+the dealer's draws.
+"""
+
+# Dealing time of a round, fitted to the commonly quoted rounds per hour of a six deck shoe dealt to one seat (about
+# 209) and to seven seats (about 52) when a shuffle takes a minute
+SECONDS_PER_ROUND = 7.9
+SECONDS_PER_HAND = 7.9
+SECONDS_PER_SHUFFLE = 60
+
+# Twice the running count is a whole number for every counting system, it is stored shifted by this offset
+COUNT_OFFSET = 2 ** 15
+
+# Pair rank code of hands that are not a pair
+NO_PAIR = len(RANKS)
+
+
+class Seat:
+    """
+    One player at a multi-seat table.
+
+    Attributes:
+        name (str): Display name of the seat.
+        base_bet (float): Bet of every spot when there is no bet ramp.
+        counting_strategy (str): Name of the CardCounter method the seat counts with.
+        strategy (Strategy): Playing decisions.
+        bet_ramp (BetRamp): Sizes the bet of every spot from the seat's count, None to bet base_bet flat.
+        spots (int): Hands the seat plays every round, each with the round's bet.
+        starting_bankroll (float): Bankroll the seat sits down with.
+    """
+
+    def __init__(self, name='Seat', base_bet=10, counting_strategy='high_low', strategy=BASIC_STRATEGY, bet_ramp=None,
+                 spots=1, starting_bankroll=0):
+        """Initialize a Seat, by default one flat betting spot counting Hi-Lo with the module's basic strategy."""
+        if spots < 1:
+            raise ValueError("A seat plays at least one spot")
+        self.name = name
+        self.base_bet = base_bet
+        self.counting_strategy = counting_strategy
+        self.strategy = strategy
+        self.bet_ramp = bet_ramp
+        self.spots = spots
+        self.starting_bankroll = starting_bankroll
+
+    def __repr__(self):
+        return (f"Seat({self.name!r}, base_bet={self.base_bet!r}, counting_strategy={self.counting_strategy!r}, "
+                f"strategy={self.strategy.name!r}, bet_ramp={self.bet_ramp!r}, spots={self.spots!r}, "
+                f"starting_bankroll={self.starting_bankroll!r})")
+
+
+def count_weights(counting_strategy):
+    """Returns the change of the running count for every rank code, read off the CardCounter method."""
+    counter = CardCounter()
+    method = getattr(counter, counting_strategy)
+    weights = np.empty(len(RANKS))
+    for code, rank in enumerate(RANKS):
+        counter.reset_count()
+        method(Card(rank))
+        weights[code] = counter.get_running_count()
+    return weights
+
+
+class _Decisions:
+    """Memoized answers of one Strategy, keyed by decision and by hand class, upcard and count."""
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.memo = {}
+
+    def decide(self, kind, keys, ask):
+        """Returns the answer for every key, calling ask(position) once for the first position of every new key."""
+        unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        memo = self.memo.setdefault(kind, {})
+        answers = np.empty(len(unique), dtype=bool)
+        for position, (key, index) in enumerate(zip(unique.tolist(), first.tolist())):
+            answer = memo.get(key)
+            if answer is None:
+                answer = memo[key] = bool(ask(index))
+            answers[position] = answer
+        return answers[inverse.ravel()]
+
+
+class _TableHands:
+    """Struct of arrays of the hands of one round at every table, growing as hands are split."""
+
+    def __init__(self, tables, spots, seats, first, second, stakes):
+        size = len(tables)
+        self.table = tables
+        self.spot = spots
+        self.seat = seats
+        self.cards = np.zeros((size, 8), dtype=np.int8)
+        self.cards[:, 0], self.cards[:, 1] = first, second
+        self.length = np.full(size, 2, dtype=np.int16)
+        self.hard = (RANK_VALUES[first] + RANK_VALUES[second]).astype(np.int16)
+        self.aces = ((first == ACE).astype(np.int16) + (second == ACE))
+        self.stake = stakes.astype(float)
+        self.split = np.zeros(size, dtype=bool)
+        self.doubled = np.zeros(size, dtype=bool)
+        self.settled = np.zeros(size, dtype=bool)
+
+    def __len__(self):
+        return len(self.table)
+
+    def add(self, index, cards):
+        """Adds one card to each indexed hand."""
+        if len(index) and self.length[index].max() >= self.cards.shape[1]:
+            self.cards = np.hstack([self.cards, np.zeros_like(self.cards)])
+        self.cards[index, self.length[index]] = cards
+        self.length[index] += 1
+        self.hard[index] += RANK_VALUES[cards]
+        self.aces[index] += cards == ACE
+
+    def split_off(self, index):
+        """Moves the second card of each indexed pair into a new hand with the same stake, both become split hands."""
+        second = self.cards[index, 1]
+        self.cards[index, 1] = 0
+        self.length[index] = 1
+        self.hard[index] -= RANK_VALUES[second]
+        self.aces[index] -= second == ACE
+        self.split[index] = True
+
+        cards = np.zeros((len(index), self.cards.shape[1]), dtype=np.int8)
+        cards[:, 0] = second
+        self.table = np.concatenate([self.table, self.table[index]])
+        self.spot = np.concatenate([self.spot, self.spot[index]])
+        self.seat = np.concatenate([self.seat, self.seat[index]])
+        self.cards = np.vstack([self.cards, cards])
+        self.length = np.concatenate([self.length, np.ones(len(index), dtype=np.int16)])
+        self.hard = np.concatenate([self.hard, RANK_VALUES[second].astype(np.int16)])
+        self.aces = np.concatenate([self.aces, (second == ACE).astype(np.int16)])
+        self.stake = np.concatenate([self.stake, self.stake[index]])
+        self.split = np.concatenate([self.split, np.ones(len(index), dtype=bool)])
+        self.doubled = np.concatenate([self.doubled, np.zeros(len(index), dtype=bool)])
+        self.settled = np.concatenate([self.settled, np.zeros(len(index), dtype=bool)])
+
+    def value(self):
+        """Best total of every hand, counting one ace as 11 when it does not bust, as Hand.get_value."""
+        return np.where((self.aces > 0) & (self.hard + 10 <= 21), self.hard + 10, self.hard)
+
+    def soft(self):
+        """Whether every ace can count as 11, as Hand.is_soft_hand."""
+        return (self.aces > 0) & (self.hard + 10 * self.aces <= 21)
+
+    def category(self):
+        """First of SOFT_CARDS every soft hand holds as 1 to 4, 0 for hard hands, see infinite_deck.soft_category."""
+        held = np.arange(self.cards.shape[1]) < self.length[:, None]
+        category = np.zeros(len(self), dtype=np.int64)
+        for row in range(len(SOFT_CARDS) - 1, -1, -1):
+            category[((self.cards == RANKS.index(SOFT_CARDS[row])) & held).any(axis=1)] = row + 1
+        return np.where(self.soft(), category, 0)
+
+    def pair(self):
+        """Rank code of every two card pair, NO_PAIR for any other hand."""
+        return np.where((self.length == 2) & (self.cards[:, 0] == self.cards[:, 1]), self.cards[:, 0], NO_PAIR)
+
+    def natural(self):
+        """Whether the first two cards are an ace and a ten valued card, the check of is_natural."""
+        first, second = self.cards[:, 0], self.cards[:, 1]
+        return (self.length >= 2) & (((first == ACE) & TEN_VALUED[second]) | (TEN_VALUED[first] & (second == ACE)))
+
+    def classes(self):
+        """Class code of every hand, hands of one class get the same decisions."""
+        code = self.hard.astype(np.int64) * 2 + (self.aces > 0)
+        code = (code * 2 + self.soft()) * (len(SOFT_CARDS) + 1) + self.category()
+        return (code * 2 + (self.length == 2)) * (NO_PAIR + 1) + self.pair()
+
+    def hand(self, index):
+        """Returns a Hand object holding the cards of one hand."""
+        hand = Hand()
+        for code in self.cards[index, :self.length[index]]:
+            hand.add_card(Card(RANKS[code]))
+        return hand
+
+
+def _draw(shoes, position, tables):
+    """Deals the next card of the shoe of every entry of tables, repeated tables get consecutive cards in order."""
+    order = np.argsort(tables, kind='stable')
+    ordered = tables[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    offsets = np.empty(len(tables), dtype=np.int64)
+    offsets[order] = np.arange(len(tables)) - np.repeat(starts, np.diff(np.r_[starts, len(tables)]))
+    cards = shoes[tables, position[tables] + offsets]
+    position += np.bincount(tables, minlength=len(position))
+    return cards
+
+
+def _count(counts, weights, tables, cards):
+    """Adds the cards dealt at each table to the running count of every seat at it."""
+    seen = np.bincount(tables * len(RANKS) + cards, minlength=len(counts) * len(RANKS))
+    counts += seen.reshape(len(counts), len(RANKS)) @ weights.T
+
+
+class TableResult:
+    """
+    Bankroll trajectories of every seat and statistics of the tables of a multi-seat simulation.
+
+    Attributes:
+        seats (list): Seat of every seat index
+        checkpoints (np.array): rounds that were recorded
+        balances (np.array): bankroll of every seat after each checkpoint, shape (repetitions, seats, checkpoints)
+        outcomes (np.array): wins, losses and draws of every seat's hands, shape (repetitions, seats, 3)
+        hands (np.array): hands settled by every seat, a split counts every hand, shape (repetitions, seats)
+        rounds (int): rounds dealt at every table
+        shoes (np.array): shoes started at every table
+        penetration (float): mean share of a shoe dealt before it was replaced, nan if no shoe was replaced
+
+    Methods:
+        seat_results: Returns the CheckpointResults of one seat.
+        rounds_per_hour: Returns the rounds dealt per hour from a simple dealing time model.
+        summary: Returns a DataFrame with one row per seat.
+    """
+
+    def __init__(self, seats, checkpoints, balances, outcomes, hands, rounds, shoes, penetration):
+        """Initialize a TableResult."""
+        self.seats = seats
+        self.checkpoints = checkpoints
+        self.balances = balances
+        self.outcomes = outcomes
+        self.hands = hands
+        self.rounds = rounds
+        self.shoes = shoes
+        self.penetration = penetration
+
+    def seat_results(self, seat):
+        """Returns the CheckpointResults of one seat index, its checkpoints count rounds rather than hands."""
+        return CheckpointResults(self.checkpoints, self.balances[:, seat], self.outcomes[:, seat])
+
+    def rounds_per_hour(self, seconds_per_round=SECONDS_PER_ROUND, seconds_per_hand=SECONDS_PER_HAND,
+                        seconds_per_shuffle=SECONDS_PER_SHUFFLE):
+        """Returns the rounds dealt per hour when every round, every hand and every shuffle takes the given time."""
+        hands_per_round = self.hands.sum(axis=1).mean() / self.rounds
+        shuffles_per_round = self.shoes.mean() / self.rounds
+        seconds = seconds_per_round + seconds_per_hand * hands_per_round + seconds_per_shuffle * shuffles_per_round
+        return 3600 / seconds
+
+    def summary(self):
+        """Returns a DataFrame with the results, outcome shares and pace of every seat."""
+        import pandas as pd
+
+        rounds_per_hour = self.rounds_per_hour()
+        starting = np.array([seat.starting_bankroll for seat in self.seats])
+        net = self.balances[:, :, -1] - starting
+        hands = self.hands.sum(axis=0)
+        shares = self.outcomes.sum(axis=0) / np.maximum(hands, 1)[:, None]
+        return pd.DataFrame({'Seat': [seat.name for seat in self.seats],
+                             'Spots': [seat.spots for seat in self.seats],
+                             'Counting': [seat.counting_strategy for seat in self.seats],
+                             'Mean Ending Balance': self.balances[:, :, -1].mean(axis=0),
+                             'Net per Round': net.mean(axis=0) / self.rounds,
+                             'Net per Hand': net.sum(axis=0) / np.maximum(hands, 1),
+                             'Win': shares[:, 0], 'Loss': shares[:, 1], 'Draw': shares[:, 2],
+                             'Hands per Hour': hands / (len(self.hands) * self.rounds) * rounds_per_hour})
+
+
+def simulate_table(seats, num_rounds, repetitions=1, rules=None, checkpoints=None, seed=None):
+    """
+    Simulates seats sharing a shoe and a dealer, many independent tables at once
+    Args:
+        seats (list): Seat of every seat, in dealing order
+        num_rounds (int): rounds dealt at every table
+        repetitions (int): number of independent tables
+        rules (TableRules, optional): table rules, DEFAULT_RULES if not given
+        checkpoints (list, optional): rounds after which to record every seat's bankroll, default_checkpoints if not
+            given
+        seed (int, optional): seed for the random generator
+    Returns:
+        TableResult: per seat bankroll trajectories and outcomes, with the shoes dealt and their penetration
+    """
+    table = compile_rules(rules or DEFAULT_RULES)
+    checkpoints = validate_checkpoints(default_checkpoints(num_rounds) if checkpoints is None else checkpoints,
+                                       num_rounds)
+    rng = np.random.default_rng(seed)
+    seat_of_spot = np.repeat(np.arange(len(seats)), [seat.spots for seat in seats])
+    spots = len(seat_of_spot)
+    tables = np.arange(repetitions)
+
+    # Every shoe is followed by a spare shuffled pack, dealt only by rounds that run past the reshuffle point
+    shoe_size = 52 * table.rules.decks
+    pack = np.repeat(np.arange(len(RANKS), dtype=np.int8), 4 * table.rules.decks)
+
+    def shuffled(rows):
+        return np.hstack([rng.permuted(np.tile(pack, (rows, 1)), axis=1) for _ in range(2)])
+
+    shoes = shuffled(repetitions)
+    position = np.zeros(repetitions, dtype=np.int64)
+    shoes_started = np.ones(repetitions, dtype=np.int64)
+    replaced, replaced_cards = 0, 0
+
+    weights = np.array([count_weights(seat.counting_strategy) for seat in seats])
+    counts = np.zeros((repetitions, len(seats)))
+    bankrolls = np.tile(np.array([seat.starting_bankroll for seat in seats], dtype=float), (repetitions, 1))
+    spots_per_seat = np.array([seat.spots for seat in seats])
+    balances = np.empty((repetitions, len(seats), len(checkpoints)))
+    outcomes = np.zeros((repetitions, len(seats), 3))
+    hands_settled = np.zeros((repetitions, len(seats)))
+
+    # One memo per distinct strategy, seats sharing a strategy share its answers
+    strategies = list({id(seat.strategy): seat.strategy for seat in seats}.values())
+    memos = [_Decisions(strategy) for strategy in strategies]
+    strategy_of_seat = np.array([[id(strategy) for strategy in strategies].index(id(seat.strategy)) for seat in seats])
+
+    def upcard_set(ranks):
+        return np.array([rank in ranks for rank in RANKS])
+
+    peek, insure = upcard_set(table.peek_upcards), upcard_set(table.insurance_upcards)
+    surrender, split_double = upcard_set(table.surrender_upcards), upcard_set(table.split_double_upcards)
+    resplit = np.append(upcard_set(table.resplit_ranks), False)
+    dealer_draws = np.array(table.dealer_draws)
+    returns = table.returns
+
+    def deal(tables_of_cards):
+        cards = _draw(shoes, position, tables_of_cards)
+        _count(counts, weights, tables_of_cards, cards)
+        return cards
+
+    def decide(kind, hands, upcards, index):
+        """Answers one kind of decision for the indexed hands, asking each seat's strategy about new classes only."""
+        answers = np.zeros(len(index), dtype=bool)
+        if not len(index):
+            return answers
+        count = counts[hands.table[index], hands.seat[index]]
+        upcard = upcards[hands.table[index]]
+        keys = np.zeros(len(index), dtype=np.int64) if kind == 'insurance' else hands.classes()[index] * len(RANKS) + upcard
+        keys = keys * (2 * COUNT_OFFSET) + (2 * count).astype(np.int64) + COUNT_OFFSET
+        strategy_of_hand = strategy_of_seat[hands.seat[index]]
+        for number, decisions in enumerate(memos):
+            mine = np.flatnonzero(strategy_of_hand == number)
+            if not len(mine):
+                continue
+            strategy = decisions.strategy
+            if kind == 'insurance':
+                ask = lambda position: strategy.should_insurance(count[mine[position]])
+            else:
+                method = {'split': strategy.should_split, 'surrender': strategy.should_surrender,
+                          'double': strategy.double_down, 'hit': strategy.hit_or_stand}[kind]
+                ask = lambda position: method(hands.hand(index[mine[position]]), Card(RANKS[upcard[mine[position]]]),
+                                              count[mine[position]])
+            answers[mine] = decisions.decide(kind, keys[mine], ask)
+        return answers
+
+    def settle(hands, index, multiples, outcome):
+        """Pays the indexed hands a multiple of their stake and records their outcome column."""
+        hands.settled[index] = True
+        at = (hands.table[index], hands.seat[index])
+        np.add.at(bankrolls, at, hands.stake[index] * multiples)
+        np.add.at(outcomes, at + (outcome,), 1)
+        np.add.at(hands_settled, at, 1)
+
+    next_checkpoint = 0
+    for round_number in range(1, num_rounds + 1):
+        spent = shoe_size - position < table.reshuffle_at
+        if spent.any():
+            replaced += int(spent.sum())
+            replaced_cards += int(np.minimum(position[spent], shoe_size).sum())
+            shoes[spent] = shuffled(int(spent.sum()))
+            position[spent] = 0
+            counts[spent] = 0
+            shoes_started[spent] += 1
+
+        # Bets are sized from the count before the cards are dealt
+        bets = np.empty((repetitions, len(seats)))
+        for number, seat in enumerate(seats):
+            bets[:, number] = seat.base_bet if seat.bet_ramp is None else \
+                seat.bet_ramp.bets(counts[:, number], np.maximum(shoe_size - position, 0), bankrolls[:, number])
+        bankrolls -= bets * spots_per_seat
+
+        # One card to every spot, the upcard, a second card to every spot, then the hole card
+        dealt = shoes[tables[:, None], position[:, None] + np.arange(2 * spots + 2)]
+        position += 2 * spots + 2
+        _count(counts, weights, np.repeat(tables, 2 * spots + 1), dealt[:, :-1].ravel())
+        upcards, hole = dealt[:, spots], dealt[:, -1]
+        hands = _TableHands(np.repeat(tables, spots), np.arange(repetitions * spots), np.tile(seat_of_spot, repetitions),
+                            dealt[:, :spots].ravel(), dealt[:, spots + 1:2 * spots + 1].ravel(),
+                            bets[:, seat_of_spot].ravel())
+        dealer_natural = ((upcards == ACE) & TEN_VALUED[hole]) | (TEN_VALUED[upcards] & (hole == ACE))
+
+        # Insurance pays 2:1 on the dealer's blackjack, a spot insures half its bet
+        offered = np.flatnonzero(insure[upcards[hands.table]])
+        insured = offered[decide('insurance', hands, upcards, offered)]
+        np.add.at(bankrolls, (hands.table[insured], hands.seat[insured]),
+                  hands.stake[insured] / 2 * (returns['insurance'] * dealer_natural[hands.table[insured]] - 1))
+
+        # A peeking dealer ends the round on a blackjack before anyone acts, a player blackjack pushes
+        peeked = peek[upcards] & dealer_natural
+        ended = np.flatnonzero(peeked[hands.table])
+        natural = hands.natural()[ended]
+        settle(hands, ended, np.where(natural, returns['push'], 0), np.where(natural, 2, 1))
+
+        # Split pairs, then deal the second card of every split hand, until no new pair is split
+        while True:
+            pair = hands.pair()
+            held = np.bincount(hands.spot, minlength=repetitions * spots)
+            candidates = np.flatnonzero(~hands.settled & (pair != NO_PAIR) & (held[hands.spot] < table.max_hands)
+                                        & (~hands.split | resplit[pair]))
+            chosen = candidates[decide('split', hands, upcards, candidates)]
+            # Hands of one spot split in turn while the spot has room for another hand
+            order = np.argsort(hands.spot[chosen], kind='stable')
+            chosen = chosen[order]
+            spot_of = hands.spot[chosen]
+            starts = np.flatnonzero(np.r_[True, spot_of[1:] != spot_of[:-1]]) if len(chosen) else np.empty(0, dtype=int)
+            turn = np.arange(len(chosen)) - np.repeat(starts, np.diff(np.r_[starts, len(chosen)]))
+            chosen = chosen[turn < table.max_hands - held[spot_of]]
+            if not len(chosen):
+                break
+            np.add.at(bankrolls, (hands.table[chosen], hands.seat[chosen]), -hands.stake[chosen])
+            hands.split_off(chosen)
+            single = np.flatnonzero(hands.length == 1)
+            hands.add(single, deal(hands.table[single]))
+
+        # Late surrender gives up half the bet of an unsplit hand
+        offered = np.flatnonzero(~hands.settled & ~hands.split & surrender[upcards[hands.table]])
+        surrendered = offered[decide('surrender', hands, upcards, offered)]
+        settle(hands, surrendered, returns['surrender'], 1)
+
+        # A doubled hand doubles its stake and takes exactly one card, split hands double only under the allowed upcards
+        offered = np.flatnonzero(~hands.settled & (~hands.split | split_double[upcards[hands.table]]))
+        doubled = offered[decide('double', hands, upcards, offered)]
+        np.add.at(bankrolls, (hands.table[doubled], hands.seat[doubled]), -hands.stake[doubled])
+        hands.stake[doubled] *= 2
+        hands.doubled[doubled] = True
+        hands.add(doubled, deal(hands.table[doubled]))
+
+        # Every hand still acting takes one card per step until it stands or reaches 21
+        stood = hands.settled | hands.doubled
+        while True:
+            acting = np.flatnonzero(~stood & (hands.value() < 21))
+            if not len(acting):
+                break
+            hit = decide('hit', hands, upcards, acting)
+            stood[acting[~hit]] = True
+            hitting = acting[hit]
+            hands.add(hitting, deal(hands.table[hitting]))
+
+        # The dealer draws from the draw table, the hole card and the draws are not counted
+        hard = RANK_VALUES[upcards].astype(np.int64) + RANK_VALUES[hole]
+        ace = (upcards == ACE) | (hole == ACE)
+        while True:
+            drawing = np.flatnonzero(~peeked & dealer_draws[hard, ace.astype(np.int64)])
+            if not len(drawing):
+                break
+            cards = _draw(shoes, position, drawing)
+            hard[drawing] += RANK_VALUES[cards]
+            ace[drawing] |= cards == ACE
+        dealer_value = np.where(ace & (hard + 10 <= 21), hard + 10, hard)
+
+        # Remaining hands are settled as _settle settles them, a natural pays even on a split hand
+        index = np.flatnonzero(~hands.settled)
+        value, dealer = hands.value()[index], dealer_value[hands.table[index]]
+        bust = value > 21
+        blackjack = ~bust & hands.natural()[index]
+        win = ~bust & ~blackjack & ((dealer > 21) | (value > dealer))
+        push = ~bust & ~blackjack & ~win & (value == dealer)
+        settle(hands, index, np.select([blackjack, win, push], [returns['blackjack'], returns['win'], returns['push']], 0),
+               np.select([blackjack | win, push], [0, 2], 1))
+
+        while next_checkpoint < len(checkpoints) and checkpoints[next_checkpoint] == round_number:
+            balances[:, :, next_checkpoint] = bankrolls
+            next_checkpoint += 1
+
+    penetration = replaced_cards / (replaced * shoe_size) if replaced else float('nan')
+    return TableResult(list(seats), checkpoints, balances, outcomes, hands_settled, num_rounds, shoes_started,
+                       penetration)
@@ -0,0 +1,150 @@
+import numpy as np
+
+"""
+Contains the summaries behind the interactive trajectory charts.
+
+Instead of drawing every simulated path, the paths are reduced to quantile bands plus a few highlighted sample paths,
+and every series is decimated to a bounded number of points. The size of a chart therefore depends on max_points and
+the number of highlighted paths only, not on the number of repetitions or plays simulated.
+"""
+
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets decimation of one series
+    Args:
+        x (np.array): increasing x values
+        y (np.array): y values
+        threshold (int): number of points to keep, at least 3
+    Returns:
+        np.array: sorted indices of the kept points, always including the first and the last
+    """
+    size = len(x)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Interior points split into threshold - 2 buckets, the end points are always kept
+    edges = np.linspace(1, size - 1, threshold - 1).astype(int)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, size - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # The third vertex is the average of the next bucket, or the last point for the final bucket
+        following = slice(stop, edges[bucket + 2]) if bucket + 2 < len(edges) else slice(size - 1, size)
+        average_x, average_y = x[following].mean(), y[following].mean()
+        area = np.abs((x[previous] - average_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (average_y - y[previous]))
+        previous = start + int(area.argmax())
+        kept[bucket + 1] = previous
+    return kept
+
+
+def minmax_indices(y, buckets):
+    """
+    Min/max decimation of one series
+    Args:
+        y (np.array): y values
+        buckets (int): number of buckets, each keeps its lowest and highest point
+    Returns:
+        np.array: sorted unique indices of the kept points, including the first and the last
+    """
+    size = len(y)
+    if 2 * buckets + 2 >= size:
+        return np.arange(size)
+    edges = np.linspace(0, size, buckets + 1).astype(int)
+    kept = [0, size - 1]
+    for start, stop in zip(edges[:-1], edges[1:]):
+        kept.append(start + int(np.argmin(y[start:stop])))
+        kept.append(start + int(np.argmax(y[start:stop])))
+    return np.unique(kept)
+
+
+def decimate(x, y, max_points, method='lttb'):
+    """Returns the indices of at most max_points points of a series chosen by 'lttb' or 'minmax'."""
+    if method == 'lttb':
+        return lttb(x, y, max_points)
+    if method == 'minmax':
+        return minmax_indices(y, max(1, (max_points - 2) // 2))
+    raise ValueError("method must be 'lttb' or 'minmax'")
+
+
+class TrajectorySummary:
+    """
+    Bounded size summary of many simulated paths.
+
+    Attributes:
+        x (np.array): x values of the decimated bands
+        quantiles (tuple): quantile levels of the band rows
+        bands (np.array): decimated quantile values, shape (quantiles, points)
+        sample_paths (list): (repetition, x, y) of every highlighted path, each decimated on its own
+        repetitions (int): number of paths summarized
+        trend (tuple): (slope, intercept) of a fitted trend line, None if there is none
+        mean_band (tuple): (lower, upper) confidence band of the mean path at x, None if there is none
+
+    Methods:
+        band_frame: Returns the bands as a wide DataFrame, one column per quantile.
+        path_frame: Returns the highlighted paths as a long DataFrame.
+    """
+
+    def __init__(self, x, quantiles, bands, sample_paths, repetitions, trend=None, mean_band=None):
+        """Initialize a TrajectorySummary."""
+        self.x = x
+        self.quantiles = quantiles
+        self.bands = bands
+        self.sample_paths = sample_paths
+        self.repetitions = repetitions
+        self.trend = trend
+        self.mean_band = mean_band
+
+    def band_frame(self):
+        """Returns the bands as a DataFrame with an 'x' column and one column per quantile named like 'q50'."""
+        import pandas as pd
+
+        frame = pd.DataFrame({'x': self.x})
+        for level, row in zip(self.quantiles, self.bands):
+            frame[f"q{round(level * 100)}"] = row
+        return frame
+
+    def path_frame(self):
+        """Returns the highlighted paths as a DataFrame with 'x', 'y' and 'path' columns."""
+        import pandas as pd
+
+        frames = [pd.DataFrame({'x': x, 'y': y, 'path': f"Run {repetition + 1}"}) for repetition, x, y in self.sample_paths]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['x', 'y', 'path'])
+
+
+def summarize_trajectories(x, paths, quantiles=DEFAULT_QUANTILES, samples=5, max_points=200, method='lttb', seed=None):
+    """
+    Reduces simulated paths to decimated quantile bands and a few highlighted paths
+    Args:
+        x (np.array): x value of every column of paths, e.g. the checkpoint play counts
+        paths (np.array): one simulated path per row, shape (repetitions, len(x))
+        quantiles (tuple): quantile levels of the bands, the middle one is drawn as a line
+        samples (int): number of paths to highlight, picked at random
+        max_points (int): points kept per series
+        method (str): 'lttb' or 'minmax' decimation
+        seed (int, optional): seed for picking the highlighted paths
+    Returns:
+        TrajectorySummary: bands and highlighted paths of bounded size
+    """
+    x = np.asarray(x)
+    paths = np.atleast_2d(paths)
+    bands = np.quantile(paths, quantiles, axis=0)
+
+    # Every band shares the points picked on the median so the areas between them line up
+    kept = decimate(x, bands[len(quantiles) // 2], max_points, method)
+
+    rng = np.random.default_rng(seed)
+    picked = np.sort(rng.choice(len(paths), size=min(samples, len(paths)), replace=False))
+    sample_paths = []
+    for repetition in picked:
+        path_kept = decimate(x, paths[repetition], max_points, method)
+        sample_paths.append((int(repetition), x[path_kept], paths[repetition, path_kept]))
+
+    return TrajectorySummary(x[kept], tuple(quantiles), bands[:, kept], sample_paths, len(paths))
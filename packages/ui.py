@@ -0,0 +1,382 @@
+import altair as alt
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from packages.simulation_service import SimulationService, ServiceBusy
+from packages.warm_cache import WarmBundle
+
+"""
+Contains the Streamlit layouts shared by the pages
+"""
+
+def roulette_plot(line_plot, frequency_plot, box_plot, stats_table):
+    """
+    Plots all the graphs for the roulette strategies
+    Args:
+        line_plot ('fig' object): Line plot information
+        frequency_plot ('fig' object): Frequency plot information
+        box_plot ('fig' object): Box plot information
+    Returns:
+        None
+    """
+    # Assigning statistical data
+
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        st.pyplot(line_plot, use_container_width=True)
+        tooltip_css1 = """
+        .tooltip1 {
+        position: relative;
+        display: block;
+        }
+
+        .tooltip1::after {
+        content: "This graph is a scatterplot that reveals various ending balances that occured in samples with the corresponding number of plays";
+        position: absolute;
+        bottom: 100%;
+        left: 50%;
+        transform: translateX(-50%);
+        background-color: #333;
+        color: #fff;
+        padding: 5px;
+        border-radius: 5px;
+        font-size: 12px;
+        opacity: 0;
+        visibility: hidden;
+        transition: opacity 0.2s, visibility 0.2s;
+        }
+
+        .tooltip1:hover::after {
+        opacity: 1;
+        visibility: visible;
+        }
+        """
+
+        # Add the CSS to the Streamlit app
+        st.markdown(f'<style>{tooltip_css1}</style>', unsafe_allow_html=True)
+
+        # Add the tooltip-like element
+        st.markdown('<div class="tooltip1">Info</div>', unsafe_allow_html=True)
+    with col2:
+        st.pyplot(frequency_plot, use_container_width=True)
+        tooltip_css2 = """
+        .tooltip2 {
+        position: relative;
+        display: block;
+        }
+
+        .tooltip2::after {
+        content: "This graph is a histogram that displays the frequency of each ending balance amount of the sample repititions";
+        position: absolute;
+        bottom: 100%;
+        left: 50%;
+        transform: translateX(-50%);
+        background-color: #333;
+        color: #fff;
+        padding: 5px;
+        border-radius: 5px;
+        font-size: 12px;
+        opacity: 0;
+        visibility: hidden;
+        transition: opacity 0.2s, visibility 0.2s;
+        }
+
+        .tooltip2:hover::after {
+        opacity: 1;
+        visibility: visible;
+        }
+        """
+
+        # Add the CSS to the Streamlit app
+        st.markdown(f'<style>{tooltip_css2}</style>', unsafe_allow_html=True)
+
+        # Add the tooltip-like element
+        st.markdown('<div class="tooltip2">Info</div>', unsafe_allow_html=True)
+    col3, col4 = st.columns([1, 1])
+    with col3:
+        st.pyplot(box_plot, use_container_width=True)
+        tooltip_css3 = """
+        .tooltip3 {
+        position: relative;
+        display: block;
+        }
+
+        .tooltip3::after {
+        content: "This graph is a box and whisker plot that denotes the descriptive statistics of all samples in one run of the algorithm based on parameters set by the user.";
+        position: absolute;
+        bottom: 100%;
+        left: 50%;
+        transform: translateX(-50%);
+        background-color: #333;
+        color: #fff;
+        padding: 5px;
+        border-radius: 5px;
+        font-size: 12px;
+        opacity: 0;
+        visibility: hidden;
+        transition: opacity 0.2s, visibility 0.2s;
+        }
+
+        .tooltip3:hover::after {
+        opacity: 1;
+        visibility: visible;
+        }
+        """
+
+        # Add the CSS to the Streamlit app
+        st.markdown(f'<style>{tooltip_css3}</style>', unsafe_allow_html=True)
+
+        # Add the tooltip-like element
+        st.markdown('<div class="tooltip3">Info</div>', unsafe_allow_html=True)       
+    with col4:
+        st.markdown(stats_table, unsafe_allow_html=True)
+
+
+def trajectory_chart(summary, title, x_label, y_label):
+    """
+    Draws a TrajectorySummary as an interactive chart: shaded quantile bands, the median, the highlighted paths, and
+    the confidence band of the mean and the trend line if the summary has them
+    Args:
+        summary (TrajectorySummary): decimated bands and paths
+        title (string): chart title
+        x_label (string): x axis title
+        y_label (string): y axis title
+    Returns:
+        None
+    """
+    bands = summary.band_frame()
+    columns = [column for column in bands.columns if column != 'x']
+    x = alt.X('x:Q', title=x_label)
+
+    layers = []
+    # Nested bands from the outermost pair of quantiles inwards, each one darker
+    for depth in range(len(columns) // 2):
+        lower, upper = columns[depth], columns[-1 - depth]
+        layers.append(alt.Chart(bands).mark_area(opacity=0.15 + 0.15 * depth, color='white').encode(
+            x=x, y=alt.Y(f'{lower}:Q', title=y_label), y2=f'{upper}:Q',
+            tooltip=['x', lower, upper]))
+    median = columns[len(columns) // 2]
+    layers.append(alt.Chart(bands).mark_line(color='white').encode(x=x, y=f'{median}:Q', tooltip=['x', median]))
+
+    layers.append(alt.Chart(summary.path_frame()).mark_line(strokeWidth=1, opacity=0.8).encode(
+        x=x, y='y:Q', color=alt.Color('path:N', legend=None), tooltip=['path', 'x', 'y']))
+
+    if summary.mean_band is not None:
+        lower, upper = summary.mean_band
+        band = bands[['x']].assign(lower=lower, upper=upper)
+        layers.append(alt.Chart(band).mark_area(opacity=0.35, color='red').encode(
+            x=x, y='lower:Q', y2='upper:Q', tooltip=['x', 'lower', 'upper']))
+
+    if summary.trend is not None:
+        slope, intercept = summary.trend
+        trend = bands[['x']].assign(trend=slope * bands['x'] + intercept)
+        layers.append(alt.Chart(trend).mark_line(color='red', strokeDash=[6, 4]).encode(x=x, y='trend:Q'))
+
+    chart = alt.layer(*layers).properties(
+        title=title, height=400).interactive()
+    st.altair_chart(chart, use_container_width=True)
+
+
+def stopping_plot(stopping_time_plot, stop_reason_plot, path_stats_table):
+    """
+    Plots the stopping time and path statistics of the roulette strategies
+    Args:
+        stopping_time_plot ('fig' object): Stopping time histogram
+        stop_reason_plot ('fig' object): Stop reason bar chart
+        path_stats_table (string): Path statistics table
+    Returns:
+        None
+    """
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        st.pyplot(stopping_time_plot, use_container_width=True)
+    with col2:
+        st.pyplot(stop_reason_plot, use_container_width=True)
+    st.markdown(path_stats_table, unsafe_allow_html=True)
+
+
+@st.cache_resource
+def simulation_service():
+    """Returns the simulation service shared by every session of this server."""
+    return SimulationService()
+
+
+@st.cache_resource
+def warm_bundle():
+    """Returns the precomputed page defaults of this server, rebuilding them in the background if they are stale."""
+    bundle = WarmBundle()
+    bundle.warm_up()
+    return bundle
+
+
+def precomputed(name, **parameters):
+    """Returns the warm-up result of a scenario (see packages/warm_cache.py), or None if it was not precomputed."""
+    return warm_bundle().get(name, **parameters)
+
+
+def run_simulation(function, *args, **kwargs):
+    """
+    Runs a simulation on the shared simulation service on behalf of the current session
+    Args:
+        function (function): simulation to run, called as function(*args, **kwargs)
+    Returns:
+        the result of the simulation, or stops the script with a warning if the service is busy
+    """
+    context = get_script_run_ctx()
+    session_id = context.session_id if context is not None else 'local'
+    try:
+        return simulation_service().run(session_id, function, *args, **kwargs)
+    except ServiceBusy as busy:
+        st.warning(f"The simulator is busy right now: {busy}.")
+        st.stop()
+
+
+def session_run(name, parameters, num_plays, start):
+    """
+    Returns the resumable run this session keeps for a chart, so that slider changes grow it instead of starting over
+    Args:
+        name (string): slot of the run, one per chart
+        parameters (tuple): every setting other than the repetitions and the number of plays
+        num_plays (int): number of plays about to be requested
+        start (function): returns a new empty ProgressionRun or BlackjackRun
+    Returns:
+        the stored run, or a new one when the parameters changed or the number of plays went down
+    """
+    stored = st.session_state.get(('session_run', name))
+    if stored is None or stored[0] != parameters or num_plays < stored[1].num_plays:
+        stored = (parameters, start())
+        st.session_state[('session_run', name)] = stored
+    return stored[1]
+
+
+def grid_heatmaps(grid, x_label, y_label):
+    """
+    Draws the three statistics of a GridResult as interactive heatmaps side by side
+    Args:
+        grid (GridResult): statistics of every configuration of a parameter grid
+        x_label (string): x axis title
+        y_label (string): y axis title
+    Returns:
+        None
+    """
+    frame = grid.frame()
+    # Axis values are shown as ordered categories, so every configuration gets a cell of the same size
+    x = alt.X(f'{grid.x_name}:O', title=x_label, sort=list(grid.x_values))
+    y = alt.Y(f'{grid.y_name}:O', title=y_label, sort=list(grid.y_values)[::-1])
+    statistics = [('Mean Ending Balance', 'redyellowgreen', ',.2f'), ('Probability of Profit', 'greens', '.1%'),
+                  ('Probability of Ruin', 'reds', '.1%')]
+    for column, (statistic, scheme, number_format) in zip(st.columns(len(statistics)), statistics):
+        with column:
+            chart = alt.Chart(frame).mark_rect().encode(
+                x=x, y=y, color=alt.Color(f'{statistic}:Q', scale=alt.Scale(scheme=scheme), legend=alt.Legend(format=number_format)),
+                tooltip=[grid.x_name, grid.y_name, alt.Tooltip(f'{statistic}:Q', format=number_format)],
+            ).properties(title=statistic, height=400)
+            st.altair_chart(chart, use_container_width=True)
+
+
+@st.cache_data(show_spinner="Solving for the best target and floor...")
+def _solve_stop_rules(_progression, name, initial_balance, initial_bet, preference, num_plays, objective, parameter):
+    """Cached stop rule solution of one progression and objective, keyed by the progression's name."""
+    from packages.stop_rules import solve_stop_rules, goal_utility, crra_utility
+
+    utility = goal_utility(parameter) if objective == 'goal' else crra_utility(parameter)
+    return solve_stop_rules(_progression, initial_balance, initial_bet, preference, num_plays, utility)
+
+
+def stop_rule_panel(progression, initial_balance, initial_bet, preference, num_plays):
+    """
+    Solves, once asked to, for the target and floor that best serve an objective and shows the exact outcomes they lead to
+    Args:
+        progression (CompiledProgression): progression of the page
+        initial_balance (int): starting amount
+        initial_bet (int): base bet the progression builds on
+        preference (string): colour bet on
+        num_plays (int): maximum number of spins
+    Returns:
+        None
+    """
+    with st.expander("Optimal target and floor"):
+        st.write("Instead of guessing the stop rules, the best target and floor are solved for by dynamic programming \
+                 over every state the progression can reach, which also gives the exact distribution of the outcome.")
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            objective = st.selectbox("Objective", ('Reach a goal', 'Expected utility'), key=f'{progression.name} objective')
+            if objective == 'Reach a goal':
+                parameter = st.slider("Goal balance", min_value=initial_balance + 10, max_value=max(5000, initial_balance + 10),
+                                      value=min(initial_balance + max(10, 5 * initial_bet), 5000), step=10,
+                                      key=f'{progression.name} goal',
+                                      help="Maximise the probability of ending at or above this balance")
+            else:
+                parameter = st.slider("Risk aversion", min_value=-2.0, max_value=2.0, value=1.0, step=0.5,
+                                      key=f'{progression.name} risk aversion',
+                                      help="0 maximises the expected balance, 1 the expected log balance, negative values seek risk")
+            # An expander's body runs even when collapsed, the solve takes seconds at many plays and small bets
+            solve = st.checkbox("Solve for these settings", key=f'{progression.name} solve',
+                                help="Keep checked to solve again whenever the settings change")
+        if not solve:
+            return
+        solution = _solve_stop_rules(progression, progression.name, initial_balance, initial_bet, preference, num_plays,
+                                     'goal' if objective == 'Reach a goal' else 'utility', parameter)
+        distribution = solution.distribution
+        with col2:
+            target = 'none' if solution.target_balance is None else f"${solution.target_balance:,.0f}"
+            st.write(f"**Best target:** {target} &nbsp; **Best floor:** ${solution.floor_balance:,.0f}")
+            st.write(f"Objective: {solution.value:.4g} with these stop rules, {solution.optimal_value:.4g} for the best "
+                     f"policy that may stop anywhere, {solution.no_play_value:.4g} for not playing at all.")
+            if objective == 'Reach a goal' and solution.optimal_value == 0:
+                st.write("The goal cannot be reached within the number of plays.")
+            elif solution.no_play_value >= solution.value:
+                st.write("Not playing at all serves this objective at least as well as any target and floor.")
+            st.write(f"Expected ending balance ${distribution.mean():,.2f}, expected spins {distribution.expected_plays:.1f}, "
+                     + ", ".join(f"{reason.replace('_', ' ')} {share:.1%}" for reason, share in distribution.stop_reasons.items()))
+        chart = alt.Chart(distribution.frame()).mark_bar().encode(
+            x=alt.X('Balance:Q', title='Ending Balance ($USD)'), y=alt.Y('Probability:Q', axis=alt.Axis(format='.1%')),
+            tooltip=['Balance', alt.Tooltip('Probability:Q', format='.4%')],
+        ).properties(title="Exact distribution of the ending balance", height=300)
+        st.altair_chart(chart, use_container_width=True)
+
+
+def large_sample_panel(progression, initial_balance, initial_bet, preference, num_plays, target_balance, floor_balance):
+    """
+    Plays, once asked to, millions of repetitions in cache sized chunks and shows the summary statistics they stream into
+    Args:
+        progression (CompiledProgression): progression of the page
+        initial_balance (int): starting amount
+        initial_bet (int): base bet the progression builds on
+        preference (string): colour bet on
+        num_plays (int): maximum number of spins
+        target_balance (int, optional): stop once the balance reaches or exceeds this value
+        floor_balance (int): stop once the balance falls to or below this value
+    Returns:
+        None
+    """
+    from packages.chunked import progression_summary
+    from packages.progressions import STOP_REASONS
+
+    with st.expander("Millions of repetitions"):
+        st.write("The charts above keep every repetition's path. Here the repetitions run in chunks small enough to \
+                 stay in cache, and each chunk is reduced to summary statistics as soon as it finishes, so memory stays \
+                 flat however many repetitions are asked for.")
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            repeats = st.select_slider("Repetitions", options=[100_000, 1_000_000, 5_000_000, 10_000_000],
+                                       value=1_000_000, format_func=lambda value: f"{value:,}",
+                                       key=f'{progression.name} large repetitions')
+            # An expander's body runs even when collapsed, millions of repetitions take seconds
+            run = st.checkbox("Run these repetitions", key=f'{progression.name} large run',
+                              help="Keep checked to run again whenever the settings change")
+        if not run:
+            return
+        balances, plays, stop_reasons = run_simulation(progression_summary, progression, repeats, initial_balance,
+                                                       num_plays, initial_bet, preference, target_balance,
+                                                       floor_balance)
+        with col2:
+            st.write(f"Mean ending balance ${balances.mean():,.2f} (standard deviation ${balances.std():,.2f}), "
+                     f"mean spins {plays.mean():.1f}, ending at or above the initial balance "
+                     f"{balances.share_at_least(initial_balance):.1%}.")
+            st.write(", ".join(f"{reason.replace('_', ' ')} {count / repeats:.1%}"
+                               for reason, count in zip(STOP_REASONS, stop_reasons)))
+        columns = st.columns(4)
+        for column, (label, q) in zip(columns, [("5th Percentile", 0.05), ("25th Percentile", 0.25), ("Median", 0.5),
+                                                ("95th Percentile", 0.95)]):
+            column.metric(label, f"${balances.quantile(q):,.2f}")
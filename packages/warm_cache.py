@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import pickle
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from packages.parameter_grid import blackjack_grid
+from packages.risk_analytics import hand_statistics, monte_carlo_ruin
+
+"""
+Contains the bundle of precomputed results for the default settings of the pages, and the warm-up that builds it.
+
+A scenario is a named simulation with plain parameters, e.g. the hand statistics of one counting system. The warm-up
+runs every scenario of the page defaults, plus the popular parameter sets listed in data/warm_scenarios.json, and
+stores the results in one file stamped with the code version, a hash of the simulation modules' source. Pages ask
+the bundle first and only simulate on a miss, so the first visitor to a page is served straight away. A bundle of
+another code version is never read: once the code changes, the server rebuilds it in a background process.
+
+Build the bundle ahead of time, e.g. while building the app image, with:
+
+    python -m packages.warm_cache
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DIR = os.path.join(ROOT, 'packages')
+BUNDLE_PATH = os.path.join(ROOT, 'data', 'warm_cache', 'bundle.pkl')
+SCENARIO_FILE = os.path.join(ROOT, 'data', 'warm_scenarios.json')
+
+# Modules that only draw or lay out results, changing them does not change what the simulations return
+PRESENTATION_MODULES = ('graphs.py', 'ui.py')
+
+# A warm-up lock older than this is left over from a process that died and is ignored
+LOCK_TIMEOUT = 3600
+
+
+def code_version(source_dir=SOURCE_DIR):
+    """Returns a short hash of the source of every simulation module, which changes whenever any of them does."""
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(source_dir)):
+        if name.endswith('.py') and name not in PRESENTATION_MODULES:
+            digest.update(name.encode())
+            with open(os.path.join(source_dir, name), 'rb') as source:
+                digest.update(source.read())
+    return digest.hexdigest()[:16]
+
+
+def _trajectories(num_plays, starting_bankroll, base_bet, repetitions, counting_strategy):
+    """Strategy Explorer trajectories with basic strategy, flat bets and the default rules."""
+    # The chart helpers live next to the plots, imported here so the core stays free of matplotlib
+    from packages.blackjack_graphs import blackjack_trajectories
+
+    return blackjack_trajectories(num_plays, starting_bankroll, base_bet, repetitions, counting_strategy)
+
+
+def _hand_statistics(counting_strategy, num_hands):
+    """Risk of Ruin hand statistics of one counting system."""
+    return hand_statistics(counting_strategy, num_hands, seed=0)
+
+
+def _ruin_check(counting_strategy, num_hands, bankroll, bet, hands, target):
+    """Risk of Ruin Monte Carlo check of one counting system."""
+    return monte_carlo_ruin(hand_statistics(counting_strategy, num_hands, seed=0), bankroll, bet, hands, paths=10000,
+                            target=target, seed=0)
+
+
+def _blackjack_grid(counting_strategy, num_plays, repetitions, max_bet, max_bankroll):
+    """Risk of Ruin bet and bankroll grid, 20 bets by 20 bankrolls."""
+    return blackjack_grid(num_plays, repetitions, counting_strategy, np.linspace(max_bet / 20, max_bet, 20).round(),
+                          np.linspace(max_bankroll / 20, max_bankroll, 20).round())
+
+
+# Scenarios the pages can look up, by name
+SCENARIOS = {
+    'trajectories': _trajectories,
+    'hand_statistics': _hand_statistics,
+    'ruin_check': _ruin_check,
+    'blackjack_grid': _blackjack_grid,
+}
+
+# Slider defaults of the pages, kept in step with the pages. The roulette pages are left out: their default runs
+# take milliseconds, well below the cost of drawing them
+DEFAULT_SCENARIOS = [
+    ('trajectories', {'num_plays': 200, 'starting_bankroll': 0, 'base_bet': 10, 'repetitions': 100,
+                      'counting_strategy': 'high_low'}),
+    ('hand_statistics', {'counting_strategy': 'high_low', 'num_hands': 50_000}),
+    ('hand_statistics', {'counting_strategy': 'zen', 'num_hands': 50_000}),
+    ('hand_statistics', {'counting_strategy': 'halves', 'num_hands': 50_000}),
+    ('ruin_check', {'counting_strategy': 'high_low', 'num_hands': 50_000, 'bankroll': 1000, 'bet': 10, 'hands': 10000,
+                    'target': None}),
+    ('blackjack_grid', {'counting_strategy': 'high_low', 'num_plays': 500, 'repetitions': 200, 'max_bet': 100,
+                        'max_bankroll': 2000}),
+]
+
+
+def scenario_key(name, parameters):
+    """Returns the lookup key of a scenario, independent of the order the parameters are given in."""
+    return f"{name}|{json.dumps(parameters, sort_keys=True)}"
+
+
+def load_scenarios(path=SCENARIO_FILE):
+    """
+    Returns the page default scenarios followed by the popular ones listed in a JSON file
+    Args:
+        path (string): JSON list of {"scenario": name, "parameters": {...}} objects, skipped if it does not exist
+    Returns:
+        list: (name, parameters) of every scenario, without duplicates
+    """
+    scenarios = list(DEFAULT_SCENARIOS)
+    if os.path.exists(path):
+        with open(path) as listing:
+            for entry in json.load(listing):
+                if entry['scenario'] not in SCENARIOS:
+                    raise ValueError(f"{path}: unknown scenario {entry['scenario']!r}, one of {', '.join(SCENARIOS)}")
+                scenarios.append((entry['scenario'], entry['parameters']))
+    unique = {scenario_key(name, parameters): (name, parameters) for name, parameters in scenarios}
+    return list(unique.values())
+
+
+def build_bundle(scenarios, path=BUNDLE_PATH, version=None, log=None):
+    """
+    Runs every scenario and stores the results, stamped with the code version, in one file
+    Args:
+        scenarios (list): (name, parameters) of the scenarios to run
+        path (string): bundle file, replaced at once when every scenario has run
+        version (string, optional): code version to stamp, the current one by default
+        log (function, optional): called with a line of progress after every scenario
+    Returns:
+        dict: seconds each scenario took, by key, failed scenarios are left out of the bundle
+    """
+    version = version or code_version()
+    results, seconds = {}, {}
+    for name, parameters in scenarios:
+        key = scenario_key(name, parameters)
+        start = time.perf_counter()
+        try:
+            results[key] = SCENARIOS[name](**parameters)
+        except Exception as error:
+            if log:
+                log(f"failed {key}: {type(error).__name__}: {error}")
+            continue
+        seconds[key] = time.perf_counter() - start
+        if log:
+            log(f"{seconds[key]:7.2f} s  {key}")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as bundle:
+        pickle.dump({'version': version, 'results': results}, bundle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+    return seconds
+
+
+class WarmBundle:
+    """
+    Precomputed scenario results of the running code version, reread whenever the bundle file is replaced.
+
+    Attributes:
+        path (str): bundle file
+        version (str): code version a bundle must be stamped with to be used
+        stored_version (str): code version of the bundle on disk, None if there is none
+        results (dict): precomputed results by scenario key, empty while no current bundle exists
+
+    Methods:
+        get: Returns the precomputed result of a scenario, or None.
+        current: Returns whether the bundle on disk was built by the running code version.
+        warm_up: Starts a background process rebuilding the bundle if it is missing or stale.
+    """
+
+    def __init__(self, path=BUNDLE_PATH, version=None, recheck=5.0):
+        """Initialize the bundle of a code version, the current one by default, and read it if it exists."""
+        self.path = path
+        self.version = version or code_version()
+        self.stored_version = None
+        self.results = {}
+        self._recheck = recheck
+        self._checked = 0.0
+        self._stamp = None
+        self._refresh()
+
+    def get(self, name, **parameters):
+        """Returns the precomputed result of a scenario, or None when the bundle does not hold it."""
+        self._refresh()
+        return self.results.get(scenario_key(name, parameters))
+
+    def current(self):
+        """Returns whether the bundle on disk was built by the running code version."""
+        self._refresh()
+        return self.stored_version == self.version
+
+    def warm_up(self, scenario_file=SCENARIO_FILE):
+        """
+        Starts a low priority background process that rebuilds the bundle, unless it is current or already being
+        rebuilt
+        Returns:
+            bool: whether a process was started
+        """
+        if self.current():
+            return False
+        lock = f"{self.path}.lock"
+        os.makedirs(os.path.dirname(lock), exist_ok=True)
+        if os.path.exists(lock) and time.time() - os.path.getmtime(lock) > LOCK_TIMEOUT:
+            os.remove(lock)
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        try:
+            subprocess.Popen([sys.executable, '-m', 'packages.warm_cache', '--path', self.path, '--scenarios',
+                              scenario_file, '--lock', lock], cwd=ROOT, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL, start_new_session=True)
+        except OSError:
+            os.remove(lock)
+            return False
+        return True
+
+    def _refresh(self):
+        """Rereads the bundle file when it was replaced since the last read, at most every recheck seconds."""
+        now = time.monotonic()
+        if self._checked and now - self._checked < self._recheck:
+            return
+        self._checked = now
+        try:
+            stamp = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self.stored_version, self.results, self._stamp = None, {}, None
+            return
+        if stamp == self._stamp:
+            return
+        self._stamp = stamp
+        try:
+            with open(self.path, 'rb') as bundle:
+                stored = pickle.load(bundle)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Results pickled by code that has since changed may no longer load
+            stored = {}
+        self.stored_version = stored.get('version')
+        self.results = stored.get('results', {}) if self.stored_version == self.version else {}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precomputes the default page scenarios for the running code version")
+    parser.add_argument('--path', default=BUNDLE_PATH)
+    parser.add_argument('--scenarios', default=SCENARIO_FILE, help='JSON list of further popular scenarios')
+    parser.add_argument('--if-stale', action='store_true', help='only build when no current bundle exists')
+    parser.add_argument('--lock', help='lock file to remove once done, held by the server that started the build')
+    args = parser.parse_args()
+
+    try:
+        if hasattr(os, 'nice') and args.lock:
+            # Started by a running server, which should keep serving visitors first
+            os.nice(10)
+        version = code_version()
+        if args.if_stale and WarmBundle(args.path, version).current():
+            print(f"The bundle of code version {version} is current")
+            return
+        start = time.perf_counter()
+        seconds = build_bundle(load_scenarios(args.scenarios), args.path, version, log=print)
+        print(f"Stored {len(seconds)} scenarios for code version {version} in {time.perf_counter() - start:.1f} s")
+    finally:
+        if args.lock and os.path.exists(args.lock):
+            os.remove(args.lock)
+
+
+if __name__ == '__main__':
+    main()
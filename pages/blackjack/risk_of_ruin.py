@@ -0,0 +1,129 @@
+import streamlit as st
+from st_pages import add_page_title
+import pandas as pd
+import numpy as np
+
+from packages.risk_analytics import hand_statistics, win_rate_per_100, std_per_100, n0, score, risk_of_ruin, bankroll_for_risk, monte_carlo_ruin
+from packages.parameter_grid import blackjack_grid
+from packages.ui import grid_heatmaps, precomputed
+
+# Setting page configuration
+st.set_page_config(
+    page_title="Risk of Ruin",
+    page_icon=":chart_with_downwards_trend:",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+# Add page to list of pages
+add_page_title()
+
+strategies = {'High Low': 'high_low', 'Zen': 'zen', 'Halves': 'halves'}
+
+col1, col2 = st.columns([1,1])
+
+with col1:
+    st.write("Balance paths show what happened in a few simulations, but planning a bankroll needs a different question answered: \
+             how much money is needed so that the chance of going broke stays acceptable? For each counting strategy we measure \
+             the result of a hand with the same simulator as the Strategy Explorer, then derive the standard metrics:")
+    st.text("Win rate and standard deviation per 100 hands")
+    st.text("N0: hands needed for the expected win to equal one standard deviation")
+    st.text("SCORE: win rate per 100 hands with a $10,000 bankroll at Kelly bets")
+    st.text("Risk of ruin: chance of losing the whole bankroll")
+    st.write("Risk of ruin uses the diffusion approximation, and a Monte Carlo check replays measured hands along many \
+             bankroll paths that stop as soon as they go broke or reach the target.")
+
+with col2:
+    with st.form(key='risk'):
+        bet = st.slider("Bet Size", min_value=1, max_value=1000, value=10, step=1, help="Flat bet per hand")
+        bankroll = st.slider("Bankroll", min_value=10, max_value=100000, value=1000, step=10, help="Starting bankroll")
+        horizon = st.slider("Hands", min_value=100, max_value=100000, value=10000, step=100, help="Number of hands to play")
+        target_risk = st.slider("Acceptable Risk of Ruin (%)", min_value=0.1, max_value=50.0, value=5.0, step=0.1)
+        target = st.slider("Target Bankroll", min_value=0, max_value=200000, value=0, step=100, help="Optional: stop once the bankroll reaches this value. Leave as 0 for no target.")
+        strategy_name = st.selectbox('Strategy for the Monte Carlo check', tuple(strategies))
+        measured_hands = st.select_slider("Hands measured per strategy", options=[10_000, 50_000, 200_000], value=50_000)
+        st.form_submit_button(label="Calculate")
+
+
+@st.cache_data(show_spinner="Measuring hand results...")
+def cached_hand_statistics(counting_strategy, num_hands):
+    stats = precomputed('hand_statistics', counting_strategy=counting_strategy, num_hands=num_hands)
+    return stats if stats is not None else hand_statistics(counting_strategy, num_hands, seed=0)
+
+
+@st.cache_data(show_spinner="Replaying bankroll paths...")
+def cached_ruin_check(counting_strategy, num_hands, bankroll, bet, hands, target):
+    check = precomputed('ruin_check', counting_strategy=counting_strategy, num_hands=num_hands, bankroll=bankroll,
+                        bet=bet, hands=hands, target=target)
+    if check is None:
+        check = monte_carlo_ruin(cached_hand_statistics(counting_strategy, num_hands), bankroll, bet, hands,
+                                 paths=10000, target=target, seed=0)
+    return check
+
+
+rows = []
+for name, counting_strategy in strategies.items():
+    stats = cached_hand_statistics(counting_strategy, measured_hands)
+    rows.append({
+        'Strategy': name,
+        'Win Rate / 100 Hands': round(win_rate_per_100(stats, bet), 2),
+        'SD / 100 Hands': round(std_per_100(stats, bet), 2),
+        'N0 (Hands)': round(n0(stats)),
+        'SCORE': round(score(stats), 2),
+        'Risk of Ruin (Forever)': f"{risk_of_ruin(stats, bankroll, bet) * 100:.2f}%",
+        f'Risk of Ruin ({horizon} Hands)': f"{risk_of_ruin(stats, bankroll, bet, horizon) * 100:.2f}%",
+        f'Bankroll for {target_risk}% Risk': round(bankroll_for_risk(stats, bet, target_risk / 100), 2),
+    })
+
+# Subheader above table
+st.markdown(
+    """
+    <style>
+    .custom-subheader {
+        text-align: center; 
+        font-family: monospace
+    }
+    </style>
+    """,
+    unsafe_allow_html=True,)
+st.markdown('<h2 class="custom-subheader">Bankroll Metrics</h2>', unsafe_allow_html=True)
+st.dataframe(pd.DataFrame(rows), hide_index=True)
+
+st.divider()
+
+check = cached_ruin_check(strategies[strategy_name], measured_hands, bankroll, bet, horizon, target or None)
+
+st.subheader(f'Monte Carlo Check: {strategy_name}')
+col3, col4, col5, col6 = st.columns(4)
+col3.metric("Ruined", f"{check.ruined * 100:.2f}%")
+col4.metric("Reached Target", f"{check.reached_target * 100:.2f}%")
+col5.metric("Still Playing", f"{check.unfinished * 100:.2f}%")
+col6.metric("Average Hands Played", f"{check.mean_hands:.0f}")
+
+st.divider()
+
+st.subheader(f'Bet and Bankroll Grid: {strategy_name}')
+st.write("With flat bets every balance path is the starting bankroll plus the bet times the result in betting units, so one \
+         simulation of the Strategy Explorer's game covers a whole grid of bets and bankrolls. Ruin here means the bankroll \
+         touching zero at any point of the run.")
+
+
+@st.cache_data(show_spinner="Simulating the grid...")
+def cached_blackjack_grid(counting_strategy, num_plays, repetitions, max_bet, max_bankroll):
+    grid = precomputed('blackjack_grid', counting_strategy=counting_strategy, num_plays=num_plays,
+                       repetitions=repetitions, max_bet=max_bet, max_bankroll=max_bankroll)
+    if grid is not None:
+        return grid
+    return blackjack_grid(num_plays, repetitions, counting_strategy, np.linspace(max_bet / 20, max_bet, 20).round(),
+                          np.linspace(max_bankroll / 20, max_bankroll, 20).round())
+
+
+with st.form(key='blackjack_grid'):
+    grid_plays = st.slider("Number of Plays", min_value=50, max_value=1000, value=500, step=50)
+    grid_repetitions = st.slider("Sample repetitions", min_value=50, max_value=500, value=200, step=50)
+    grid_max_bet = st.slider("Largest Bet", min_value=20, max_value=1000, value=100, step=20)
+    grid_max_bankroll = st.slider("Largest Bankroll", min_value=200, max_value=20000, value=2000, step=200)
+    st.form_submit_button(label="Simulate Grid")
+
+grid = cached_blackjack_grid(strategies[strategy_name], grid_plays, grid_repetitions, grid_max_bet, grid_max_bankroll)
+grid_heatmaps(grid, "Base Bet", "Starting Bankroll")
@@ -1,11 +1,21 @@
+import os
+
 import streamlit as st
 from st_pages import add_page_title
 
-from packages.blackjack_logic import blackjack_simulator, blackjack_lineplot, blackjack_barchart, blackjack_distribution, regressor
+from packages.blackjack_logic import BASIC_STRATEGY, DEFAULT_RULES, BlackjackRun, TableRules
+from packages.blackjack_graphs import blackjack_trajectories, blackjack_barchart, blackjack_distribution, blackjack_count_ev
+from packages.chunked import blackjack_summary
+from packages.count_index import rules_index, BetRamp
+from packages.ev_model import EVModel
+from packages.infinite_deck import infinite_deck_ev
+from packages.memory_planner import plan_blackjack
+from packages.shoe_replay import ShoeRecord, Variant, replay
+from packages.strategy_generator import load_chart
+from packages.table_simulation import Seat, simulate_table
+from packages.ui import trajectory_chart, run_simulation, session_run, precomputed
 
-import random
 import pandas as pd
-import matplotlib.pyplot as plt 
 import numpy as np
 
 
@@ -57,19 +67,105 @@ with col2:
                 strategy_options = "zen"
             if strategy_options == 'Halves':
                 strategy_options = "halves"
+            playing = st.selectbox('Playing decisions', ('Hand-coded chart', 'Generated for these rules'),
+                                   help="The generated chart and its count indexes are derived from the table rules below")
+            bet_sizing = st.selectbox('Bet sizing', ('Flat', 'Count spread', 'Half Kelly'), help="Size each bet from the true count with the precomputed EV index")
+            with st.expander("Table rules"):
+                decks = st.select_slider("Decks", options=[1, 2, 6, 8], value=1)
+                soft_17 = st.selectbox("Dealer on soft 17", ('Stands (S17)', 'Hits (H17)'))
+                payout = st.selectbox("Blackjack pays", ('3:2', '6:5'))
+                max_hands = st.slider("Most hands after splitting", min_value=2, max_value=4, value=2, step=1, help="2 allows no resplits")
+                double_after_split = st.checkbox("Double after split", value=True)
+                resplit_aces = st.checkbox("Resplit aces")
+                late_surrender = st.checkbox("Late surrender", help="Surrender with the Fab 4 count deviations")
+                insurance = st.checkbox("Insurance", help="Take insurance from a true count of +3")
+                dealer_peek = st.checkbox("Dealer peeks for blackjack")
         st.form_submit_button(label="Generate")
-    
-df_info_mc = blackjack_lineplot(num_plays, starting_balance, initial_bet, repeats, strategy_options)
 
-st.pyplot(df_info_mc[0])
 
-st.divider()
+@st.cache_resource(show_spinner="Simulating the true count EV index for these rules...")
+def count_index_for(rules_key, _rules, counting_system):
+    # Read once per server and rule set, indexes of rules other than the default are simulated once and cached on disk
+    return rules_index(counting_system, _rules, processes=os.cpu_count() or 1)
+
+
+@st.cache_resource(show_spinner="Generating the strategy chart for these rules...")
+def strategy_chart(rules_key, _rules):
+    # Charts are cached on disk as well, a rule set is only ever generated once
+    return load_chart(_rules, processes=os.cpu_count() or 1)
+
+
+# Shoes are replaced below 15 cards per deck
+rules = TableRules(decks=decks, hit_soft_17=soft_17 == 'Hits (H17)', blackjack_payout=1.5 if payout == '3:2' else 1.2,
+                   double_after_split=double_after_split, max_hands=max_hands, resplit_aces=resplit_aces,
+                   late_surrender=late_surrender, insurance=insurance, dealer_peek=dealer_peek, reshuffle_at=15 * decks)
+
+strategy = BASIC_STRATEGY
+if playing == 'Generated for these rules':
+    strategy = strategy_chart(repr(rules), rules).strategy(strategy_options)
+
+# Bets are sized from the EV by true count of the game being played
+count_index = count_index_for(repr(rules), rules, strategy_options)
+bet_ramp = None
+if bet_sizing == 'Count spread':
+    bet_ramp = BetRamp(count_index, initial_bet, mode='spread')
+if bet_sizing == 'Half Kelly':
+    bet_ramp = BetRamp(count_index, initial_bet, mode='kelly', kelly_fraction=0.5)
+
+# Estimated before simulating, a run too large for the memory budget only streams summary statistics
+plan = plan_blackjack(num_plays, repeats, decks=decks, modes=('checkpoints', 'streaming'))
+st.caption(plan.describe())
 
-col3, col4 = st.columns([1,1])
-with col3:
-    st.pyplot(blackjack_distribution(df_info_mc[1], num_plays, repeats))
-with col4:
-    st.pyplot(blackjack_barchart(df_info_mc[1], num_plays, repeats))
+if plan.mode == 'checkpoints':
+    # The runs are kept for the session and grown, so more repetitions or plays only simulate what was added
+    run = session_run('strategy_explorer', (starting_balance, initial_bet, strategy_options, strategy.name, repr(bet_ramp), repr(rules)),
+                      num_plays, lambda: BlackjackRun(starting_balance, initial_bet, strategy_options, strategy, bet_ramp, rules))
+
+    # The default game is served from the warm-up bundle until this session has grown a run of its own
+    df_info_mc = None
+    if run.num_plays == 0 and strategy is BASIC_STRATEGY and bet_ramp is None and repr(rules) == repr(DEFAULT_RULES):
+        df_info_mc = precomputed('trajectories', num_plays=num_plays, starting_bankroll=starting_balance,
+                                 base_bet=initial_bet, repetitions=repeats, counting_strategy=strategy_options)
+
+    # Runs on the shared simulation service, identical concurrent requests are computed once. A run is keyed on its
+    # settings and size, so sessions whose runs stand at the same point share one computation, grown on the run of the
+    # session that asked first, and the other sessions grow their own from where it stood on their next change
+    if df_info_mc is None:
+        df_info_mc = run_simulation(blackjack_trajectories, num_plays, starting_balance, initial_bet, repeats, strategy_options, bet_ramp=bet_ramp,
+                                    run=run, rules=rules)
+
+    # Quantile bands and a few sample runs, so the chart stays the same size however many repetitions were simulated
+    trajectory_chart(df_info_mc[0], f"Number of Plays vs. ΔBalance, n = {repeats}", "Number of Plays", "ΔBalance ($USD)")
+    st.caption("Shaded bands hold the middle 50% and 90% of the runs, the white line is the median run, the red band the 95% bootstrap \
+               interval of the mean run and the dashed red line the fitted trend.")
+    slope_lower, slope_upper = df_info_mc[4]
+    st.write(f"Trend: ${df_info_mc[2]:.3f} per play (95% bootstrap CI: ${slope_lower:.3f} to ${slope_upper:.3f})")
+
+    st.divider()
+
+    col3, col4 = st.columns([1,1])
+    with col3:
+        st.pyplot(blackjack_distribution(df_info_mc[1], num_plays, repeats))
+    with col4:
+        st.pyplot(blackjack_barchart(df_info_mc[1], num_plays, repeats))
+
+    # Weighted least squares model fitted once on the per play count statistics of this simulation
+    ev_model = df_info_mc[3]
+else:
+    play_count_stats, final_balances, outcome_totals = run_simulation(blackjack_summary, num_plays, starting_balance,
+                                                                      initial_bet, repeats, strategy_options,
+                                                                      strategy=strategy, bet_ramp=bet_ramp, rules=rules)
+    ev_model = EVModel.fit(play_count_stats)
+    st.write(f"Keeping every run's bankroll path would not fit in memory, so the {repeats} runs were reduced to summary \
+             statistics as they finished.")
+    col3, col4, col5, col6 = st.columns(4)
+    col3.metric("Mean Ending Balance", f"${final_balances.mean():,.2f}")
+    col4.metric("5th Percentile", f"${final_balances.quantile(0.05):,.2f}")
+    col5.metric("Median", f"${final_balances.quantile(0.5):,.2f}")
+    col6.metric("95th Percentile", f"${final_balances.quantile(0.95):,.2f}")
+    outcomes_per_run = np.asarray(outcome_totals) / repeats
+    st.dataframe(pd.DataFrame([dict(zip(['Wins per Run', 'Losses per Run', 'Draws per Run'], outcomes_per_run))]),
+                 hide_index=True)
 
 st.divider()
 
@@ -91,4 +187,110 @@ with col5:
         predictor_button = st.form_submit_button(label="Predict")
 
     if predictor_button:
-        st.write(f"Your experimental returns at {predictor_count} plays is ${round(regressor(df_info_mc[1]).predict([[predictor_count]])[0], 2)}")
\ No newline at end of file
+        lower, upper = ev_model.confidence_interval(predictor_count)
+        st.write(f"Your experimental returns at {predictor_count} plays is ${round(ev_model.predict(predictor_count)[0], 2)} \
+                 (95% CI: ${lower[0]:.2f} to ${upper[0]:.2f})")
+with col6:
+    # Predictions for a range of play counts come from the same fit
+    prediction_counts = np.linspace(0, 1000, 11).astype(int)
+    lower, upper = ev_model.confidence_interval(prediction_counts)
+    st.dataframe(pd.DataFrame({'Play Count': prediction_counts,
+                               'Expected Balance': ev_model.predict(prediction_counts).round(2),
+                               'Lower 95%': lower.round(2),
+                               'Upper 95%': upper.round(2)}), hide_index=True)
+
+st.divider()
+
+st.subheader('EV by True Count')
+st.write("The edge of each round depends on the true count, the running count divided by the decks left in the shoe. \
+         The curve below comes from an index of simulated rounds played under the table rules above, with 95% error bars, \
+         and is what the count based bet sizings above look up before every round. The index of the default rules is \
+         precomputed from 200,000 rounds per counting system, those of other rules are simulated from 100,000 rounds the \
+         first time they are used.")
+st.pyplot(blackjack_count_ev(count_index, initial_bet))
+
+st.divider()
+
+st.subheader('Basic Strategy EV (Infinite Deck)')
+st.write("Without counting, the expected value of our strategy can be estimated much faster by assuming an infinite deck: \
+         every card is drawn independently with probability 1/13 per rank and the decisions from our strategy charts are \
+         looked up from precomputed tables. Rounds are played and paid exactly as the simulator plays them, with the playing \
+         decisions and table rules chosen above, so the estimate differs from the simulator's only by the effect of removing \
+         dealt cards from the shoe. The number of decks and the reshuffle point do not apply. Results are in units of the \
+         initial bet.")
+
+with st.form(key='infinite_deck'):
+    infinite_hands = st.select_slider("Number of hands", options=[100_000, 1_000_000, 5_000_000, 10_000_000], value=1_000_000)
+    infinite_button = st.form_submit_button(label="Estimate")
+
+if infinite_button:
+    infinite_result = run_simulation(infinite_deck_ev, infinite_hands, strategy=strategy, rules=rules)
+    st.write(f"EV per hand: **{infinite_result.ev * 100:.3f}%** of the bet (± {1.96 * infinite_result.standard_error * 100:.3f}%), \
+             or ${infinite_result.ev * initial_bet:.3f} per hand at a ${initial_bet} bet. \
+             Simulated at {infinite_result.hands_per_minute / 1e6:.1f} million hands per minute.")
+    st.dataframe(pd.DataFrame([infinite_result.frequencies]), hide_index=True)
+
+st.divider()
+
+st.subheader('Counting Systems on Identical Shoes')
+st.write("Comparing strategies on different random shoes needs an enormous number of hands to resolve small edges. \
+         Here every counting system replays exactly the same recorded shoes, round by round, so the difference between \
+         them is measured on paired hands and its error shrinks accordingly. Every system plays the playing decisions and \
+         table rules chosen above. Results are in units of the initial bet per round.")
+
+with st.form(key='replay'):
+    replay_rounds = st.select_slider("Number of rounds", options=[5_000, 20_000, 50_000, 100_000], value=20_000)
+    replay_seed = st.number_input("Shoe seed", min_value=0, value=0, step=1, help="Shoes are recorded as this seed, the same seed replays the same cards")
+    replay_button = st.form_submit_button(label="Replay")
+
+if replay_button:
+    # A generated chart plays the count indexes of each counting system
+    chart = strategy_chart(repr(rules), rules) if playing == 'Generated for these rules' else None
+    variants = [Variant(name, system, BASIC_STRATEGY if chart is None else chart.strategy(system))
+                for name, system in (('High Low', 'high_low'), ('Zen', 'zen'), ('Halves', 'halves'))]
+    record = ShoeRecord(int(replay_seed), replay_rounds // (5 * decks) + 1, decks=decks)
+    replay_result = run_simulation(replay, variants, record, replay_rounds, rules=rules)
+    replay_rows = []
+    for name, mean, standard_error in replay_result.summary():
+        difference = replay_result.paired_difference(name, 'High Low')
+        replay_rows.append({'Counting System': name, 'EV per Round': round(mean, 4), 'Standard Error': round(standard_error, 4),
+                            'Difference vs High Low': round(difference['mean'], 5),
+                            'Paired Standard Error': round(difference['standard_error'], 5),
+                            'Unpaired Standard Error': round(difference['independent_standard_error'], 5)})
+    st.dataframe(pd.DataFrame(replay_rows), hide_index=True)
+
+st.divider()
+
+st.subheader('Crowded Tables')
+st.write("The simulations above seat you alone against the dealer. At a real table other players draw from the same shoe, \
+         so fewer rounds are dealt per shoe, your count also moves with their cards and every round takes longer to deal. \
+         Here your seat keeps the strategy, counting system, bet sizing and rules chosen above, the other seats play the \
+         same strategy with flat bets, and many tables are dealt at once with every seat's decisions taken together.")
+
+with st.form(key='table'):
+    other_players = st.slider("Other players at the table", min_value=0, max_value=6, value=4, step=1)
+    your_spots = st.slider("Spots you play", min_value=1, max_value=3, value=1, step=1, help="Hands you play every round, each with the round's bet")
+    table_rounds = st.slider("Rounds per table", min_value=100, max_value=2000, value=500, step=100)
+    table_repetitions = st.slider("Tables", min_value=10, max_value=500, value=100, step=10, help="Independent tables dealt at once")
+    table_button = st.form_submit_button(label="Deal")
+
+if table_button:
+    you = Seat('You', initial_bet, strategy_options, strategy, bet_ramp, your_spots, starting_balance)
+    others = [Seat(f'Player {number}', initial_bet, 'high_low', strategy) for number in range(1, other_players + 1)]
+    heads_up = run_simulation(simulate_table, [you], table_rounds, table_repetitions, rules=rules, seed=0)
+    crowded = run_simulation(simulate_table, others[:len(others) // 2] + [you] + others[len(others) // 2:], table_rounds,
+                             table_repetitions, rules=rules, seed=0)
+
+    comparison = []
+    for name, result in (('Heads up', heads_up), (f'With {other_players} other players', crowded)):
+        seat = [seat.name for seat in result.seats].index('You')
+        summary = result.summary().iloc[seat]
+        comparison.append({'Table': name, 'Rounds per Shoe': round(result.rounds / result.shoes.mean(), 1),
+                           'Rounds per Hour': round(result.rounds_per_hour(), 1),
+                           'Your Hands per Hour': round(summary['Hands per Hour'], 1),
+                           'Your Net per Hand': round(summary['Net per Hand'], 3),
+                           'Your Net per Hour': round(summary['Net per Round'] * result.rounds_per_hour(), 2)})
+    st.dataframe(pd.DataFrame(comparison), hide_index=True)
+    st.caption("Hours assume about 8 seconds per round, 8 per hand and a minute per shuffle, which reproduces the usual \
+               rounds per hour of a six deck shoe.")
+    st.dataframe(crowded.summary().round(3), hide_index=True)
@@ -0,0 +1,92 @@
+import streamlit as st
+from st_pages import add_page_title
+import pandas as pd
+from packages.graphs import frequency_plot, box_plot, stats_table
+from packages.data_manipulation import dataframe_conversion
+from packages.roulette_engine import Bet, Layout, WHEELS, PAYOUTS, OUTSIDE_BETS, simulate_layout
+
+# Setting page configuration
+st.set_page_config(
+    page_title="Bet Layouts",
+    page_icon=":closed_book:",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+# Add page to list of pages
+add_page_title()
+
+col1, col2 = st.columns([1,1])
+
+with col1:
+    st.write("Beyond colours, a roulette table takes **inside bets** on single numbers and small groups of numbers, and \
+             **outside bets** on dozens, columns, even/odd, high/low and colours. Build a layout of bets placed together \
+             on every spin and compare the European (single zero) and American (double zero) wheels.")
+    st.write("Selections are numbers separated by dashes for inside bets (e.g. 17, 17-20, 4-5-6, 1-2-4-5, or 0-00-1-2-3 \
+             for the American top line), 1 to 3 for dozens and columns, and left empty for the even money bets.")
+    bets_df = st.data_editor(
+        pd.DataFrame({'Bet': ['red', 'straight', 'dozen'], 'Selection': ['', '17', '3'], 'Amount': [10, 1, 5]}),
+        column_config={'Bet': st.column_config.SelectboxColumn(options=list(PAYOUTS), required=True)},
+        num_rows="dynamic", hide_index=True)
+
+with col2:
+    wheel_name = st.selectbox("Wheel", options=['European', 'American']).lower()
+    initial_balance = st.slider("Initial Balance", min_value=1, max_value=1000, value=200, step=1, help="Set the starting balance that you'll enter with")
+    num_plays = st.slider("Number of Plays", min_value=10, max_value=500, value=10, step=1, help="Set the number of plays for the strategy")
+    repeats = st.slider("Sample repetitions", min_value=10, max_value=1000, value=100, step=10, help="Set the **n** size for the number of samples")
+
+# Build the layout from the table, every row is one bet
+bets = []
+try:
+    for bet_type, selection, amount in bets_df[['Bet', 'Selection', 'Amount']].itertuples(index=False):
+        if not bet_type or pd.isna(amount) or not amount:
+            continue
+        # Cells left empty come back as None or NaN
+        selection = '' if pd.isna(selection) else str(selection).strip()
+        if bet_type in OUTSIDE_BETS:
+            selection = None
+        elif not selection:
+            raise ValueError(f"a {bet_type} bet needs a selection")
+        elif bet_type in ('dozen', 'column'):
+            selection = int(selection)
+        else:
+            selection = [number.strip() for number in selection.split('-')]
+        bets.append(Bet(bet_type, selection, float(amount)))
+    layout = Layout(bets)
+    payout_table = layout.payout_table(WHEELS[wheel_name])
+except (ValueError, TypeError) as error:
+    st.error(f"Invalid bet: {error}")
+    st.stop()
+
+if not bets:
+    st.error("Add at least one bet to the layout.")
+    st.stop()
+
+with col2:
+    st.write(f"Stake per spin: **${layout.stake():.2f}**, exact expected result per spin: **${layout.expected_value(WHEELS[wheel_name]):.2f}**")
+
+# Subheader above graph
+st.markdown(
+    """
+    <style>
+    .custom-subheader {
+        text-align: center; 
+        font-family: monospace
+    }
+    </style>
+    """,
+    unsafe_allow_html=True,)
+st.markdown('<h2 class="custom-subheader">Visualizations</h2>', unsafe_allow_html=True)
+
+result = simulate_layout(layout, wheel_name, repeats, num_plays, initial_balance)
+layout_df = dataframe_conversion(result.balances)
+graph_width = layout.stake() * 20
+
+col3, col4 = st.columns([1, 1])
+with col3:
+    st.pyplot(frequency_plot(layout_df, initial_balance, repeats, graph_width), use_container_width=True)
+    st.pyplot(box_plot(layout_df, initial_balance, repeats, graph_width), use_container_width=True)
+with col4:
+    st.markdown(stats_table(layout_df, initial_balance), unsafe_allow_html=True)
+    st.write("Net result of one spin for every pocket:")
+    st.dataframe(pd.DataFrame({'Pocket': WHEELS[wheel_name].labels, 'Colour': WHEELS[wheel_name].colors, 'Net Result': payout_table}), hide_index=True)
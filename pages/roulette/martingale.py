@@ -1,8 +1,10 @@
 import streamlit as st
 from st_pages import add_page_title
-import random
-from packages.graphs import frequency_plot, line_plot, box_plot, stats_table, roulette_plot
-from packages.data_manipulation import sample, dataframe_conversion
+from packages.graphs import frequency_plot, line_plot, box_plot, stats_table, stopping_time_plot, stop_reason_plot, path_stats_table
+from packages.ui import roulette_plot, stopping_plot, session_run, stop_rule_panel, large_sample_panel
+from packages.data_manipulation import dataframe_conversion
+from packages.progressions import PROGRESSIONS
+from packages.rare_events import tail_probability
 
 # Setting page configuration
 st.set_page_config(
@@ -16,38 +18,8 @@ st.set_page_config(
 add_page_title()
 
 
-# Martingale implementation
-def martingale(initial_balance, num_plays, initial_bet, preference, target_balance, floor_balance = 0):
-    """
-    Simulates the martingale strategy returning balance on roulette given an initial balance, number of plays, initial bet, and color preference  
-    Stops betting if balance reaches or exceeds target_balance.
-    
-    Args:
-        initial_balance (int or float): Starting amount
-        num_plays (int): Number of plays
-        initial_bet (int or float): Starting amount
-        preference (string): Color preference from "Red", "Black", or "Green"
-        target_balance (int or float, optional): Target amount
-    Returns:
-        int or float: end amount
-    """
-    choices = ['red', 'black', 'green']
-    weights = [18/38, 18/38, 2/38]
-    balance = initial_balance
-    bet = initial_bet
-    ceiling = target_balance
-
-    for _ in range(num_plays):
-        if bet > balance or balance <= floor_balance or (ceiling is not None and balance >= ceiling):
-            break
-        outcome = random.choices(choices, weights)[0]
-        if outcome == preference:
-            balance += bet
-            bet = initial_bet
-        else:
-            balance -= bet
-            bet *= 2
-    return balance
+# Martingale progression, compiled into the shared batched kernel in packages/progressions.py
+martingale = PROGRESSIONS['martingale']
 
 
 # Setting columns
@@ -97,8 +69,12 @@ st.markdown(
     unsafe_allow_html=True,)
 st.markdown('<h2 class="custom-subheader">Visualizations</h2>', unsafe_allow_html=True)
 
-# Simulate and convert into Pandas DataFrame
-samples = sample(martingale, repeats, initial_balance, num_plays, initial_bet, preference, target_balance, floor_balance)
+# Simulate in one batched run, which also records when and why every repetition stopped, and convert into Pandas DataFrame.
+# The run is kept for the session, so raising the repetitions or the number of plays only simulates what was added
+parameters = (initial_balance, initial_bet, preference, target_balance, floor_balance)
+run = session_run('martingale', parameters, num_plays, lambda: martingale.run(*parameters))
+result = run.grow(repeats, num_plays)
+samples = result.balances
 martingale_df = dataframe_conversion(samples)
 
 # Initializes fig objects for our plots
@@ -107,4 +83,43 @@ frequency_plt = frequency_plot(martingale_df, initial_balance, repeats, graph_wi
 box_plt = box_plot(martingale_df, initial_balance, repeats, graph_width)
 stats_tbl = stats_table(martingale_df, initial_balance)
 
-roulette_plot(line_plt, frequency_plt, box_plt, stats_tbl)
\ No newline at end of file
+roulette_plot(line_plt, frequency_plt, box_plt, stats_tbl)
+
+stopping_plot(stopping_time_plot(result, num_plays), stop_reason_plot(result), path_stats_table(result))
+
+stop_rule_panel(martingale, initial_balance, initial_bet, preference, num_plays)
+large_sample_panel(martingale, initial_balance, initial_bet, preference, num_plays, target_balance, floor_balance)
+
+@st.cache_data(show_spinner="Estimating the tail probability...")
+def catastrophic_loss(threshold, repeats, initial_balance, num_plays, initial_bet, preference, target_balance, floor_balance):
+    return tail_probability(martingale, threshold, repeats, initial_balance, num_plays, initial_bet, preference,
+                            target_balance, floor_balance, seed=0)
+
+
+st.divider()
+st.subheader("Catastrophic Losses")
+st.write("The losing streaks that wipe out a martingale bankroll are too rare for the sampled repetitions above to \
+         observe reliably. Here the spins are drawn from a wheel tilted towards long losing streaks and every run is \
+         reweighted by how much likelier its spins were on the real wheel (importance sampling), which estimates \
+         probabilities down to one in a million with a bounded relative error at the cost of one ordinary run.")
+rare_col1, rare_col2 = st.columns([1, 1])
+with rare_col1:
+    # A slider needs a range, at an initial balance of 1 the only threshold is 1, ending broke
+    loss_threshold = st.slider("Ending balance below", min_value=1, max_value=max(2, initial_balance),
+                               value=max(1, initial_balance // 2), step=1,
+                               help="Estimate the probability of ending the session below this balance")
+    loss_threshold = min(loss_threshold, initial_balance)
+    rare_repeats = st.select_slider("Tilted repetitions", options=[2000, 5000, 10000, 20000, 50000], value=10000)
+
+estimate = catastrophic_loss(loss_threshold, rare_repeats, initial_balance, num_plays, initial_bet, preference,
+                             target_balance, floor_balance)
+lower, upper = estimate.interval()
+with rare_col2:
+    st.metric("Probability of ending below the threshold", f"{estimate.probability:.3g}")
+    if estimate.events:
+        st.write(f"95% CI: {lower:.3g} to {upper:.3g}, relative error {estimate.relative_error:.1%}")
+        st.write(f"Plain Monte Carlo would need about {estimate.equivalent_repeats():,.0f} repetitions for the same accuracy, \
+                 this estimate used {estimate.repeats + estimate.pilot_repeats:,} ({estimate.pilot_repeats:,} to tune the tilt).")
+    else:
+        st.write("No tilted repetition ended below the threshold, within these stop rules it is out of reach or rarer \
+                 than the estimator can resolve.")
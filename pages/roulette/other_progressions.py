@@ -0,0 +1,102 @@
+import streamlit as st
+from st_pages import add_page_title
+from packages.graphs import frequency_plot, line_plot, box_plot, stats_table, stopping_time_plot, stop_reason_plot, path_stats_table
+from packages.ui import roulette_plot, stopping_plot, session_run, large_sample_panel
+from packages.data_manipulation import dataframe_conversion
+from packages.progressions import PROGRESSIONS
+
+# Setting page configuration
+st.set_page_config(
+    page_title="Other Progressions",
+    page_icon=":green_book:",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+# Add page to list of pages
+add_page_title()
+
+# Descriptions of the progressions declared in packages/progressions.py
+descriptions = {
+    'fibonacci': ("The **Fibonacci system** walks along the Fibonacci sequence (1, 1, 2, 3, 5, 8, ...) in units of the base bet.",
+                  ["1. Start at the first number of the sequence.",
+                   "2. If you lose a bet, move one step forward in the sequence.",
+                   "3. If you win a bet, move two steps back in the sequence."]),
+    'labouchere': ("The **Labouchère system** (or cancellation system) keeps a line of numbers, here 1-2-3-4, and bets the sum of both ends.",
+                   ["1. Bet the first plus the last number of the line.",
+                    "2. If you win a bet, cross off both numbers.",
+                    "3. If you lose a bet, add the amount lost to the end of the line.",
+                    "4. Start a new line once every number is crossed off."]),
+    'paroli': ("The **Paroli system** is a positive progression that rides short winning streaks.",
+               ["1. Set an initial bet",
+                "2. If you win a bet, double the bet for the next round.",
+                "3. After three wins in a row, or any loss, reset to the initial bet."]),
+    'oscars_grind': ("**Oscar's Grind** aims for a profit of one base bet per cycle while raising bets only after wins.",
+                     ["1. Set an initial bet",
+                      "2. If you win a bet, raise the bet by one unit, never above what completes the cycle.",
+                      "3. If you lose a bet, keep the same bet.",
+                      "4. Once the cycle is up one unit, start a new cycle."]),
+}
+
+# Setting columns
+col1, col2 = st.columns([1,1])
+
+# Handles form data
+with col2:
+    progression_key = st.selectbox("Progression", options=list(descriptions), format_func=lambda key: PROGRESSIONS[key].name)
+    initial_balance = st.slider("Initial Balance", min_value=1, max_value=1000, value=200, step=1, help="Set the starting balance that you'll enter with")
+    num_plays = st.slider("Number of Plays", min_value=10, max_value=500, value=10, step=1, help="Set the number of plays for the strategy")
+    initial_bet = st.slider("Initial Bet", min_value=1, max_value=1000, value=10, step=1, help="Set the initial bet that you will build on")
+    repeats = st.slider("Sample repetitions", min_value=10, max_value=1000, value=100, step=10, help="Set the **n** size for the number of samples")
+    target_balance = st.slider("Target Balance", min_value=0, max_value=5000, value=0, step=10, help="Optional: Betting stops once the balance has reached or exceeds this value. Leave as 0 for no target.")
+    if target_balance > 0 and target_balance <= initial_balance:
+        st.error("Target balance must be greater than initial balance.")
+        st.stop()
+    if target_balance == 0:
+        target_balance = None
+    floor_balance = st.slider("Floor Balance", min_value=0, max_value=1000, value=0, step=10, help="Optional: Betting stops once the balance has fallen under this value. Leave as 0 for no floor.")
+    preference = (st.selectbox("Color", options=['Red', 'Black', 'Green'])).lower()
+    graph_width =  initial_bet * 20
+
+with col1:
+    # Description of the strategy
+    summary, steps = descriptions[progression_key]
+    st.write(summary)
+    st.write("The algorithm for this strategy involves the following guidelines: ")
+    for step in steps:
+        st.text(step)
+
+progression = PROGRESSIONS[progression_key]
+
+# Subheader above graph
+st.markdown(
+    """
+    <style>
+    .custom-subheader {
+        text-align: center; 
+        font-family: monospace
+    }
+    </style>
+    """,
+    unsafe_allow_html=True,)
+st.markdown('<h2 class="custom-subheader">Visualizations</h2>', unsafe_allow_html=True)
+
+# Simulate in one batched run, which also records when and why every repetition stopped, and convert into Pandas DataFrame.
+# The run is kept for the session, so raising the repetitions or the number of plays only simulates what was added
+parameters = (initial_balance, initial_bet, preference, target_balance, floor_balance)
+run = session_run(progression.name, parameters, num_plays, lambda: progression.run(*parameters))
+result = run.grow(repeats, num_plays)
+samples = result.balances
+progression_df = dataframe_conversion(samples)
+
+# Initializes fig objects for our plots
+line_plt = line_plot(progression, num_plays, initial_balance, initial_bet, preference, target_balance)
+frequency_plt = frequency_plot(progression_df, initial_balance, repeats, graph_width)
+box_plt = box_plot(progression_df, initial_balance, repeats, graph_width)
+stats_tbl = stats_table(progression_df, initial_balance)
+
+roulette_plot(line_plt, frequency_plt, box_plt, stats_tbl)
+
+stopping_plot(stopping_time_plot(result, num_plays), stop_reason_plot(result), path_stats_table(result))
+
+large_sample_panel(progression, initial_balance, initial_bet, preference, num_plays, target_balance, floor_balance)
@@ -1,8 +1,9 @@
 import streamlit as st
 from st_pages import add_page_title
-import random
-from packages.graphs import frequency_plot, line_plot, box_plot, stats_table, roulette_plot
-from packages.data_manipulation import sample, dataframe_conversion
+from packages.graphs import frequency_plot, line_plot, box_plot, stats_table, stopping_time_plot, stop_reason_plot, path_stats_table
+from packages.ui import roulette_plot, stopping_plot, session_run, stop_rule_panel, large_sample_panel
+from packages.data_manipulation import dataframe_conversion
+from packages.progressions import PROGRESSIONS
 
 # Setting page configuration
 st.set_page_config(
@@ -16,38 +17,8 @@ st.set_page_config(
 add_page_title()
 
 
-# Reverse Martingale implementation
-def reverse_martingale(initial_balance, num_plays, initial_bet, preference, target_balance, floor_balance = 0):
-    """
-    Simulates the reverse martingale strategy returning balance on roulette given an initial balance, number of plays, initial bet, and color preference  
-    Stops betting if balance reaches or exceeds target_balance.
-
-    Args:
-        initial_balance (int or float): Starting amount
-        num_plays (int): Number of plays
-        initial_bet (int or float): Starting amount
-        preference (string): Color preference from "red", "black", or "green"
-        target_balance (int or float, optional): Target amount
-    Returns:
-        int or float: end amount
-    """
-    choices = ['red', 'black', 'green']
-    weights = [18/38, 18/38, 2/38]
-    balance = initial_balance
-    bet = initial_bet
-    ceiling = target_balance
-    
-    for _ in range(num_plays):
-        if bet > balance or balance <= floor_balance or (ceiling is not None and balance >= ceiling):
-            break
-        outcome = random.choices(choices, weights)[0]
-        if outcome == preference:
-            balance += bet
-            bet *= 2
-        else:
-            balance -= bet
-            bet = initial_bet
-    return balance
+# Reverse Martingale progression, compiled into the shared batched kernel in packages/progressions.py
+reverse_martingale = PROGRESSIONS['reverse_martingale']
 
 
 # Setting columns
@@ -92,8 +63,12 @@ st.markdown(
     unsafe_allow_html=True,)
 st.markdown('<h2 class="custom-subheader">Visualization</h2>', unsafe_allow_html=True)
 
-# Simulate and convert into Pandas DataFrame
-samples = sample(reverse_martingale, repeats, initial_balance, num_plays, initial_bet, preference, target_balance, floor_balance)
+# Simulate in one batched run, which also records when and why every repetition stopped, and convert into Pandas DataFrame.
+# The run is kept for the session, so raising the repetitions or the number of plays only simulates what was added
+parameters = (initial_balance, initial_bet, preference, target_balance, floor_balance)
+run = session_run('reverse_martingale', parameters, num_plays, lambda: reverse_martingale.run(*parameters))
+result = run.grow(repeats, num_plays)
+samples = result.balances
 reverse_martingale_df = dataframe_conversion(samples)
 
 # Initializes fig objects for our plots
@@ -102,4 +77,9 @@ frequency_plt = frequency_plot(reverse_martingale_df, initial_balance, repeats,
 box_plt = box_plot(reverse_martingale_df, initial_balance, repeats, graph_width)
 stats_tbl = stats_table(reverse_martingale_df, initial_balance)
 
-roulette_plot(line_plt, frequency_plt, box_plt, stats_tbl)
\ No newline at end of file
+roulette_plot(line_plt, frequency_plt, box_plt, stats_tbl)
+
+stopping_plot(stopping_time_plot(result, num_plays), stop_reason_plot(result), path_stats_table(result))
+
+stop_rule_panel(reverse_martingale, initial_balance, initial_bet, preference, num_plays)
+large_sample_panel(reverse_martingale, initial_balance, initial_bet, preference, num_plays, target_balance, floor_balance)
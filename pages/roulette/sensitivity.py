@@ -0,0 +1,68 @@
+import streamlit as st
+from st_pages import add_page_title
+import numpy as np
+
+from packages.progressions import PROGRESSIONS
+from packages.parameter_grid import progression_grid
+from packages.ui import grid_heatmaps, run_simulation
+
+# Setting page configuration
+st.set_page_config(
+    page_title="Sensitivity Heatmaps",
+    page_icon=":bar_chart:",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+# Add page to list of pages
+add_page_title()
+
+# Grid axes offered, with their label and the range of their sliders
+axes = {
+    'initial_bet': ("Initial Bet", 1, 100, (5, 50)),
+    'target_balance': ("Target Balance", 100, 5000, (250, 1000)),
+    'floor_balance': ("Floor Balance", 0, 1000, (0, 150)),
+    'initial_balance': ("Initial Balance", 10, 2000, (100, 1000)),
+}
+
+col1, col2 = st.columns([1,1])
+
+with col1:
+    st.write("Moving one slider at a time only shows one configuration per run. Here a whole grid of configurations is \
+             simulated in a single batched run: every cell of the grid gets its own block of repetitions and the parameters \
+             are broadcast along the repetitions. Each heatmap shows one statistic over the grid: the mean ending balance, \
+             the probability of ending with a profit, and the probability of ruin, i.e. stopping at the floor or no longer \
+             being able to cover the next bet.")
+
+with col2:
+    # The axes are chosen outside the form so the range sliders below follow them straight away
+    progression_key = st.selectbox("Progression", options=list(PROGRESSIONS), format_func=lambda key: PROGRESSIONS[key].name)
+    x_name = st.selectbox("X axis", options=list(axes), index=0, format_func=lambda key: axes[key][0])
+    y_name = st.selectbox("Y axis", options=list(axes), index=1, format_func=lambda key: axes[key][0])
+    if x_name == y_name:
+        st.error("Choose two different parameters for the axes.")
+        st.stop()
+    with st.form(key='grid'):
+        x_range = st.slider("X axis range", min_value=axes[x_name][1], max_value=axes[x_name][2], value=axes[x_name][3])
+        y_range = st.slider("Y axis range", min_value=axes[y_name][1], max_value=axes[y_name][2], value=axes[y_name][3])
+        grid_size = st.slider("Grid size", min_value=5, max_value=20, value=20, step=1, help="Configurations per axis")
+        repeats = st.slider("Repetitions per configuration", min_value=50, max_value=1000, value=200, step=50)
+        num_plays = st.slider("Number of Plays", min_value=10, max_value=500, value=100, step=1)
+        preference = (st.selectbox("Color", options=['Red', 'Black', 'Green'])).lower()
+        st.form_submit_button(label="Simulate Grid")
+
+# Whole number values, duplicates from narrow ranges are dropped
+x_values = np.unique(np.linspace(*x_range, grid_size).round())
+y_values = np.unique(np.linspace(*y_range, grid_size).round())
+
+# Parameters off the grid keep the defaults of the strategy pages
+fixed = {'initial_balance': 200, 'initial_bet': 10, 'target_balance': None, 'floor_balance': 0, 'preference': preference}
+for name in (x_name, y_name):
+    fixed.pop(name)
+
+grid = run_simulation(progression_grid, PROGRESSIONS[progression_key], repeats, num_plays, x_name, x_values, y_name,
+                      y_values, seed=0, **fixed)
+
+st.markdown(f"**{PROGRESSIONS[progression_key].name}**: {len(x_values)} × {len(y_values)} configurations, "
+            f"{repeats} repetitions each, {len(x_values) * len(y_values) * repeats:,} runs in one batch")
+grid_heatmaps(grid, axes[x_name][0], axes[y_name][0])